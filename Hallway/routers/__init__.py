@@ -1,4 +1,7 @@
 from aiogram import Router
+
+import config
+from common.middlewares.db_budget import DbBudgetMiddleware
 from .join import router as join_router
 from .user import router as user_router
 from .admin import router as admin_router
@@ -7,3 +10,8 @@ router = Router(name="hallway")
 router.include_router(join_router)
 router.include_router(user_router)
 router.include_router(admin_router)
+
+# /start, меню, подписки: DB-API не должен держать ответ пользователю дольше бюджета
+_db_budget = DbBudgetMiddleware(getattr(config, "DB_API_HANDLER_BUDGET", 10.0))
+router.message.middleware(_db_budget)
+router.callback_query.middleware(_db_budget)
@@ -53,8 +53,7 @@ def _text_command_handler(command_name: str, pending_set: set[int], file_path):
         user_id = message.from_user.id
         new_text = message.text or ""
         try:
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(new_text)
+            await messages.save_text(path, new_text)
             await message.answer(f"✅ Файл «{command_name}.html» успешно обновлён и будет использоваться сразу.")
         except Exception as e:
             logging.error(
@@ -74,8 +73,8 @@ def _text_command_handler(command_name: str, pending_set: set[int], file_path):
 
 # Регистрируем команды на основе секций
 _text_command_handler("welcome",         _setwelcome_pending,         messages.WELCOME_FILE)
-_text_command_handler("advertisement_1", _setadvertisement_1_pending, "advertisement_1.html")
-_text_command_handler("advertisement_2", _setadvertisement_2_pending, "advertisement_2.html")
-_text_command_handler("advertisement",   _setadvertisement_pending,   "advertisement.html")
+_text_command_handler("advertisement_1", _setadvertisement_1_pending, messages.AD_FILE_1)
+_text_command_handler("advertisement_2", _setadvertisement_2_pending, messages.AD_FILE_2)
+_text_command_handler("advertisement",   _setadvertisement_pending,   messages.AD_FILE)
 _text_command_handler("anonymity",       _setanonymity_pending,       messages.ANONYMITY_FILE)
 _text_command_handler("projects",        _setprojects_pending,        messages.PROJECTS_FILE)
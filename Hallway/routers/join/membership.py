@@ -11,10 +11,16 @@ from httpx import HTTPStatusError
 
 from common.utils import cleanup_join_requests, log_and_report, get_bot
 from common.utils.time_msk import now_msk_naive
+from common.utils.unreachable import mark_reachable, mark_unreachable
+from common.utils.membership_queue import get_membership_queue
+from Hallway.services.invite_pool import get_invite_pool
+from Hallway.services.invite_gc import get_invite_gc
 from storage import (
     upsert_chat,
     add_user,
     add_membership,
+    queue_add_user,
+    queue_add_membership,
     remove_membership,
     ensure_user_subscriptions_defaults,
     # новая обёртка
@@ -28,9 +34,15 @@ tracked_chats: set[int] = set()
 
 
 async def add_user_and_membership(user, chat_id: int = None):
-    """Добавляет/обновляет пользователя и подписку."""
+    """Добавляет/обновляет пользователя и подписку (обе записи уходят в одно окно пакетной записи)."""
+    if not chat_id:
+        chat_id = config.BOT_ID
+        logging.info(f"user_id={user.id} – Подписка без chat_id, используем BOT_ID={chat_id}", extra={"user_id": user.id})
+
+    user_written = queue_add_user(user.id, user.username or None, user.full_name or None)
+    membership_written = queue_add_membership(user.id, chat_id)
     try:
-        await add_user(user.id, user.username or None, user.full_name or None)
+        await user_written
         logging.info(
             f"user_id={user.id} – Пользователь сохранён (username={user.username}, full_name={user.full_name})",
             extra={"user_id": user.id}
@@ -39,12 +51,8 @@ async def add_user_and_membership(user, chat_id: int = None):
         logging.error(f"user_id={user.id} – Ошибка при сохранении пользователя: {exc}", extra={"user_id": user.id})
         await log_and_report(exc, f"add_user user={user.id}")
 
-    if not chat_id:
-        chat_id = config.BOT_ID
-        logging.info(f"user_id={user.id} – Подписка без chat_id, используем BOT_ID={chat_id}", extra={"user_id": user.id})
-
     try:
-        await add_membership(user.id, chat_id)
+        await membership_written
         logging.info(f"user_id={user.id} – Подписан на chat={chat_id}", extra={"user_id": user.id})
     except HTTPStatusError as exc:
         logging.warning(
@@ -64,8 +72,14 @@ async def add_user_and_membership(user, chat_id: int = None):
 async def on_startup():
     """Очистка join-requests, регистрация бота и загрузка tracked_chats."""
     asyncio.create_task(cleanup_join_requests())
+    # дописываем в БД события chat_member, оставшиеся в спуле после падения
+    get_membership_queue().start()
     bot = get_bot()
-    me = await bot.get_me()
+    # пул готовых инвайтов: /start не ждёт create_chat_invite_link
+    get_invite_pool().start(bot)
+    # отзыв истёкших/невыданных инвайтов в фоне
+    get_invite_gc().start(bot)
+    me = await bot.me()
     config.BOT_ID = me.id
 
     global tracked_chats
@@ -102,26 +116,21 @@ async def on_chat_member(update: ChatMemberUpdated):
     status = update.new_chat_member.status
     logging.info(f"user_id={user_id} – status='{status}' в chat={chat_id}", extra={"user_id": user_id})
 
-    try:
-        await add_user(user.id, user.username or None, user.full_name or None)
-    except Exception as exc:
-        logging.error(f"user_id={user_id} – Ошибка add_user: {exc}", extra={"user_id": user_id})
-        await log_and_report(exc, f"add_user user={user_id}")
-
+    # запись отложенная и пакетная (common/utils/membership_queue.py): при рейдах/массовых входах
+    # в БД уходит только последний статус user+chat, события до записи лежат в спуле
     if status in ("member", "restricted"):
-        try:
-            await add_membership(user_id, chat_id)
-            logging.info(f"user_id={user_id} – Подписан в chat={chat_id}", extra={"user_id": user_id})
-        except Exception as exc:
-            logging.error(f"user_id={user_id} – Ошибка add_membership: {exc}", extra={"user_id": user_id})
-            await log_and_report(exc, f"add_membership user={user_id}, chat={chat_id}")
+        joined = True
     elif status in ("left", "kicked"):
+        joined = False
+    else:
+        # administrator/creator: подписка не меняется, но профиль пользователя обновляем, как и раньше
         try:
-            await remove_membership(user_id, chat_id)
-            logging.info(f"user_id={user_id} – Отписан от chat={chat_id}", extra={"user_id": user_id})
+            await queue_add_user(user_id, user.username or None, user.full_name or None)
         except Exception as exc:
-            logging.error(f"user_id={user_id} – Ошибка remove_membership: {exc}", extra={"user_id": user_id})
-            await log_and_report(exc, f"remove_membership user={user_id}, chat={chat_id}")
+            logging.error(f"user_id={user_id} – Ошибка add_user: {exc}", extra={"user_id": user_id})
+            await log_and_report(exc, f"add_user user={user_id}")
+        return
+    get_membership_queue().submit(user_id, chat_id, joined, user.username or None, user.full_name or None)
 
 
 @router.my_chat_member()
@@ -144,6 +153,9 @@ async def on_my_chat_member(update: ChatMemberUpdated):
         full_name = getattr(subject, "full_name", None)
 
         if status in ("member", "creator", "administrator"):
+            # 0) снова доступен для рассылок (разблокировал бота)
+            await mark_reachable(user_id)
+
             # 1) пользователь (идемпотентно)
             try:
                 await add_user(user_id, username or None, (full_name or "").strip() or None)
@@ -209,6 +221,9 @@ async def on_my_chat_member(update: ChatMemberUpdated):
                 await log_and_report(exc, f"ensure_user_subscriptions_defaults({user_id})")
 
         elif status in ("left", "kicked"):
+            if status == "kicked":
+                # заблокировал бота — рассылки его пропускают
+                mark_unreachable(user_id)
             # отписка от бота
             try:
                 await remove_membership(user_id, config.BOT_ID)
@@ -1,22 +1,26 @@
 # Hallway/routers/join/resources.py)
 from __future__ import annotations
 
-import os
+import asyncio
 import logging
-from typing import Sequence
+from typing import Any, Awaitable, Callable
 
 from aiogram import Router, F
 from aiogram.enums import ChatType
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 
 from common.utils import get_bot
-from storage import get_all_invite_links
-from config import PRIVATE_DESTINATIONS, LOG_CHANNEL_ID
-from Hallway.services.invite_service import generate_invite_links
-from common.utils.chatlink import is_url, to_int_or_none, eq_chat_id
+import messages
+from config import LOG_CHANNEL_ID
+from Hallway.services.invite_service import resolve_invite_links
 
 router = Router()
 
+# фоновые отправки (лог-канал) — держим ссылки, пока не завершатся
+_background: set[asyncio.Task] = set()
+
+ADVERTISEMENT_FILES = ("advertisement_1.html", "advertisement_2.html", "advertisement_3.html")  # Лудочат, Практичат, Выручат
+
 
 async def send_chunked_message(chat_id: int, text: str, *, allow_group: bool = False, **kwargs):
     bot = get_bot()
@@ -52,7 +56,7 @@ async def send_chunked_message(chat_id: int, text: str, *, allow_group: bool = F
             )
             try:
                 kwargs.pop("reply_markup", None)
-                await bot.send_message(chat_id, text[start:start + 4096])
+                await bot.send_message(chat_id, text[start:start + 4096], parse_mode=None)
             except Exception as ee:
                 logging.error(
                     f"user_id={chat_id} – повторная ошибка отправки chunked message: {ee}",
@@ -63,132 +67,71 @@ async def send_chunked_message(chat_id: int, text: str, *, allow_group: bool = F
 
 async def read_advertisement_file(file_name: str) -> str:
     try:
-        file_path = os.path.join("text", file_name)
-        with open(file_path, "r", encoding="utf-8") as f:
-            return f.read()
+        # из памяти (messages.templates), путь — от каталога text/ проекта, не от CWD
+        return messages.templates.get(file_name, "")
     except Exception as e:
         logging.error(f"user_id=system – ошибка при чтении файла {file_name}: {e}", extra={"user_id": "system"})
         return ""
 
 
-def _compute_missing_chat_ids(
-    destinations: Sequence[dict],
-    existing_links: list[dict],
-) -> set[int]:
-    """
-    Возвращает множество числовых chat_id из destinations, для которых нет записи в existing_links.
-    URL-назначения игнорируются.
-    """
-    missing: set[int] = set()
-
-    for dest in destinations:
-        raw_cid = dest.get("chat_id")
-        if is_url(raw_cid):
-            continue
-        num_cid = to_int_or_none(raw_cid)
-        if num_cid is None:
-            continue
+async def read_advertisement_texts() -> tuple[str, ...]:
+    """Тексты Лудочат/Практичат/Выручат — читаются параллельно."""
+    return tuple(await asyncio.gather(*(read_advertisement_file(name) for name in ADVERTISEMENT_FILES)))
 
-        found = any(eq_chat_id(link.get("chat_id"), num_cid) for link in existing_links)
-        if not found:
-            missing.add(num_cid)
 
-    return missing
-
-
-async def send_resources_message(bot, user, uid: int, refresh: bool = False, previous_message_id: int | None = None):
+async def _post_log_channel(uid: int, log_lines: list[str]) -> None:
+    try:
+        log_message = f"🔗 Ссылки актуальны\nПользователь: {uid}\n" + "\n".join(log_lines)
+        await send_chunked_message(LOG_CHANNEL_ID, log_message, parse_mode=None, reply_markup=None, allow_group=True)
+    except Exception as e:
+        logging.error(f"user_id={uid} – ошибка отправки лога в канал: {e}", extra={"user_id": uid})
+
+
+async def send_resources_message(
+    bot,
+    user,
+    uid: int,
+    refresh: bool = False,
+    previous_message_id: int | None = None,
+    *,
+    all_links: list[dict] | None = None,
+    texts: tuple[str, ...] | None = None,
+    before_generate: Callable[[], Awaitable[Any]] | None = None,
+):
     """
     Отправляет сообщение с ресурсами.
     При refresh=True — регенерирует все числовые инвайты.
-    Без refresh — догенерирует ТОЛЬКО недостающие.
+    Без refresh — догенерирует ТОЛЬКО недостающие и истёкшие.
+    all_links/texts — уже загруженные входы (граф /start читает их параллельно с записями в БД);
+    если не переданы — читаются здесь, тоже параллельно. Лог-канал — уже после ответа пользователю, в фоне.
+    before_generate — ждётся только перед созданием инвайтов (например, апсёрт user: FK при сохранении ссылки).
     """
     try:
-        bot_info = await bot.get_me()
         logging.debug(
-            f"user_id={uid} – user: {user.full_name} (@{user.username or 'нет'}), bot: @{bot_info.username}, ID: {bot_info.id}",
+            f"user_id={uid} – user: {user.full_name} (@{user.username or 'нет'})",
             extra={"user_id": uid}
         )
 
-        # 1) Загружаем текущие ссылки
-        all_links = await get_all_invite_links(uid)
-        logging.info(f"user_id={uid} – найдено ссылок в БД: {len(all_links)}", extra={"user_id": uid})
-
-        # 2) Генерация: полная (refresh) или частичная (только отсутствующие)
-        generated_buttons: list[list[dict]] = []
-        if refresh:
-            logging.info(f"user_id={uid} – refresh=True → регенерируем все (числовые) ссылки", extra={"user_id": uid})
-            _, generated_buttons = await generate_invite_links(
-                bot,
-                user=user,
-                uid=uid,
-                PRIVATE_DESTINATIONS=PRIVATE_DESTINATIONS,
-                verify_user=None,
-                ERROR_LOG_CHANNEL_ID=None,
-                only_chat_ids=None,
-            )
-            all_links = await get_all_invite_links(uid)
-        else:
-            missing_ids = _compute_missing_chat_ids(PRIVATE_DESTINATIONS, all_links)
-            if missing_ids:
-                logging.info(
-                    f"user_id={uid} – отсутствуют ссылки для chat_id: {sorted(missing_ids)} → генерируем",
-                    extra={"user_id": uid},
-                )
-                _, generated_buttons = await generate_invite_links(
-                    bot,
-                    user=user,
-                    uid=uid,
-                    PRIVATE_DESTINATIONS=PRIVATE_DESTINATIONS,
-                    verify_user=None,
-                    ERROR_LOG_CHANNEL_ID=None,
-                    only_chat_ids=missing_ids,
-                )
-                all_links = await get_all_invite_links(uid)
-            else:
-                logging.info(f"user_id={uid} – все назначения уже есть в БД", extra={"user_id": uid})
-
-        # 3) Маппинг title -> url из (а) .env URL, (б) БД, (в) свежесгенерированных кнопок
-        title_to_url: dict[str, str] = {}
-
-        # (а) прямые URL из .env
-        for dest in PRIVATE_DESTINATIONS:
-            if is_url(dest["chat_id"]):
-                title_to_url[dest["title"]] = dest["chat_id"]
-
-        # (б) по БД для числовых chat_id
-        for dest in PRIVATE_DESTINATIONS:
-            raw_cid = dest["chat_id"]
-            if is_url(raw_cid):
-                continue
-            num_cid = to_int_or_none(raw_cid)
-            if num_cid is None:
-                continue
-            link = next((x.get("invite_link") for x in all_links if eq_chat_id(x.get("chat_id"), num_cid)), None)
-            if link:
-                title_to_url[dest["title"]] = link
-
-        # (в) свежие кнопки перекрывают всё
-        for row in generated_buttons:
-            if row and isinstance(row[0], dict):
-                t = row[0].get("text")
-                u = row[0].get("url")
-                if t and u:
-                    title_to_url[t] = u
-
-        # 4) Тексты
-        advertisement_1_text = await read_advertisement_file("advertisement_1.html")  # Лудочат
-        advertisement_2_text = await read_advertisement_file("advertisement_2.html")  # Практичат
-        advertisement_3_text = await read_advertisement_file("advertisement_3.html")  # Выручат
-
-        url_ludo = title_to_url.get("Лудочат")
-        url_prak = title_to_url.get("Практичат")
-        url_vyru = title_to_url.get("Выручат")
-
-        logging.info(
-            f"user_id={uid} – URLs: Ludo={'+' if url_ludo else '-'}, Prak={'+' if url_prak else '-'}, Vyru={'+' if url_vyru else '-'}",
-            extra={"user_id": uid}
+        # 1) Ссылки: актуальные из БД, недостающие/истёкшие — новые (refresh — все числовые), тексты — параллельно
+        texts_task = asyncio.ensure_future(read_advertisement_texts()) if texts is None else None
+        invites = await resolve_invite_links(
+            bot,
+            user,
+            uid,
+            existing_links=all_links,
+            refresh=refresh,
+            before_create=before_generate,
         )
 
+        # 2) Тексты
+        if texts_task is not None:
+            texts = await texts_task
+        advertisement_1_text, advertisement_2_text, advertisement_3_text = texts
+
+        url_ludo = invites.url_for("Лудочат")
+        url_prak = invites.url_for("Практичат")
+        url_vyru = invites.url_for("Выручат")
+
         intro = (
             "Привет! Это бот с информацией для зависимых от азартных игр. "
             "Изучайте ссылки, пользуйтесь нашими инструментами и налаживайте жизнь.\n\n"
@@ -208,7 +151,7 @@ async def send_resources_message(bot, user, uid: int, refresh: bool = False, pre
             else "Ссылки временно недоступны. Нажмите «Меню» и попробуйте «Обновить ссылки»."
         )
 
-        # 5) Клавиатура
+        # 3) Клавиатура
         row1 = []
         if url_ludo:
             row1.append(InlineKeyboardButton(text="Лудочат", url=url_ludo))
@@ -236,20 +179,12 @@ async def send_resources_message(bot, user, uid: int, refresh: bool = False, pre
             reply_markup=keyboard,
         )
 
-        # 6) Лог-канал
-        try:
-            log_lines = []
-            if url_ludo:
-                log_lines.append(f"Лудочат: {url_ludo}")
-            if url_prak:
-                log_lines.append(f"Практичат: {url_prak}")
-            if url_vyru:
-                log_lines.append(f"Выручат: {url_vyru}")
-            if LOG_CHANNEL_ID and log_lines:
-                log_message = f"🔗 Ссылки актуальны\nПользователь: {uid}\n" + "\n".join(log_lines)
-                await send_chunked_message(LOG_CHANNEL_ID, log_message, parse_mode=None, reply_markup=None, allow_group=True)
-        except Exception as e:
-            logging.error(f"user_id={uid} – ошибка отправки лога в канал: {e}", extra={"user_id": uid})
+        # 4) Лог-канал — в фоне, пользователь его не ждёт
+        log_lines = invites.log_lines()
+        if LOG_CHANNEL_ID and log_lines:
+            task = asyncio.create_task(_post_log_channel(uid, log_lines))
+            _background.add(task)
+            task.add_done_callback(_background.discard)
 
     except Exception as e:
         logging.error(f"user_id={uid} – ошибка при отправке сообщения с ресурсами: {e}", extra={"user_id": uid})
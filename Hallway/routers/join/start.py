@@ -1,6 +1,10 @@
 # start.py
 # Этап 3: инициализация дефолтов подписок (OFF/ON/ON) после add_user_and_membership.
 # Режим SHOW_WELCOME=2: шлём приветствие БЕЗ кнопок и сразу основное сообщение (как при SHOW_WELCOME=0), с авто-подтверждением.
+# Записи /start (user, membership, подписки, terms) уходят одним окном пакетной записи storage.
+# Шаги собраны в граф (common/utils/task_graph.py): записи в БД, чтение ссылок и текстов, get_me идут параллельно,
+# ответ пользователю уходит, как только готовы его входы; трекинг ссылки и лог-канал — после ответа.
+# Время от /start до первого ответа — в логе и в /stats (latency.start_ttfb).
 
 import time
 import logging
@@ -10,13 +14,16 @@ from aiogram import Router, F
 from aiogram.types import Message, InlineKeyboardButton, InlineKeyboardMarkup
 
 from common.utils import get_bot, join_requests
+from common.utils.latency import LatencyWindow
+from common.utils.task_graph import TaskGraph
 from storage import (
     has_terms_accepted as has_user_accepted,
     track_link_visit,
     set_terms_accepted as set_user_accepted,
+    get_all_invite_links,
 )
 from Hallway.routers.join import membership as membership
-from Hallway.routers.join.resources import send_resources_message, send_chunked_message
+from Hallway.routers.join.resources import send_resources_message, send_chunked_message, read_advertisement_texts
 from messages import get_welcome_text
 
 # ⬇️ Импортируем из services/subscriptions
@@ -24,13 +31,16 @@ from Hallway.services.subscriptions import ensure_user_subscriptions_defaults
 
 router = Router()
 
+# /start → первый ответ пользователю (приветствие или ресурсы), мс
+start_ttfb = LatencyWindow("start_ttfb")
+
 
 @router.message(F.chat.type == "private", F.text.startswith("/start"))
 async def process_start(message: Message):
     bot = get_bot()
     uid = message.from_user.id
     parts = message.text.split()
-    bot_username = (await bot.get_me()).username or ""
+    g = TaskGraph("/start", user_id=uid)
 
     # Нормализуем режим приветствия к int: 0|1|2
     try:
@@ -39,6 +49,8 @@ async def process_start(message: Message):
         # На случай, если SHOW_WELCOME придёт как bool/str
         welcome_mode = 1 if getattr(config, "SHOW_WELCOME", True) else 0
 
+    track_key = parts[1] if len(parts) == 2 and parts[1] not in ("start",) and not parts[1].startswith("verify_") else None
+
     async def _safe_track(key: str):
         try:
             await track_link_visit(key)
@@ -48,136 +60,168 @@ async def process_start(message: Message):
                 extra={"user_id": uid}
             )
 
-    # 1) Регистрируем пользователя и membership в BOT_ID (идемпотентно)
-    try:
-        await membership.add_user_and_membership(message.from_user, config.BOT_ID)
-        # 2) Дефолты подписок OFF/ON/ON (идемпотентно)
-        try:
-            await ensure_user_subscriptions_defaults(uid)
-        except Exception as exc:
-            logging.error(
-                f"user_id={uid} – Ошибка инициализации подписок: {exc}",
-                extra={"user_id": uid}
-            )
-    except Exception as exc:
-        logging.exception(
-            f"user_id={uid} – Ошибка add_user_and_membership: {exc}",
-            extra={"user_id": uid}
-        )
+    # 1) Регистрируем пользователя и membership в BOT_ID, 2) дефолты подписок OFF/ON/ON (всё идемпотентно),
+    # при SHOW_WELCOME=0/2 — ещё и авто-подтверждение условий.
+    # Записи ставятся в пакетную очередь storage в этом порядке (задачи gather стартуют по очереди,
+    # каждая ставит свои записи до первого ожидания) и уходят одним окном, порядок по user_id сохраняется.
+    async def _writes():
+        writes = [
+            membership.add_user_and_membership(message.from_user, config.BOT_ID),
+            ensure_user_subscriptions_defaults(uid),
+        ]
+        if welcome_mode in (0, 2):
+            writes.append(set_user_accepted(uid))
+        results = await asyncio.gather(*writes, return_exceptions=True)
+        for what, res in zip(("add_user_and_membership", "инициализации подписок", "auto set_terms_accepted"), results):
+            if isinstance(res, BaseException):
+                logging.error(
+                    f"user_id={uid} – Ошибка {what}: {res}",
+                    extra={"user_id": uid}
+                )
+
+    # Граф: всё, что не зависит друг от друга, стартует сразу
+    g.add("writes", _writes)
+    g.add("links", lambda: get_all_invite_links(uid))
+    g.add("texts", read_advertisement_texts)
+    if welcome_mode == 1:
+        g.add("me", bot.me)  # getMe — один раз на процесс, дальше из кеша aiogram
+        g.add("accepted", lambda: has_user_accepted(uid))
+
+    def _first_byte(what: str) -> None:
+        if "first_byte" in g.marks:
+            return
+        ms = g.mark("first_byte")
+        start_ttfb.add(ms)
+        logging.info(f"user_id={uid} – /start: первый ответ через {ms:.0f} мс ({what})", extra={"user_id": uid})
+
+    async def _send_resources(for_uid: int):
+        # генерация недостающих инвайтов сохраняет их с FK на user — она ждёт записи /start;
+        # если все ссылки уже есть, ответ записи не ждёт
+        prefetched = {"before_generate": lambda: g.get("writes")}
+        if for_uid == uid:
+            try:
+                prefetched["all_links"] = await g.get("links")
+            except Exception:
+                pass  # прочитаем ещё раз внутри
+            prefetched["texts"] = await g.get("texts")
+        await send_resources_message(bot, message.from_user, for_uid, **prefetched)
+        _first_byte("ресурсы")
+
+    def _after_reply():
+        # трекинг старт-параметра — после ответа пользователю
+        if track_key:
+            g.add("track", lambda: _safe_track(track_key))
 
-    # 3) SHOW_WELCOME=0 — без приветствия: авто-подтверждение и сразу ресурсы (как было)
-    if welcome_mode == 0:
-        try:
-            await set_user_accepted(uid)
+    try:
+        # 3) SHOW_WELCOME=0 — без приветствия: авто-подтверждение (в записях выше) и сразу ресурсы (как было)
+        if welcome_mode == 0:
             logging.info(
                 f"user_id={uid} – Условие принято автоматически (SHOW_WELCOME=0)",
                 extra={"user_id": uid}
             )
-        except Exception as exc:
-            logging.exception(
-                f"user_id={uid} – Ошибка при auto set_terms_accepted: {exc}",
-                extra={"user_id": uid}
-            )
-        if len(parts) == 2 and parts[1] not in ("start",) and not parts[1].startswith("verify_"):
-            asyncio.create_task(_safe_track(parts[1]))
-        return await send_resources_message(bot, message.from_user, uid)
-
-    # 3a) SHOW_WELCOME=2 — отправляем приветственный текст БЕЗ кнопок, затем авто-подтверждение и сразу ресурсы
-    if welcome_mode == 2:
-        # Приветствие — чистый текст, без клавиатуры и ожиданий
-        try:
-            await send_chunked_message(
-                uid,
-                get_welcome_text(),
-                parse_mode="HTML",
-                disable_web_page_preview=True,
-                reply_markup=None,  # ключевое: никаких инлайн-кнопок «подтвердить»
-            )
-            logging.info(
-                f"user_id={uid} – Приветствие отправлено (SHOW_WELCOME=2, без кнопок)",
-                extra={"user_id": uid}
-            )
-        except Exception as exc:
-            logging.error(
-                f"user_id={uid} – Ошибка отправки приветствия (SHOW_WELCOME=2): {exc}",
-                extra={"user_id": uid}
-            )
+            await _send_resources(uid)
+            return _after_reply()
+
+        # 3a) SHOW_WELCOME=2 — отправляем приветственный текст БЕЗ кнопок (ему ничего не нужно ждать),
+        # авто-подтверждение (в записях выше) и сразу ресурсы
+        if welcome_mode == 2:
+            # Приветствие — чистый текст, без клавиатуры и ожиданий
+            try:
+                await send_chunked_message(
+                    uid,
+                    get_welcome_text(),
+                    parse_mode="HTML",
+                    disable_web_page_preview=True,
+                    reply_markup=None,  # ключевое: никаких инлайн-кнопок «подтвердить»
+                )
+                _first_byte("приветствие")
+                logging.info(
+                    f"user_id={uid} – Приветствие отправлено (SHOW_WELCOME=2, без кнопок)",
+                    extra={"user_id": uid}
+                )
+            except Exception as exc:
+                logging.error(
+                    f"user_id={uid} – Ошибка отправки приветствия (SHOW_WELCOME=2): {exc}",
+                    extra={"user_id": uid}
+                )
 
-        # Авто-подтверждение условий (аналог ветки verify_/SHOW_WELCOME=0)
-        try:
-            await set_user_accepted(uid)
             logging.info(
                 f"user_id={uid} – Условие принято автоматически (SHOW_WELCOME=2)",
                 extra={"user_id": uid}
             )
-        except Exception as exc:
-            logging.exception(
-                f"user_id={uid} – Ошибка при auto set_terms_accepted (SHOW_WELCOME=2): {exc}",
-                extra={"user_id": uid}
-            )
-
-        # Трекинг старт-параметра, если он есть и это не служебные «start/verify_»
-        if len(parts) == 2 and parts[1] not in ("start",) and not parts[1].startswith("verify_"):
-            asyncio.create_task(_safe_track(parts[1]))
-
-        # Основное сообщение (ресурсы/кнопки)
-        return await send_resources_message(bot, message.from_user, uid)
 
-    # 4) SHOW_WELCOME=1 и пользователь уже принял ранее — сразу ресурсы (как было)
-    if await has_user_accepted(uid):
-        if len(parts) == 2 and parts[1] not in ("start",) and not parts[1].startswith("verify_"):
-            asyncio.create_task(_safe_track(parts[1]))
-        return await send_resources_message(bot, message.from_user, uid)
-
-    # 5) Обработка verify_ подтверждения (как было)
-    if len(parts) == 2 and parts[1].startswith("verify_"):
-        try:
-            orig = int(parts[1].split("_", 1)[1])
-        except Exception:
-            orig = uid
-        ts = join_requests.get(orig)
-        if ts is None or time.time() - ts > 300:
+            # Основное сообщение (ресурсы/кнопки)
+            await _send_resources(uid)
+            return _after_reply()
+
+        # 4) SHOW_WELCOME=1 и пользователь уже принял ранее — сразу ресурсы (как было)
+        if await g.get("accepted"):
+            await _send_resources(uid)
+            return _after_reply()
+
+        bot_username = (await g.get("me")).username or ""
+
+        # 5) Обработка verify_ подтверждения (как было)
+        if len(parts) == 2 and parts[1].startswith("verify_"):
+            try:
+                orig = int(parts[1].split("_", 1)[1])
+            except Exception:
+                orig = uid
+            ts = join_requests.get(orig)
+            if ts is None or time.time() - ts > 300:
+                join_requests.pop(orig, None)
+                logging.warning(
+                    f"user_id={uid} – verify_{orig} истёк или не найден",
+                    extra={"user_id": uid}
+                )
+                reply = await message.reply(
+                    "⏰ Время ожидания вышло. Отправьте /start ещё раз.",
+                    reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+                        InlineKeyboardButton(
+                            text="/start",
+                            url=f"https://t.me/{bot_username}?start=start"
+                        )
+                    ]])
+                )
+                _first_byte("verify истёк")
+                return reply
             join_requests.pop(orig, None)
-            logging.warning(
-                f"user_id={uid} – verify_{orig} истёк или не найден",
-                extra={"user_id": uid}
-            )
-            return await message.reply(
-                "⏰ Время ожидания вышло. Отправьте /start ещё раз.",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
-                    InlineKeyboardButton(
-                        text="/start",
-                        url=f"https://t.me/{bot_username}?start=start"
-                    )
-                ]])
-            )
-        join_requests.pop(orig, None)
-        try:
-            await set_user_accepted(orig)
-            logging.info(
-                f"user_id={uid} – Условие принято (verify_{orig})",
-                extra={"user_id": uid}
-            )
-        except Exception as exc:
-            logging.exception(
-                f"user_id={uid} – Ошибка set_terms_accepted: {exc}",
-                extra={"user_id": uid}
+
+            async def _accept():
+                await set_user_accepted(orig)
+                logging.info(
+                    f"user_id={uid} – Условие принято (verify_{orig})",
+                    extra={"user_id": uid}
+                )
+
+            # подтверждение пишется параллельно с отправкой ресурсов
+            g.add("accept", _accept)
+            await _send_resources(orig)
+            try:
+                await g.get("accept")
+            except Exception as exc:
+                logging.exception(
+                    f"user_id={uid} – Ошибка set_terms_accepted: {exc}",
+                    extra={"user_id": uid}
+                )
+            return
+
+        # 6) Первый /start при SHOW_WELCOME=1 – показываем приветствие с кнопкой подтверждения (как было)
+        join_requests[uid] = time.time()
+        confirm_link = f"https://t.me/{bot_username}?start=verify_{uid}"
+        kb = InlineKeyboardMarkup(inline_keyboard=[[
+            InlineKeyboardButton(
+                text="✅ Я согласен(а) и ознакомлен(а) со всем",
+                url=confirm_link
             )
-        return await send_resources_message(bot, message.from_user, orig)
-
-    # 6) Первый /start при SHOW_WELCOME=1 – показываем приветствие с кнопкой подтверждения (как было)
-    join_requests[uid] = time.time()
-    confirm_link = f"https://t.me/{bot_username}?start=verify_{uid}"
-    kb = InlineKeyboardMarkup(inline_keyboard=[[
-        InlineKeyboardButton(
-            text="✅ Я согласен(а) и ознакомлен(а) со всем",
-            url=confirm_link
+        ]])
+        await send_chunked_message(
+            uid,
+            get_welcome_text(),
+            parse_mode="HTML",
+            disable_web_page_preview=True,
+            reply_markup=kb,
         )
-    ]])
-    await send_chunked_message(
-        uid,
-        get_welcome_text(),
-        parse_mode="HTML",
-        disable_web_page_preview=True,
-        reply_markup=kb,
-    )
+        _first_byte("приветствие с подтверждением")
+    finally:
+        logging.debug(f"user_id={uid} – /start: шаги (мс от начала) {g.summary()}", extra={"user_id": uid})
@@ -0,0 +1,56 @@
+# Hallway/services/destinations.py
+# PRIVATE_DESTINATIONS, разобранные один раз при загрузке конфига: числовой чат (инвайты создаём) или прямой URL.
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional, Tuple
+
+import config
+from common.utils.chatlink import is_url, to_int_or_none
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Destination:
+    """
+    chat_id — числовой чат, для него создаются инвайты;
+    url     — прямая ссылка из .env (chat_id тогда None).
+    """
+
+    title: str
+    description: str
+    chat_id: Optional[int] = None
+    url: Optional[str] = None
+
+
+def parse_destinations(raw: Iterable[dict[str, Any]]) -> Tuple[Destination, ...]:
+    out: list[Destination] = []
+    for dest in raw:
+        if not all(k in dest for k in ("title", "chat_id", "description")):
+            log.error("Некорректный PRIVATE_DESTINATIONS: %s", dest, extra={"user_id": "system"})
+            continue
+        raw_cid = dest["chat_id"]
+        if is_url(raw_cid):
+            out.append(Destination(dest["title"], dest.get("description", ""), url=str(raw_cid)))
+            continue
+        num_cid = to_int_or_none(raw_cid)
+        if num_cid is None:
+            log.error(
+                "PRIVATE_DESTINATIONS: %s — chat_id не число и не URL: %r",
+                dest["title"], raw_cid, extra={"user_id": "system"},
+            )
+            continue
+        out.append(Destination(dest["title"], dest.get("description", ""), chat_id=num_cid))
+    return tuple(out)
+
+
+DESTINATIONS: Tuple[Destination, ...] = parse_destinations(config.PRIVATE_DESTINATIONS)
+
+# числовые чаты в порядке конфига, без повторов
+INVITE_CHAT_IDS: Tuple[int, ...] = tuple(dict.fromkeys(d.chat_id for d in DESTINATIONS if d.chat_id is not None))
+
+
+__all__ = ["Destination", "parse_destinations", "DESTINATIONS", "INVITE_CHAT_IDS"]
@@ -0,0 +1,302 @@
+# Hallway/services/invite_gc.py
+# Фоновый сборщик инвайтов: истёкшие и невыданные ссылки отзываются в Telegram (revoke_chat_invite_link)
+# пачками с ограничением скорости, строки в БД чистятся — лимит ссылок чата не упирается в /start.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+import config
+from common.db_api import db_deadline
+from common.utils.ratelimit import TokenBucket
+from storage import get_expired_invite_links, delete_invite_link
+
+log = logging.getLogger(__name__)
+
+Key = Tuple[int, str]
+
+# ответы Telegram «ссылки уже нет» — отзывать нечего, строку в БД можно удалять
+_GONE_MARKERS = ("invite_hash_expired", "invite_hash_invalid", "link not found", "invite link not found", "revoked")
+
+
+class InviteLinkGC:
+    """
+    - schedule(chat_id, link, user_id=None) — не блокирует: ссылка встанет в очередь на отзыв
+      (user_id задан — после отзыва удаляется и строка (user_id, chat_id) в БД, если в ней всё ещё эта ссылка);
+    - раз в interval секунд воркер берёт из БД ссылки, истёкшие больше grace секунд назад
+      (grace — запас для того, кто получил ссылку за минуту до истечения), и ставит их в очередь;
+      полная страница — следующая берётся, когда очередь разобрана; строки отдыхающих назначений и уже
+      виденные в этом проходе пропускаются (offset сдвигается за них) — мёртвый чат не держит остальных;
+    - очередь отзывается пачками по batch_size, не быстрее rate вызовов/с; 429 — пауза retry_after;
+    - у назначения нет прав (бот не админ и т.п.) — его ссылки отдыхают cooldown секунд;
+    - kick() — внеочередной проход (например, чат упёрся в лимит ссылок).
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = 300.0,
+        batch_size: int = 100,
+        rate: float = 2.0,
+        grace: float = 600.0,
+        cooldown: float = 300.0,
+        max_attempts: int = 5,
+    ) -> None:
+        self.interval = max(1.0, float(interval))
+        self.batch_size = max(1, int(batch_size))
+        self.grace = max(0.0, float(grace))
+        self.cooldown = max(1.0, float(cooldown))
+        self.max_attempts = max(1, int(max_attempts))
+        self._bucket = TokenBucket(max(0.01, float(rate)))
+
+        # (chat_id, ссылка) → (user_id строки в БД или None, попытка)
+        self._queue: "OrderedDict[Key, Tuple[Optional[int], int]]" = OrderedDict()
+        self._cooling: Dict[int, float] = {}
+        self._stats: Dict[int, Counter] = {}
+        self._scan_supported = True
+        self._next_scan = 0.0
+        # проход по истёкшим ссылкам: offset следующей страницы, ключи, уже виденные в проходе, есть ли ещё страницы
+        self._scan_offset = 0
+        self._scan_seen: set[Key] = set()
+        self._scan_more = False
+        self._bot = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _count(self, chat_id: int, what: str, n: int = 1) -> None:
+        self._stats.setdefault(chat_id, Counter())[what] += n
+
+    # ---------- producer side ----------
+
+    def schedule(self, chat_id: int, invite_link: str, user_id: Optional[int] = None) -> bool:
+        """Ставит ссылку на отзыв. False — уже стоит в очереди."""
+        if not invite_link:
+            return False
+        key = (int(chat_id), str(invite_link))
+        if key in self._queue:
+            return False
+        self._queue[key] = (user_id, 1)
+        self._count(key[0], "queued")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def kick(self) -> None:
+        """Внеочередной проход: сканирование БД и отзыв — не дожидаясь interval."""
+        self._next_scan = 0.0
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        per_chat: Dict[str, Dict[str, Any]] = {}
+        for cid, counter in self._stats.items():
+            st = dict(counter)
+            if self._cooling.get(cid, 0.0) > now:
+                st["cooling"] = True
+            per_chat[str(cid)] = st
+        return {"pending": len(self._queue), "db_scan": self._scan_supported, "chats": per_chat}
+
+    def start(self, bot) -> None:
+        self._bot = bot
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            # может стартовать из обработчика — его бюджет DB-API на фоновую работу не распространяется
+            with db_deadline(None):
+                self._task = asyncio.create_task(self._run(), name="invite_gc")
+
+    # ---------- worker ----------
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            # следующая страница — только когда разобрано всё, что можно отзывать сейчас
+            next_page = self._scan_more and not self._has_ready(now)
+            if self._scan_supported and (now >= self._next_scan or next_page):
+                if now >= self._next_scan:
+                    self._next_scan = now + self.interval
+                try:
+                    await self._scan()
+                except Exception as e:
+                    self._end_pass()
+                    log.warning("Сборщик инвайтов: не удалось выбрать истёкшие ссылки: %s", e, extra={"user_id": "system"})
+
+            batch = self._take_batch()
+            if batch:
+                await self._revoke_batch(batch)
+                continue
+            if self._scan_supported and self._scan_more:
+                continue  # страница целиком из отдыхающих/виденных ссылок — сразу следующая
+
+            now = time.monotonic()
+            wake_in = self._next_scan - now if self._scan_supported else self.interval
+            cooling = [t - now for t in self._cooling.values() if t > now]
+            if self._queue and cooling:
+                wake_in = min(wake_in, min(cooling))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(1.0, wake_in))
+            except asyncio.TimeoutError:
+                pass
+
+    def _has_ready(self, now: float) -> bool:
+        return any(self._cooling.get(cid, 0.0) <= now for cid, _ in self._queue)
+
+    def _end_pass(self) -> None:
+        self._scan_offset = 0
+        self._scan_seen.clear()
+        self._scan_more = False
+
+    async def _scan(self) -> None:
+        limit = self.batch_size * 10
+        before = (datetime.now(timezone.utc) - timedelta(seconds=self.grace)).isoformat()
+        rows = await get_expired_invite_links(before, limit, self._scan_offset)
+        if rows is None:
+            self._scan_supported = False
+            self._end_pass()
+            log.info(
+                "Сборщик инвайтов: у DB-API нет выборки истёкших ссылок — отзываем только заменённые и невыданные",
+                extra={"user_id": "system"},
+            )
+            return
+        now = time.monotonic()
+        added = fresh = 0
+        for row in rows:
+            try:
+                cid, uid = int(row["chat_id"]), int(row["user_id"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            key = (cid, str(row.get("invite_link") or ""))
+            if key in self._scan_seen:
+                continue
+            self._scan_seen.add(key)
+            fresh += 1
+            if self._cooling.get(cid, 0.0) > now:
+                self._count(cid, "skipped")  # назначение отдыхает — вернёмся в следующем проходе
+                continue
+            added += self.schedule(cid, key[1], uid)
+        if added:
+            log.info("Сборщик инвайтов: в очередь на отзыв %s истёкших ссылок", added, extra={"user_id": "system"})
+        if len(rows) < limit:
+            self._end_pass()  # проход закончен — следующий через interval
+            return
+        if fresh:
+            # отозванные строки из БД удалятся, остальные останутся — следующая страница начинается за ними
+            self._scan_offset += len(rows) - added
+        elif self._scan_offset + len(rows) <= len(self._scan_seen):
+            # страница из уже виденных (ещё в очереди или не отозваны) — перешагиваем её целиком
+            self._scan_offset += len(rows)
+        else:
+            # виденных строк меньше, чем пройдено: бэк не понимает offset и отдаёт то же самое
+            self._end_pass()
+            return
+        self._scan_more = True
+
+    def _take_batch(self) -> List[Tuple[Key, Optional[int], int]]:
+        now = time.monotonic()
+        batch: List[Tuple[Key, Optional[int], int]] = []
+        for key, (uid, attempt) in list(self._queue.items()):
+            if len(batch) >= self.batch_size:
+                break
+            if self._cooling.get(key[0], 0.0) > now:
+                continue
+            del self._queue[key]
+            batch.append((key, uid, attempt))
+        return batch
+
+    async def _revoke_batch(self, batch: List[Tuple[Key, Optional[int], int]]) -> None:
+        revoked: List[Tuple[Key, Optional[int]]] = []
+        for i, (key, uid, attempt) in enumerate(batch):
+            cid, link = key
+            if self._cooling.get(cid, 0.0) > time.monotonic():
+                self._requeue(key, uid, attempt, count=False)
+                continue
+            await self._bucket.acquire()
+            try:
+                await self._bot.revoke_chat_invite_link(chat_id=cid, invite_link=link)
+            except TelegramRetryAfter as e:
+                log.warning("Сборщик инвайтов: 429, пауза %s с", e.retry_after, extra={"user_id": "system"})
+                self._bucket.pause(e.retry_after)
+                for rest_key, rest_uid, rest_attempt in batch[i:]:
+                    self._requeue(rest_key, rest_uid, rest_attempt, count=False)
+                break
+            except TelegramBadRequest as e:
+                text = str(e).lower()
+                if any(m in text for m in _GONE_MARKERS):
+                    self._count(cid, "gone")
+                    revoked.append((key, uid))
+                else:
+                    self._chat_failed(cid, e)
+                    self._requeue(key, uid, attempt)
+                continue
+            except Exception as e:
+                self._chat_failed(cid, e)
+                self._requeue(key, uid, attempt)
+                continue
+            self._count(cid, "revoked")
+            revoked.append((key, uid))
+
+        deletes = [((cid, link), uid) for (cid, link), uid in revoked if uid is not None]
+        results = await asyncio.gather(
+            *(delete_invite_link(uid, cid, link) for (cid, link), uid in deletes),
+            return_exceptions=True,
+        )
+        for ((cid, _), uid), res in zip(deletes, results):
+            if isinstance(res, BaseException):
+                # строка останется истёкшей — следующий скан вернёт её, отзыв ответит «ссылки нет»
+                self._count(cid, "db_errors")
+            else:
+                self._count(cid, "db_deleted")
+        if revoked:
+            log.info(
+                "Сборщик инвайтов: отозвано %s ссылок, в очереди %s",
+                len(revoked), len(self._queue), extra={"user_id": "system"},
+            )
+
+    def _chat_failed(self, chat_id: int, error: Exception) -> None:
+        self._count(chat_id, "errors")
+        if self._cooling.get(chat_id, 0.0) <= time.monotonic():
+            log.warning(
+                "Сборщик инвайтов: chat=%s — отзыв не удался (%s), пауза %.0f с",
+                chat_id, error, self.cooldown, extra={"user_id": "system"},
+            )
+        self._cooling[chat_id] = time.monotonic() + self.cooldown
+
+    def _requeue(self, key: Key, user_id: Optional[int], attempt: int, *, count: bool = True) -> None:
+        if count:
+            attempt += 1
+        if attempt > self.max_attempts:
+            self._count(key[0], "failed")
+            return
+        self._queue.setdefault(key, (user_id, attempt))
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+_gc: Optional[InviteLinkGC] = None
+
+
+def get_invite_gc() -> InviteLinkGC:
+    """Общий сборщик процесса (создаётся лениво)."""
+    global _gc
+    if _gc is None:
+        _gc = InviteLinkGC(
+            interval=getattr(config, "INVITE_GC_INTERVAL", 300.0),
+            batch_size=getattr(config, "INVITE_GC_BATCH", 100),
+            rate=getattr(config, "INVITE_GC_RATE", 2.0),
+        )
+    return _gc
+
+
+__all__ = ["InviteLinkGC", "get_invite_gc"]
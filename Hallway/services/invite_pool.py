@@ -0,0 +1,181 @@
+# Hallway/services/invite_pool.py
+# Пул заранее созданных одноразовых инвайтов (member_limit=1) по каждому числовому назначению PRIVATE_DESTINATIONS:
+# /start берёт готовую ссылку из памяти вместо create_chat_invite_link на пути пользователя.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, Iterable, Optional, Tuple
+
+from aiogram.exceptions import TelegramRetryAfter
+
+import config
+from common.utils.ratelimit import TokenBucket
+from Hallway.services.destinations import INVITE_CHAT_IDS
+from Hallway.services.invite_gc import get_invite_gc
+
+log = logging.getLogger(__name__)
+
+POOL_LINK_NAME = "pool"
+
+
+class InvitePool:
+    """
+    - take(chat_id) → готовая ссылка или None (пул пуст — вызывающий создаёт ссылку сам, как раньше);
+      одна ссылка выдаётся ровно одному вызывающему (pop из очереди без await);
+    - фоновый воркер держит до size свежих ссылок на назначение и доливает их по одной
+      на назначение за проход, не быстрее rate ссылок/с (общий бюджет на все чаты); 429 — пауза retry_after;
+      ошибка чата (бот не админ, лимит ссылок) — назначение отдыхает cooldown секунд;
+    - ссылка живёт в пуле не дольше max_age: в Telegram она создаётся с expire_date = создание + max_age + link_ttl,
+      так что выданная ссылка действует ещё link_ttl; устаревшие невыданные уходят на отзыв в сборщик (invite_gc).
+    """
+
+    def __init__(
+        self,
+        chat_ids: Iterable[int],
+        *,
+        size: int = 20,
+        rate: float = 1.0,
+        max_age: float = 1800.0,
+        link_ttl: float = 3600.0,
+        cooldown: float = 60.0,
+    ) -> None:
+        self.chat_ids = list(dict.fromkeys(int(c) for c in chat_ids))
+        self.size = max(0, int(size))
+        self.max_age = max(60.0, float(max_age))
+        self.link_ttl = max(60.0, float(link_ttl))
+        self.cooldown = max(1.0, float(cooldown))
+        self._bucket = TokenBucket(max(0.01, float(rate)))
+        # chat_id → очередь (ссылка, monotonic создания), старые слева
+        self._links: Dict[int, Deque[Tuple[str, float]]] = {cid: deque() for cid in self.chat_ids}
+        self._cooling: Dict[int, float] = {}
+        self._stats: Dict[int, Counter] = {cid: Counter() for cid in self.chat_ids}
+        self._bot = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- выдача ----------
+
+    def _drop_stale(self, cid: int, now: float) -> None:
+        queue = self._links[cid]
+        while queue and now - queue[0][1] >= self.max_age:
+            link, _ = queue.popleft()
+            self._stats[cid]["expired"] += 1
+            # невыданная ссылка истечёт и сама, но до тех пор занимает место в лимите ссылок чата
+            get_invite_gc().schedule(cid, link)
+
+    def take(self, chat_id: int) -> Optional[str]:
+        cid = int(chat_id)
+        queue = self._links.get(cid)
+        if queue is None:
+            return None
+        self._drop_stale(cid, time.monotonic())
+        if self._wakeup is not None:
+            self._wakeup.set()
+        if not queue:
+            self._stats[cid]["misses"] += 1
+            return None
+        # самая старая из свежих: ей всё равно осталось не меньше link_ttl, а пул меньше выбрасывает
+        link, _ = queue.popleft()
+        self._stats[cid]["taken"] += 1
+        return link
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for cid in self.chat_ids:
+            st = dict(self._stats[cid])
+            st["ready"] = len(self._links[cid])
+            if self._cooling.get(cid, 0.0) > time.monotonic():
+                st["cooling"] = True
+            out[str(cid)] = st
+        return out
+
+    # ---------- долив ----------
+
+    def start(self, bot) -> None:
+        if not self.chat_ids or self.size <= 0:
+            return
+        self._bot = bot
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="invite_pool")
+
+    async def _create(self, cid: int) -> None:
+        expire = datetime.now(timezone.utc) + timedelta(seconds=self.max_age + self.link_ttl)
+        await self._bucket.acquire()
+        try:
+            invite = await self._bot.create_chat_invite_link(
+                chat_id=cid,
+                member_limit=1,
+                creates_join_request=False,
+                expire_date=expire,
+                name=POOL_LINK_NAME,
+            )
+        except TelegramRetryAfter as e:
+            self._stats[cid]["throttled"] += 1
+            log.warning("Пул инвайтов: 429, пауза %s с", e.retry_after, extra={"user_id": "system"})
+            self._bucket.pause(e.retry_after)
+            return
+        except Exception as e:
+            self._stats[cid]["errors"] += 1
+            self._cooling[cid] = time.monotonic() + self.cooldown
+            log.warning(
+                "Пул инвайтов: chat=%s — не удалось создать ссылку (%s), пауза %.0f с",
+                cid, e, self.cooldown, extra={"user_id": "system"},
+            )
+            return
+        self._links[cid].append((invite.invite_link, time.monotonic()))
+        self._stats[cid]["created"] += 1
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            need = []
+            for cid in self.chat_ids:
+                self._drop_stale(cid, now)
+                if len(self._links[cid]) < self.size and self._cooling.get(cid, 0.0) <= now:
+                    need.append(cid)
+            if not need:
+                # ждём выдачу или ближайшее устаревание/конец паузы
+                wake_in = self.max_age / 4
+                cooling = [t - now for t in self._cooling.values() if t > now]
+                if cooling:
+                    wake_in = min(wake_in, min(cooling))
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(1.0, wake_in))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # по одной ссылке на назначение за проход — пустые чаты не ждут, пока дольют соседний
+            for cid in need:
+                await self._create(cid)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+_pool: Optional[InvitePool] = None
+
+
+def get_invite_pool() -> InvitePool:
+    """Общий пул процесса по числовым chat_id из PRIVATE_DESTINATIONS (создаётся лениво)."""
+    global _pool
+    if _pool is None:
+        _pool = InvitePool(
+            INVITE_CHAT_IDS,
+            size=getattr(config, "INVITE_POOL_SIZE", 20),
+            rate=getattr(config, "INVITE_POOL_RATE", 1.0),
+            max_age=getattr(config, "INVITE_POOL_MAX_AGE", 1800.0),
+        )
+    return _pool
+
+
+__all__ = ["InvitePool", "get_invite_pool"]
@@ -1,184 +1,155 @@
 # Hallway/services/invite_service.py
 from __future__ import annotations
 
+import asyncio
 import logging
+from dataclasses import dataclass
 from datetime import datetime, timezone, timedelta
-from typing import Sequence
+from typing import Any, Awaitable, Callable, Sequence
 
 from aiogram.exceptions import TelegramBadRequest
 
 from storage import get_all_invite_links, save_invite_link
-from common.utils.chatlink import to_int_or_none, is_url, eq_chat_id, parse_exp_aware
+from common.utils.chatlink import to_int_or_none, parse_exp_aware
+from Hallway.services.destinations import Destination, DESTINATIONS
+from Hallway.services.invite_pool import get_invite_pool
+from Hallway.services.invite_gc import get_invite_gc
 
+# срок ссылки в БД; после него ссылка считается отсутствующей и уходит сборщику на отзыв
+INVITE_TTL = timedelta(hours=1)
 
-async def generate_invite_links(
+
+@dataclass(frozen=True)
+class ResolvedLink:
+    """source: url (прямая из .env) / db (актуальная из БД) / pool / created / error (ссылки нет)."""
+
+    dest: Destination
+    url: str | None
+    source: str
+
+
+@dataclass(frozen=True)
+class InviteSet:
+    """Ссылки пользователя по назначениям, в порядке PRIVATE_DESTINATIONS — для текста, кнопок и логов."""
+
+    items: tuple[ResolvedLink, ...]
+
+    def url_for(self, title: str) -> str | None:
+        return next((x.url for x in self.items if x.dest.title == title and x.url), None)
+
+    def buttons(self) -> list[list[dict]]:
+        return [[{"text": x.dest.title, "url": x.url}] for x in self.items if x.url]
+
+    def log_lines(self) -> list[str]:
+        return [f"{x.dest.title}: {x.url}" for x in self.items if x.url]
+
+    def summary(self) -> str:
+        """«Лудочат=db, Практичат=pool, …» — откуда взялась каждая ссылка."""
+        return ", ".join(f"{x.dest.title}={x.source}" for x in self.items)
+
+
+def index_links(existing_links: Sequence[dict]) -> dict[int, dict]:
+    """chat_id → строка из БД (один проход вместо поиска по списку на каждое назначение)."""
+    index: dict[int, dict] = {}
+    for row in existing_links:
+        cid = to_int_or_none(row.get("chat_id"))
+        if cid is not None:
+            index[cid] = row
+    return index
+
+
+async def _create_link(bot, user, uid: int, dest: Destination, replaced_link: str | None) -> ResolvedLink:
+    """Новая ссылка: готовая из пула (без обращения к Telegram), пул пуст — создаём сами."""
+    title = dest.title
+    source = "pool"
+    try:
+        invite_link = get_invite_pool().take(dest.chat_id)
+        if invite_link is None:
+            source = "created"
+            invite = await bot.create_chat_invite_link(
+                chat_id=dest.chat_id,
+                member_limit=1,
+                creates_join_request=False,
+                name=f"Invite for {user.username or user.id}",
+            )
+            invite_link = invite.invite_link
+    except TelegramBadRequest as e:
+        logging.error(f"user_id={uid} – {title}: TelegramBadRequest: {e}", extra={"user_id": uid})
+        # лимит ссылок чата: отзыв старых — дело сборщика (invite_gc), не пути пользователя
+        if "limit" in str(e).lower():
+            get_invite_gc().kick()
+        return ResolvedLink(dest, None, "error")
+    except Exception as e:
+        logging.error(f"user_id={uid} – {title}: ошибка создания инвайта: {e}", extra={"user_id": uid})
+        return ResolvedLink(dest, None, "error")
+
+    now_utc = datetime.now(timezone.utc)
+    try:
+        await save_invite_link(uid, dest.chat_id, invite_link, now_utc.isoformat(), (now_utc + INVITE_TTL).isoformat())
+    except Exception as se:
+        logging.error(f"user_id={uid} – {title}: ошибка сохранения ссылки: {se}", extra={"user_id": uid})
+
+    # новая строка в БД затёрла старую ссылку — сканом её уже не найти, отзываем сразу
+    if replaced_link and replaced_link != invite_link:
+        get_invite_gc().schedule(dest.chat_id, replaced_link)
+    return ResolvedLink(dest, invite_link, source)
+
+
+async def resolve_invite_links(
     bot,
     user,
     uid: int,
-    PRIVATE_DESTINATIONS: Sequence[dict],
-    verify_user=None,
-    ERROR_LOG_CHANNEL_ID: int | None = None,
-    only_chat_ids: set[int] | None = None,
-):
+    *,
+    existing_links: list[dict] | None = None,
+    refresh: bool = False,
+    before_create: Callable[[], Awaitable[Any]] | None = None,
+    destinations: Sequence[Destination] = DESTINATIONS,
+) -> InviteSet:
     """
-    Генерирует инвайты для PRIVATE_DESTINATIONS.
-    Если only_chat_ids задан — создаёт/обновляет ТОЛЬКО для этих chat_id (числовых).
-    Возвращает:
-      - links: list[tuple[title, url, desc]]
-      - buttons: list[[{"text": title, "url": url}]]
+    Ссылки пользователя по всем назначениям:
+    - URL из .env — как есть;
+    - числовой чат — актуальная (не истёкшая) ссылка из БД, иначе новая (refresh=True — новая всегда);
+      недостающие создаются параллельно по назначениям.
+    existing_links — уже прочитанные ссылки пользователя (чтобы не читать БД повторно).
+    before_create — ждётся только если что-то создаём (например, апсёрт user: FK при сохранении ссылки).
     """
-    try:
-        existing_links = await get_all_invite_links(uid)
-    except Exception as e:
-        logging.error(f"user_id={uid} – ошибка чтения ссылок из БД: {e}", extra={"user_id": uid})
-        existing_links = []
+    if existing_links is None:
+        try:
+            existing_links = await get_all_invite_links(uid)
+        except Exception as e:
+            logging.error(f"user_id={uid} – ошибка чтения ссылок из БД: {e}", extra={"user_id": uid})
+            existing_links = []
 
+    index = index_links(existing_links)
     now_utc = datetime.now(timezone.utc)
-    links: list[tuple[str, str, str]] = []
-    buttons: list[list[dict]] = []
+    items: list[ResolvedLink | None] = []
+    to_create: dict[int, str | None] = {}  # позиция назначения → ссылка, которую новая заменит
 
-    for dest in PRIVATE_DESTINATIONS:
-        if not all(k in dest for k in ("title", "chat_id", "description")):
-            logging.error(f"user_id={uid} – некорректный PRIVATE_DESTINATIONS: {dest}", extra={"user_id": uid})
+    for pos, dest in enumerate(destinations):
+        if dest.url is not None:
+            items.append(ResolvedLink(dest, dest.url, "url"))
+            continue
+        row = index.get(dest.chat_id)
+        link = row.get("invite_link") if row else None
+        exp = parse_exp_aware(row.get("expires_at")) if row else None
+        if link and exp and exp > now_utc and not refresh:
+            items.append(ResolvedLink(dest, link, "db"))
             continue
+        items.append(None)
+        to_create[pos] = link
 
-        title = dest["title"]
-        desc = dest.get("description", "")
-        raw_chat_id = dest["chat_id"]
-        num_chat_id = to_int_or_none(raw_chat_id)
+    if to_create:
+        if before_create is not None:
+            await before_create()
+        created = await asyncio.gather(
+            *(_create_link(bot, user, uid, destinations[pos], replaced) for pos, replaced in to_create.items())
+        )
+        for pos, res in zip(to_create, created):
+            items[pos] = res
 
-        # Фильтр по only_chat_ids (если задан)
-        if only_chat_ids is not None:
-            if num_chat_id is None or num_chat_id not in only_chat_ids:
-                continue
+    result = InviteSet(tuple(items))
+    logging.info(f"user_id={uid} – ссылки: {result.summary()}", extra={"user_id": uid})
+    return result
 
-        try:
-            # URL — используем напрямую
-            if is_url(raw_chat_id):
-                url = str(raw_chat_id)
-                links.append((title, url, desc))
-                buttons.append([{"text": title, "url": url}])
-                logging.info(f"user_id={uid} – {title}: используем прямой URL", extra={"user_id": uid})
-                continue
-
-            # Числовой chat_id — ищем актуальную ссылку в БД
-            if num_chat_id is not None:
-                existing = next(
-                    (x for x in existing_links if eq_chat_id(x.get("chat_id"), num_chat_id)),
-                    None,
-                )
-
-                if existing:
-                    exp = parse_exp_aware(existing.get("expires_at"))
-                    if exp and exp > now_utc:
-                        invite_link = existing.get("invite_link")
-                        if invite_link:
-                            links.append((title, invite_link, desc))
-                            buttons.append([{"text": title, "url": invite_link}])
-                            logging.info(f"user_id={uid} – {title}: актуальная ссылка найдена", extra={"user_id": uid})
-                            continue
-                        else:
-                            logging.warning(f"user_id={uid} – {title}: пустой invite_link в БД", extra={"user_id": uid})
-                    else:
-                        logging.info(f"user_id={uid} – {title}: ссылка устарела/без срока – создаём новую", extra={"user_id": uid})
-
-                # Создаём новую ссылку
-                try:
-                    invite = await bot.create_chat_invite_link(
-                        chat_id=num_chat_id,
-                        member_limit=1,
-                        creates_join_request=False,
-                        name=f"Invite for {user.username or user.id}",
-                    )
-                    invite_link = invite.invite_link
-
-                    # сохраняем
-                    created_at = now_utc.isoformat()
-                    expires_at = (now_utc + timedelta(hours=1)).isoformat()
-
-                    try:
-                        await save_invite_link(uid, num_chat_id, invite_link, created_at, expires_at)
-                    except Exception as se:
-                        logging.error(
-                            f"user_id={uid} – {title}: ошибка сохранения ссылки: {se}",
-                            extra={"user_id": uid},
-                        )
-
-                    links.append((title, invite_link, desc))
-                    buttons.append([{"text": title, "url": invite_link}])
-
-                    if verify_user:
-                        try:
-                            verify_user(uid, invite_link)
-                        except Exception as ve:
-                            logging.warning(f"user_id={uid} – {title}: verify_user упал: {ve}", extra={"user_id": uid})
-
-                    logging.info(f"user_id={uid} – {title}: новая ссылка создана", extra={"user_id": uid})
-
-                except TelegramBadRequest as e:
-                    text_err = str(e).lower()
-                    logging.error(f"user_id={uid} – {title}: TelegramBadRequest: {e}", extra={"user_id": uid})
-                    # Попытка освободить лимит
-                    if any(kw in text_err for kw in ("limit", "too many requests", "invite links limit")):
-                        try:
-                            old_links = await bot.get_chat_invite_links(chat_id=num_chat_id, limit=100)
-                            if old_links:
-                                oldest = old_links[0].invite_link
-                                await bot.revoke_chat_invite_link(chat_id=num_chat_id, invite_link=oldest)
-                                logging.info(
-                                    f"user_id={uid} – {title}: отозвана старая ссылка {oldest}",
-                                    extra={"user_id": uid},
-                                )
-                                invite = await bot.create_chat_invite_link(
-                                    chat_id=num_chat_id,
-                                    member_limit=1,
-                                    creates_join_request=False,
-                                    name=f"Invite for {user.username or user.id}",
-                                )
-                                invite_link = invite.invite_link
-                                links.append((title, invite_link, desc))
-                                buttons.append([{"text": title, "url": invite_link}])
-                                logging.info(
-                                    f"user_id={uid} – {title}: новая ссылка создана после отзыва",
-                                    extra={"user_id": uid},
-                                )
-                                if ERROR_LOG_CHANNEL_ID:
-                                    try:
-                                        await bot.send_message(
-                                            ERROR_LOG_CHANNEL_ID,
-                                            f"Отозвали старую ссылку для чата {num_chat_id} из-за лимита.",
-                                        )
-                                    except Exception:
-                                        pass
-                        except Exception as e2:
-                            logging.warning(
-                                f"user_id={uid} – {title}: ошибка при отзыве/пересоздании: {e2}",
-                                extra={"user_id": uid},
-                            )
-                except Exception as e:
-                    logging.error(
-                        f"user_id={uid} – {title}: ошибка создания инвайта: {e}",
-                        extra={"user_id": uid},
-                    )
-
-            else:
-                logging.error(
-                    f"user_id={uid} – {title}: chat_id не число и не URL: {raw_chat_id!r}",
-                    extra={"user_id": uid},
-                )
 
-        except Exception as e:
-            logging.error(
-                f"user_id={uid} – {title}: непредвиденная ошибка: {e}",
-                extra={"user_id": uid},
-            )
-            if ERROR_LOG_CHANNEL_ID:
-                try:
-                    await bot.send_message(
-                        ERROR_LOG_CHANNEL_ID,
-                        f"Ошибка при создании ссылки для {user.full_name} (ID {uid}) в чате {raw_chat_id}: {e}",
-                    )
-                except Exception:
-                    pass
-
-    return links, buttons
+__all__ = ["InviteSet", "ResolvedLink", "index_links", "resolve_invite_links", "INVITE_TTL"]
@@ -5,8 +5,8 @@ from __future__ import annotations
 
 import logging
 from httpx import HTTPStatusError
-from common.db_api_client import db_api_client
 from common.utils.common import log_and_report  # отправка в ERROR_LOG_CHANNEL_ID
+from storage import ensure_user_subscriptions_defaults as put_subscriptions_defaults
 
 DEFAULT_SUBS = {
     "news_enabled": False,
@@ -21,12 +21,8 @@ async def ensure_user_subscriptions_defaults(user_id: int) -> None:
     На 422 (нет user в БД) — не ругаемся: welcome-флоу может опережать апсёрт user.
     """
     try:
-        await db_api_client.put_user_subscriptions(
-            user_id=user_id,
-            news_enabled=DEFAULT_SUBS["news_enabled"],
-            meetings_enabled=DEFAULT_SUBS["meetings_enabled"],
-            important_enabled=DEFAULT_SUBS["important_enabled"],
-        )
+        # через storage: пакетная запись по порядку с апсёртом user и обновление кеша подписок
+        await put_subscriptions_defaults(user_id)
         logging.info(
             "Подписки инициализированы: user_id=%s, news=%s, meetings=%s, important=%s",
             user_id,
@@ -10,7 +10,7 @@ from aiogram.types import Message
 
 from config import ID_ADMIN_USER
 from common.db_api_client import db_api_client
-from Mailing.services.broadcasts import get_due_broadcasts, send_broadcast, mark_broadcast_sent
+from Mailing.services.broadcasts import get_due_broadcasts, send_broadcast, mark_broadcast_sent, try_send_now
 
 router = Router(name="admin_broadcasts_commands")
 log = logging.getLogger(__name__)
@@ -70,6 +70,39 @@ async def cmd_broadcast_send(message: Message, command: CommandObject):
             pass
 
 
+@router.message(
+    Command("broadcast_resume"),
+    F.from_user.id.in_(ID_ADMIN_USER),
+    F.chat.type == "private",
+)
+async def cmd_broadcast_resume(message: Message, command: CommandObject):
+    """Продолжить прерванную рассылку: уже доставленные (status=sent) пропускаются."""
+    try:
+        if not command.args or not command.args.strip().isdigit():
+            return await message.answer("Формат: /broadcast_resume <id>")
+        bid = int(command.args.strip())
+
+        b = await db_api_client.get_broadcast(bid)
+        if not b or b.get("status") not in ("sending", "failed"):
+            return await message.answer("Продолжить можно только рассылку в статусе sending/failed.")
+
+        await message.answer(f"▶️ Продолжаю рассылку #{bid}…")
+        res = await try_send_now(message.bot, bid, resume=True)
+        if res is None:
+            return await message.answer(f"Рассылка #{bid} не запущена (уже идёт или ошибка загрузки).")
+        sent, failed = res
+        await message.answer(f"Готово: id={bid}, sent={sent}, failed={failed}")
+    except Exception as e:
+        log.error(
+            "Админ-команда /broadcast_resume: ошибка — user_id=%s, ошибка=%s",
+            message.from_user.id, e, extra={"user_id": message.from_user.id}
+        )
+        try:
+            await message.answer("❌ Ошибка при продолжении рассылки.")
+        except Exception:
+            pass
+
+
 @router.message(
     Command("broadcast_preview"),
     F.from_user.id.in_(ID_ADMIN_USER),
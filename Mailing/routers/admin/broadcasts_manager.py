@@ -17,6 +17,7 @@ from aiogram.exceptions import TelegramBadRequest
 from common.db_api_client import db_api_client
 from Mailing.keyboards.broadcasts_manager import kb_bm_list, kb_bm_item
 from Mailing.services.schedule import (
+    compile_schedule,
     parse_and_preview,
     format_preview,
     is_oneoff_text,
@@ -24,6 +25,7 @@ from Mailing.services.schedule import (
 )
 from Mailing.services.broadcasts import try_send_now
 from Mailing.services.local_scheduler import schedule_after_create  # ← локальное планирование (немедленно)
+from Mailing.services.schedule_index import get_next_fire_index  # ← ближайшие запуски в памяти (держит планировщик)
 
 log = logging.getLogger(__name__)
 router = Router(name="admin_broadcasts_manager")
@@ -83,6 +85,35 @@ async def _show_page(target_message: Message, *, offset: int, limit: int):
     now_msk = datetime.now(ZoneInfo("Europe/Moscow"))
     horizon = now_msk + timedelta(days=7)
 
+    index = get_next_fire_index()
+    if index.ready:
+        # индекс уже упорядочен по ближайшему запуску — выборка по диапазону, без БД и разбора расписаний
+        filtered = index.between(now_msk, horizon, lambda b: b.get("status") == "scheduled")
+    else:
+        filtered = await _load_upcoming(target_message, now_msk, horizon)
+        if filtered is None:
+            return
+
+    page_items = filtered[offset: offset + limit]
+    has_more = (offset + limit) < len(filtered)
+
+    if not page_items and offset > 0:
+        await target_message.answer("Больше нет записей.")
+        return
+
+    if not page_items:
+        await target_message.answer("За ближайшие 7 дней нет запланированных рассылок.")
+        return
+
+    await target_message.answer(
+        "<b>Ближайшие рассылки (7 дней)</b>\nВыбери нужную:",
+        reply_markup=kb_bm_list(page_items, offset=offset, limit=limit, has_more=has_more),
+        disable_web_page_preview=True,
+    )
+
+
+async def _load_upcoming(target_message: Message, now_msk: datetime, horizon: datetime) -> Optional[List[Dict[str, Any]]]:
+    """Пока планировщик не заполнил индекс (первая синхронизация не прошла) — читаем БД и фильтруем сами."""
     try:
         # Берём запасом и фильтруем локально — API не знает про «7 дней».
         all_items: List[Dict[str, Any]] = await db_api_client.list_broadcasts(
@@ -94,7 +125,7 @@ async def _show_page(target_message: Message, *, offset: int, limit: int):
     except Exception as e:
         log.error("bm: list_broadcasts error: %s", e)
         await target_message.answer("Не удалось получить список рассылок.")
-        return
+        return None
 
     # Фильтрация по ближайшей дате запуска
     filtered: List[Dict[str, Any]] = []
@@ -103,10 +134,9 @@ async def _show_page(target_message: Message, *, offset: int, limit: int):
         if not schedule_text:
             continue
         try:
-            # Берём ближайший запуск (count=1)
-            _kind, dates = parse_and_preview(schedule_text, count=1)
-            next_dt = dates[0]
-            if now_msk <= next_dt <= horizon:
+            # Берём ближайший запуск (разбор — из кеша по тексту расписания)
+            next_dt = compile_schedule(schedule_text).next_after(now_msk)
+            if next_dt is not None and now_msk <= next_dt <= horizon:
                 b = dict(b)
                 b["_next_dt"] = next_dt
                 filtered.append(b)
@@ -115,23 +145,7 @@ async def _show_page(target_message: Message, *, offset: int, limit: int):
 
     # Сортируем по реальному ближайшему запуску
     filtered.sort(key=lambda it: it.get("_next_dt"))
-
-    page_items = filtered[offset: offset + limit]
-    has_more = (offset + limit) < len(filtered)
-
-    if not page_items and offset > 0:
-        await target_message.answer("Больше нет записей.")
-        return
-
-    if not page_items:
-        await target_message.answer("За ближайшие 7 дней нет запланированных рассылок.")
-        return
-
-    await target_message.answer(
-        "<b>Ближайшие рассылки (7 дней)</b>\nВыбери нужную:",
-        reply_markup=kb_bm_list(page_items, offset=offset, limit=limit, has_more=has_more),
-        disable_web_page_preview=True,
-    )
+    return filtered
 
 
 # ---------- Карточка рассылки ----------
@@ -159,6 +173,7 @@ async def bm_toggle(cb: CallbackQuery, state: FSMContext):
         new_enabled = not bool(b.get("enabled"))
         await db_api_client.update_broadcast(bid, enabled=new_enabled)
         b = await db_api_client.get_broadcast(bid)
+        get_next_fire_index().upsert(b)
         # Немедленное планирование при включении
         if b.get("enabled") and (b.get("status") == "scheduled") and (b.get("schedule") or "").strip():
             try:
@@ -218,6 +233,7 @@ async def bm_edit_input(message: Message, state: FSMContext):
     try:
         await db_api_client.update_broadcast(bid, schedule=schedule_text)
         b = await db_api_client.get_broadcast(bid)
+        get_next_fire_index().upsert(b)
         # Немедленно планируем обновлённую рассылку, если она включена
         if b.get("enabled") and (b.get("status") == "scheduled") and (b.get("schedule") or "").strip():
             try:
@@ -335,6 +351,7 @@ async def bm_send_now(cb: CallbackQuery, state: FSMContext):
         log.warning("bm: send_now — не удалось перечитать запись id=%s: %s", bid, e)
         return
 
+    get_next_fire_index().upsert(b2)
     await _safe_edit_card(cb.message, bid, b2)
 
 
@@ -4,6 +4,7 @@
 #  - audience_preview_text(target, limit) — превью аудитории (ALL/IDs/kind/SQL)
 #  - materialize_all_user_ids(limit) — материализация "ALL" по membership’ам бота
 #  - resolve_audience(target) — ПОЛНЫЙ список ID через /audiences/resolve (ids|kind|sql)
+#  - iter_audience(target) — то же постранично (async-итератор чанков), для больших рассылок
 #  - iter_audience_kind(kind) — пользователи, подписанные на тип (news/meetings/important) — оставлено для утилит
 
 from __future__ import annotations
@@ -14,6 +15,7 @@ from typing import Any, Dict, List, Optional, AsyncIterator, Iterable
 import config
 from common.db_api import db_api_client
 from common.utils.common import log_and_report  # отчёт в ERROR_LOG_CHANNEL_ID
+from common.utils.idset import IdSet
 
 log = logging.getLogger(__name__)
 
@@ -24,6 +26,12 @@ KIND_FLAG: Dict[str, str] = {
     "important": "important_enabled",
 }
 
+
+
+class AudienceError(RuntimeError):
+    """Аудиторию не удалось получить целиком: рассылка по неполному списку недопустима."""
+
+
 # ---------- НОРМАЛИЗАЦИЯ ID ----------
 
 def normalize_ids(text: str) -> List[int]:
@@ -239,11 +247,92 @@ async def resolve_audience(target: Optional[dict], limit: Optional[int] = None)
         await log_and_report(exc, "resolve_audience: ошибка API")
         return []
 
+
+async def _resolve_page(target: dict, *, limit: Optional[int], offset: Optional[int]) -> List[Any]:
+    try:
+        resp = await db_api_client.audiences_resolve(target, limit=limit, offset=offset)
+    except Exception as exc:
+        log.error(
+            "iter_audience: ошибка API /audiences/resolve (offset=%s): %s",
+            offset, exc, extra={"user_id": config.BOT_ID},
+        )
+        await log_and_report(exc, f"iter_audience: ошибка API, offset={offset}")
+        raise AudienceError(f"/audiences/resolve не ответил (offset={offset}): {exc}") from exc
+    return (resp or {}).get("ids") or []
+
+
+def _new_ids(raw: Iterable[Any], seen: IdSet) -> List[int]:
+    chunk: List[int] = []
+    for x in raw:
+        try:
+            v = int(x)
+        except Exception:
+            continue
+        if v > 0 and seen.add(v):
+            chunk.append(v)
+    return chunk
+
+
+async def iter_audience(
+    target: Optional[dict],
+    page_size: Optional[int] = None,
+    seen: Optional[IdSet] = None,
+) -> AsyncIterator[List[int]]:
+    """
+    Постраничный резолв аудитории через /audiences/resolve (limit/offset).
+    Отдаёт чанки НОВЫХ id (дедуп — компактный IdSet, а не set[int]) по мере прихода страниц,
+    поэтому отправка может начаться до окончания резолва.
+
+    Остановка: пустая/неполная страница. Полная страница без единого нового id — бэкенд не понимает offset
+    (вернул ту же страницу): тогда один раз берём всю аудиторию без постраничности и отдаём недостающих.
+    Ошибка API на любой странице — AudienceError: молча обрезать аудиторию нельзя.
+    """
+    if not target:
+        log.warning("iter_audience: target отсутствует")
+        return
+
+    # Совместимость: ids → user_ids
+    if target.get("type") == "ids" and "ids" in target and "user_ids" not in target:
+        target = dict(target)
+        target["user_ids"] = target.pop("ids")
+
+    page = int(page_size or getattr(config, "BROADCAST_AUDIENCE_PAGE", 5000))
+    seen = seen if seen is not None else IdSet()
+    offset = 0
+    pages = 0
+    while True:
+        raw = await _resolve_page(target, limit=page, offset=offset)
+        pages += 1
+        chunk = _new_ids(raw, seen)
+
+        if chunk:
+            yield chunk
+        if len(raw) < page:
+            break
+        if not chunk:
+            log.warning(
+                "iter_audience(%s): страница offset=%s не дала новых id — бэкенд игнорирует offset, берём аудиторию целиком",
+                target.get("type"), offset, extra={"user_id": config.BOT_ID},
+            )
+            rest = _new_ids(await _resolve_page(target, limit=None, offset=None), seen)
+            for i in range(0, len(rest), page):
+                yield rest[i:i + page]
+            break
+        offset += len(raw)
+
+    log.info(
+        "iter_audience(%s): %s id(s), страниц=%s",
+        target.get("type"), len(seen), pages, extra={"user_id": config.BOT_ID},
+    )
+
+
 __all__ = [
+    "AudienceError",
     "normalize_ids",
     "audience_preview_text",
     "materialize_all_user_ids",
     "resolve_audience",
+    "iter_audience",
     "iter_audience_kind",
     "KIND_FLAG",
 ]
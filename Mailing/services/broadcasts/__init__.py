@@ -1,12 +1,13 @@
 # services/broadcasts/__init__.py
 # Реэкспорт публичных точек входа — обратно совместим с "from Mailing.services.broadcasts import ..."
-from .service import send_broadcast, try_send_now, mark_broadcast_sent
+from .service import send_broadcast, try_send_now, mark_broadcast_sent, resume_interrupted_broadcasts
 from .worker  import run_broadcast_worker, get_due_broadcasts
 
 __all__ = [
     "send_broadcast",
     "try_send_now",
     "mark_broadcast_sent",
+    "resume_interrupted_broadcasts",
     "run_broadcast_worker",
     "get_due_broadcasts",
 ]
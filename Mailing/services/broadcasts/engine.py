@@ -0,0 +1,76 @@
+# Mailing/services/broadcasts/engine.py
+# Движок рассылки: N конкурентных отправок, общий ограничитель скорости.
+# Один получатель обрабатывается целиком одним воркером — порядок частей (альбом → текст) сохраняется.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import AsyncIterable, Awaitable, Callable, Iterable, Union
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+
+Recipients = Union[Iterable[int], AsyncIterable[int]]
+
+
+class SendEngine:
+    """
+    Пул воркеров поверх ограниченной очереди получателей.
+
+    - concurrency — сколько получателей обрабатывается одновременно (in-flight отправки);
+    - handler(uid) — корутина полной обработки одного получателя (отправка + учёт результата);
+      исключения из handler логируются и не останавливают рассылку.
+
+    Скорость задаёт не движок, а ограничитель, который handler использует на каждом вызове Bot API.
+    """
+
+    def __init__(self, *, concurrency: int = 8) -> None:
+        self.concurrency = max(1, int(concurrency))
+        self.processed = 0
+
+    async def _feed(self, recipients: Recipients, queue: asyncio.Queue) -> None:
+        if hasattr(recipients, "__aiter__"):
+            async for uid in recipients:  # type: ignore[union-attr]
+                await queue.put(uid)
+        else:
+            for uid in recipients:  # type: ignore[union-attr]
+                await queue.put(uid)
+
+    async def _worker(self, queue: asyncio.Queue, handler: Callable[[int], Awaitable[None]]) -> None:
+        while True:
+            uid = await queue.get()
+            if uid is _STOP:
+                return
+            try:
+                await handler(uid)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.exception("Движок рассылки: ошибка обработки user_id=%s: %s", uid, e, extra={"user_id": uid})
+            finally:
+                self.processed += 1
+
+    async def run(self, recipients: Recipients, handler: Callable[[int], Awaitable[None]]) -> int:
+        """Прогоняет всех получателей через handler. Возвращает число обработанных."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [
+            asyncio.create_task(self._worker(queue, handler), name=f"broadcast_sender_{i}")
+            for i in range(self.concurrency)
+        ]
+        try:
+            await self._feed(recipients, queue)
+            for _ in workers:
+                await queue.put(_STOP)
+            await asyncio.gather(*workers)
+        except BaseException:
+            # ошибка источника/отмена — гасим воркеры, чтобы не висели на пустой очереди
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        return self.processed
+
+
+__all__ = ["SendEngine"]
@@ -0,0 +1,257 @@
+# Mailing/services/broadcasts/reporter.py
+# Фоновая выгрузка результатов доставки в БД: цикл отправки не ждёт DB-API.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from common.db_api import db_deadline
+from common.utils.spool import JsonlSpool
+
+log = logging.getLogger(__name__)
+
+ReportFn = Callable[[List[Dict[str, Any]]], Awaitable[bool]]
+
+
+def _earliest(a: int, b: int) -> int:
+    """Меньший из seq спула; 0 — «не записан в спул» и не учитывается."""
+    return min(a, b) if a and b else (a or b)
+
+
+class ReportUploader:
+    """
+    Ограниченная очередь репортов со своим воркером.
+
+    - submit(item) — кладёт результат в спул (если есть) и в очередь; повторные обновления
+      одного user_id сливаются (в БД уйдёт последнее). Ждёт только если очередь заполнена (max_pending);
+    - воркер копит батч (до batch или linger секунд) и вызывает report(items) → bool;
+      размер батча подстраивается под задержку бэкенда: есть хвост — батч вдвое больше
+      (накладные расходы запроса делятся на больше строк), запрос дольше max_latency — вдвое меньше
+      (не упираемся в таймаут); всегда в пределах min_batch..max_batch;
+      при ошибке — элементы возвращаются в очередь, пауза с экспоненциальным ростом;
+    - спул подтверждается водяной меткой: всё, что старше самого раннего невыгруженного элемента;
+    - close() — дренаж до пустой очереди; если бэкенд лежит (close_retries ошибок подряд)
+      или не успели за drain_timeout — остаток остаётся в спуле до следующего запуска.
+    """
+
+    def __init__(
+        self,
+        report: ReportFn,
+        *,
+        spool: Optional[JsonlSpool] = None,
+        name: str = "report",
+        max_pending: int = 5000,
+        min_batch: int = 50,
+        max_batch: int = 1000,
+        max_latency: float = 5.0,
+        linger: float = 1.0,
+        drain_timeout: float = 120.0,
+        close_retries: int = 3,
+    ) -> None:
+        self._report = report
+        self._spool = spool
+        self.name = name
+        self.max_pending = max(1, int(max_pending))
+        self.min_batch = max(1, int(min_batch))
+        self.max_batch = max(self.min_batch, int(max_batch))
+        self.max_latency = float(max_latency)
+        self.linger = float(linger)
+        self.drain_timeout = float(drain_timeout)
+        self.close_retries = max(1, int(close_retries))
+
+        self.batch = self.min_batch
+        # user_id → (seq в спуле, элемент); порядок — порядок первой постановки
+        self._pending: "OrderedDict[Any, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[Any, int] = {}
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.uploaded = 0
+        self.batches = 0
+        self.failures = 0
+        self.waited = 0.0
+
+    # ---------- producer side ----------
+
+    def start(self) -> "ReportUploader":
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"report_uploader_{self.name}")
+        return self
+
+    async def submit(self, item: Dict[str, Any]) -> None:
+        key = item.get("user_id")
+        while len(self._pending) >= self.max_pending and key not in self._pending:
+            # backpressure: ждём, только когда очередь реально заполнена
+            t0 = time.monotonic()
+            self._space.clear()
+            self._wakeup.set()
+            await self._space.wait()
+            self.waited += time.monotonic() - t0
+
+        seq = 0
+        if self._spool is not None:
+            try:
+                seq = self._spool.append(item)
+            except Exception as e:
+                log.warning("Репорты %s: запись в спул не удалась: %s", self.name, e)
+
+        self.submitted += 1
+        if key in self._pending:
+            self.coalesced += 1
+            first_seq, _ = self._pending[key]
+            # сохраняем позицию и самый ранний seq: водяная метка не должна его обогнать
+            self._pending[key] = (_earliest(first_seq, seq), item)
+        else:
+            self._pending[key] = (seq, item)
+        if len(self._pending) >= self.batch:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending) + len(self._inflight)
+
+    # ---------- worker ----------
+
+    def _take(self) -> List[Tuple[Any, int, Dict[str, Any]]]:
+        out: List[Tuple[Any, int, Dict[str, Any]]] = []
+        while self._pending and len(out) < self.batch:
+            key, (seq, item) = self._pending.popitem(last=False)
+            self._inflight[key] = seq
+            out.append((key, seq, item))
+        if len(self._pending) < self.max_pending:
+            self._space.set()
+        return out
+
+    def _watermark(self) -> int:
+        seqs = [s for s, _ in self._pending.values() if s] + [s for s in self._inflight.values() if s]
+        if seqs:
+            return min(seqs) - 1
+        return self._spool.last_seq if self._spool is not None else 0
+
+    def _adapt(self, latency: float) -> None:
+        if latency > self.max_latency:
+            self.batch = max(self.min_batch, self.batch // 2)
+        elif len(self._pending) >= self.batch and latency < self.max_latency / 2:
+            self.batch = min(self.max_batch, self.batch * 2)
+
+    async def _upload(self, chunk: List[Tuple[Any, int, Dict[str, Any]]]) -> bool:
+        t0 = time.monotonic()
+        try:
+            ok = await self._report([item for _, _, item in chunk])
+        except Exception as e:
+            log.warning("Репорты %s: ошибка выгрузки: %s", self.name, e)
+            ok = False
+        latency = time.monotonic() - t0
+
+        for key, _, _ in chunk:
+            self._inflight.pop(key, None)
+        if not ok:
+            self.failures += 1
+            # вернём в начало очереди, если за это время не пришло более свежее обновление
+            for key, seq, item in reversed(chunk):
+                if key in self._pending:
+                    newer_seq, newer = self._pending[key]
+                    self._pending[key] = (_earliest(seq, newer_seq), newer)
+                else:
+                    self._pending[key] = (seq, item)
+                self._pending.move_to_end(key, last=False)
+            self.batch = max(self.min_batch, self.batch // 2)
+            return False
+
+        self.batches += 1
+        self.uploaded += len(chunk)
+        self._adapt(latency)
+        if self._spool is not None:
+            self._spool.ack(self._watermark())
+        return True
+
+    async def _run(self) -> None:
+        # воркер может быть создан из обработчика — его бюджет DB-API на выгрузку не распространяется
+        with db_deadline(None):
+            await self._loop()
+
+    async def _loop(self) -> None:
+        backoff = 0.0
+        errors = 0
+        while True:
+            if not self._pending:
+                if self._closing:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            if len(self._pending) < self.batch and not self._closing:
+                # даём набраться батчу; submit разбудит раньше, когда наберётся
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.linger)
+                except asyncio.TimeoutError:
+                    pass
+
+            chunk = self._take()
+            if self._spool is not None:
+                self._spool.sync()
+            if await self._upload(chunk):
+                backoff = 0.0
+                errors = 0
+                continue
+
+            errors += 1
+            if self._closing and errors >= self.close_retries:
+                log.error(
+                    "Репорты %s: бэкенд недоступен, не выгружено %s элементов — остаются в спуле до следующего запуска",
+                    self.name, self.pending,
+                )
+                return
+            backoff = min(30.0, backoff * 2 or 1.0)
+            self._wakeup.clear()
+            try:
+                # пауза перед повтором; close() может разбудить раньше
+                await asyncio.wait_for(self._wakeup.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self) -> None:
+        """Дренаж очереди до конца; остаток (бэкенд недоступен дольше drain_timeout) остаётся в спуле."""
+        self._closing = True
+        self._wakeup.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            log.error(
+                "Репорты %s: не выгружено %s элементов за %.0f с — остаются в спуле до следующего запуска",
+                self.name, self.pending, self.drain_timeout,
+            )
+        except asyncio.CancelledError:
+            self._task.cancel()
+            raise
+        finally:
+            self._space.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "submitted": self.submitted,
+            "uploaded": self.uploaded,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "failures": self.failures,
+            "batch": self.batch,
+            "waited_s": round(self.waited, 3),
+        }
+
+
+__all__ = ["ReportUploader"]
@@ -1,11 +1,15 @@
 # Mailing/services/broadcasts/sender/__init__.py
 # commit: refactor(sender/__init__): удалить send_content_json и мёртвые реэкспорты; оставить публичный API
 
-from .facade import send_preview, send_actual
+from .facade import send_preview, send_actual, send_plan
+from .plan import SendPlan, compile_plan
 from .policy import CAPTION_LIMIT
 
 __all__ = [
     "send_preview",
     "send_actual",
+    "send_plan",
+    "SendPlan",
+    "compile_plan",
     "CAPTION_LIMIT",
 ]
@@ -5,6 +5,7 @@
 # - send_actual: если kb_for_text не передали — пробуем подставить кнопку «Настроить рассылки».
 #   Кнопка крепится ТОЛЬКО когда это возможно (текст/одиночное медиа или текст после альбома).
 #   Если невозможно (чистый альбом без текста) — отправляем без кнопки, никаких дополнительных сообщений.
+# - send_plan: то же по заранее скомпилированному плану (plan.compile_plan) — для рассылок по многим получателям.
 
 from __future__ import annotations
 
@@ -20,6 +21,8 @@ from aiogram.types import (
 )
 
 from Mailing.keyboards.subscriptions import subscriptions_kb
+from .plan import SendPlan, _analyze, compile_plan
+from .policy import gated_call
 from .transport import send_text, send_single_media, send_album
 
 _HTML_RE = re.compile(r"<[^>]+>")
@@ -42,61 +45,6 @@ async def _default_manage_kb(bot: Bot) -> InlineKeyboardMarkup:
    return subscriptions_kb()
 
 
-# ---------- analyze input structure ----------
-
-def _analyze(media: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """
-    Поддерживаем форматы:
-    - {"type":"text","payload":{"text": "...", "entities":[...]?}}
-    - {"type":"media","payload":{"kind":"photo|video|document","file_id":"...","caption":"...","caption_entities":[...]?}}
-    - {"type":"photo|video|document","payload":{...}}          # legacy → приводим к "media"
-    - {"type":"album","payload":{"items":[...]}}
-    """
-    model: Dict[str, Any] = {"kind": "mixed", "items": media or []}
-    if not media:
-        return model
-
-    first = media[0] or {}
-
-    if first.get("type") == "album":
-        items = (first.get("payload") or {}).get("items") or []
-        model["kind"] = "album"
-        model["album_items"] = items
-        # возможный текст вторым элементом
-        txt, ents = None, None
-        if len(media) >= 2 and (media[1] or {}).get("type") in {"text", "html"}:
-            p = (media[1] or {}).get("payload") or {}
-            txt = (p.get("text") or "").strip() or None
-            ents = _as_entities(p.get("entities"))
-        model["text_html"] = txt
-        model["text_entities"] = ents
-        return model
-
-    if len(media) == 1:
-        t = (first.get("type") or "").lower()
-        if t in {"text", "html"}:
-            p = (first.get("payload") or {})
-            model["kind"] = "text"
-            model["text_html"] = (p.get("text") or "").strip()
-            model["text_entities"] = _as_entities(p.get("entities"))
-            return model
-        if t == "media":
-            model["kind"] = "single_media"
-            model["media_kind"] = ((first.get("payload") or {}).get("kind") or "document").lower()
-            model["media_payload"] = (first.get("payload") or {})
-            return model
-        if t in {"photo", "video", "document"}:
-            p = (first.get("payload") or {})
-            model["kind"] = "single_media"
-            model["media_kind"] = t
-            model["media_payload"] = {"kind": t, **p}
-            return model
-
-    # mixed
-    model["kind"] = "mixed"
-    return model
-
-
 def _err(e: Exception) -> Tuple[bool, None, str, str]:
     if isinstance(e, TelegramRetryAfter):
         return False, None, "RetryAfter", str(e)
@@ -201,80 +149,55 @@ async def send_preview(
 
 # ---------- ACTUAL (добавлена авто-кнопка «Настроить рассылки») ----------
 
+async def send_plan(
+    bot: Bot,
+    plan: SendPlan,
+    chat_id: int,
+    limiter=None,
+) -> Tuple[bool, Optional[Union[int, List[int]]], Optional[str], Optional[str]]:
+    """
+    Отправка по скомпилированному плану: на получателя — только подстановка chat_id.
+    limiter — общий ограничитель скорости рассылки: токен берётся на КАЖДЫЙ вызов Bot API
+    (альбом + текст = 2 токена), части одного получателя уходят строго по порядку.
+    """
+    try:
+        ids: List[int] = []
+        for method in plan.for_chat(chat_id):
+            res = await gated_call(lambda: bot(method), limiter)
+            if isinstance(res, list):
+                ids.extend(m.message_id for m in res)
+            elif res:
+                ids.append(res.message_id)
+
+        if plan.result == "list":
+            return True, ids or None, None, None
+        if plan.result == "last":
+            return True, (ids[-1] if ids else None), None, None
+        return True, (ids[0] if ids else None), None, None
+
+    except (TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter) as e:
+        return _err(e)
+    except Exception as e:
+        return _err(e)
+
+
 async def send_actual(
     bot: Bot,
     chat_id: int,
     media: List[Dict[str, Any]],
     kb_for_text: Optional[InlineKeyboardMarkup] = None,
+    limiter=None,
 ) -> Tuple[bool, Optional[Union[int, List[int]]], Optional[str], Optional[str]]:
     """
-    Боевая отправка.
+    Боевая отправка одному получателю.
     Если kb_for_text не передан — используем клавиатуру «Настроить рассылки» по умолчанию.
     Кнопку прикрепляем ТОЛЬКО если это возможно. Никаких отдельных сообщений.
+    Для рассылки по многим получателям план компилируется один раз — см. send_plan.
     """
     try:
         # если клава не пришла — подставим дефолтную
         kb = kb_for_text or await _default_manage_kb(bot)
-
-        model = _analyze(media)
-
-        if model["kind"] == "text":
-            msg = await _send_text_with_auto_html(bot, chat_id, model.get("text_html") or "", kb, model.get("text_entities"))
-            return True, msg.message_id, None, None
-
-        if model["kind"] == "single_media":
-            payload = model.get("media_payload") or {}
-            kind = (model.get("media_kind") or "document").lower()
-            caption = (payload.get("caption") or None)
-            cap_ents = _as_entities(payload.get("caption_entities"))
-            parse_caption_html = (cap_ents is None) and _looks_like_html(caption)
-            msg = await send_single_media(bot, chat_id, kind, payload, parse_caption_html=parse_caption_html, reply_markup=kb)
-            return True, msg.message_id, None, None
-
-        if model["kind"] == "album":
-            msgs = await send_album(bot, chat_id, model.get("album_items") or [])
-            ids = [m.message_id for m in (msgs or [])]
-
-            text = model.get("text_html") or ""
-            ents = model.get("text_entities")
-            if text:
-                msg = await _send_text_with_auto_html(bot, chat_id, text, kb, ents)
-                if msg:
-                    ids.append(msg.message_id)
-            # нет текста → кнопке не к чему крепиться → ничего не добавляем
-            return True, ids or None, None, None
-
-        # mixed: клава — на последний поддерживающий элемент; если последний — альбом, ничего не добавляем
-        last_id: Optional[int] = None
-        last_supports_kb = False
-        for idx, el in enumerate(media or []):
-            is_last = idx == len(media) - 1
-            t = (el.get("type") or "").lower()
-            p = (el.get("payload") or {})
-
-            if t in {"text", "html"}:
-                msg = await _send_text_with_auto_html(bot, chat_id, (p.get("text") or "").strip(), kb if is_last else None, _as_entities(p.get("entities")))
-                last_supports_kb = True
-            elif t == "media":
-                kind = (p.get("kind") or "document").lower()
-                cap = (p.get("caption") or None)
-                cap_ents = _as_entities(p.get("caption_entities"))
-                parse_caption_html = (cap_ents is None) and _looks_like_html(cap)
-                msg = await send_single_media(bot, chat_id, kind, p, parse_caption_html=parse_caption_html, reply_markup=kb if is_last else None)
-                last_supports_kb = True
-            elif t == "album":
-                group = await send_album(bot, chat_id, (p.get("items") or []))
-                msg = group[-1] if group else None
-                last_supports_kb = False
-            else:
-                msg = None
-
-            if msg:
-                last_id = msg.message_id
-
-        return True, last_id, None, None
-
-    except (TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter) as e:
-        return _err(e)
+        plan = compile_plan(media, kb)
     except Exception as e:
         return _err(e)
+    return await send_plan(bot, plan, chat_id, limiter)
@@ -0,0 +1,154 @@
+# Mailing/services/broadcasts/sender/plan.py
+# Python 3.11+, aiogram v3
+# Компилированный «план отправки»: контент рассылки разбирается ОДИН раз —
+# entities, клавиатура, InputMedia альбома и parse_mode уже собраны в объекты методов Bot API.
+# На каждого получателя остаётся только подставить chat_id (model_copy) и отправить.
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.methods import TelegramMethod
+from aiogram.types import InlineKeyboardMarkup
+
+from Mailing.keyboards.subscriptions import subscriptions_kb
+from .transport import _as_entities, _looks_like_html, build_album, build_single_media, build_text
+
+# chat_id-заглушка в шаблонах; реальный подставляется в for_chat()
+_PLACEHOLDER_CHAT_ID = 0
+
+
+# ---------- analyze input structure ----------
+
+def _analyze(media: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Поддерживаем форматы:
+    - {"type":"text","payload":{"text": "...", "entities":[...]?}}
+    - {"type":"media","payload":{"kind":"photo|video|document","file_id":"...","caption":"...","caption_entities":[...]?}}
+    - {"type":"photo|video|document","payload":{...}}          # legacy → приводим к "media"
+    - {"type":"album","payload":{"items":[...]}}
+    """
+    model: Dict[str, Any] = {"kind": "mixed", "items": media or []}
+    if not media:
+        return model
+
+    first = media[0] or {}
+
+    if first.get("type") == "album":
+        items = (first.get("payload") or {}).get("items") or []
+        model["kind"] = "album"
+        model["album_items"] = items
+        # возможный текст вторым элементом
+        txt, ents = None, None
+        if len(media) >= 2 and (media[1] or {}).get("type") in {"text", "html"}:
+            p = (media[1] or {}).get("payload") or {}
+            txt = (p.get("text") or "").strip() or None
+            ents = _as_entities(p.get("entities"))
+        model["text_html"] = txt
+        model["text_entities"] = ents
+        return model
+
+    if len(media) == 1:
+        t = (first.get("type") or "").lower()
+        if t in {"text", "html"}:
+            p = (first.get("payload") or {})
+            model["kind"] = "text"
+            model["text_html"] = (p.get("text") or "").strip()
+            model["text_entities"] = _as_entities(p.get("entities"))
+            return model
+        if t == "media":
+            model["kind"] = "single_media"
+            model["media_kind"] = ((first.get("payload") or {}).get("kind") or "document").lower()
+            model["media_payload"] = (first.get("payload") or {})
+            return model
+        if t in {"photo", "video", "document"}:
+            p = (first.get("payload") or {})
+            model["kind"] = "single_media"
+            model["media_kind"] = t
+            model["media_payload"] = {"kind": t, **p}
+            return model
+
+    # mixed
+    model["kind"] = "mixed"
+    return model
+
+
+# ---------- plan ----------
+
+@dataclass(frozen=True)
+class SendPlan:
+    """
+    steps  — шаблоны методов Bot API в порядке отправки (альбом → текст и т.п.);
+    result — как свернуть ответы в message_id: "one" (первое сообщение), "list" (все id), "last" (последний id).
+    """
+
+    steps: Tuple[TelegramMethod, ...]
+    result: str = "one"
+
+    def for_chat(self, chat_id: int) -> List[TelegramMethod]:
+        """Методы для конкретного получателя: поверхностная копия, общие entities/kb/media не копируются."""
+        return [step.model_copy(update={"chat_id": chat_id}) for step in self.steps]
+
+
+def _text_step(text: str, entities: Optional[List[Any]], kb: Optional[InlineKeyboardMarkup]) -> TelegramMethod:
+    ents = _as_entities(entities)
+    parse_html = (ents is None) and _looks_like_html(text)
+    return build_text(_PLACEHOLDER_CHAT_ID, text, entities=ents, parse_html=parse_html, reply_markup=kb)
+
+
+def _media_step(kind: str, payload: Dict[str, Any], kb: Optional[InlineKeyboardMarkup]) -> TelegramMethod:
+    caption = (payload.get("caption") or None)
+    cap_ents = _as_entities(payload.get("caption_entities"))
+    parse_caption_html = (cap_ents is None) and _looks_like_html(caption)
+    return build_single_media(
+        _PLACEHOLDER_CHAT_ID, kind, payload, parse_caption_html=parse_caption_html, reply_markup=kb,
+    )
+
+
+def compile_plan(media: List[Dict[str, Any]], kb: Optional[InlineKeyboardMarkup] = None) -> SendPlan:
+    """
+    Собирает план боевой отправки (семантика send_actual):
+    kb не передан — кнопка «Настроить рассылки»; крепится только туда, где это возможно
+    (текст/одиночное медиа или текст после альбома), к чистому альбому — ничего не добавляем.
+    Ошибки разбора контента (битые entities и т.п.) поднимаются отсюда — до начала рассылки.
+    """
+    kb = kb or subscriptions_kb()
+    model = _analyze(media)
+
+    if model["kind"] == "text":
+        return SendPlan((_text_step(model.get("text_html") or "", model.get("text_entities"), kb),), "one")
+
+    if model["kind"] == "single_media":
+        kind = (model.get("media_kind") or "document").lower()
+        return SendPlan((_media_step(kind, model.get("media_payload") or {}, kb),), "one")
+
+    if model["kind"] == "album":
+        steps: List[TelegramMethod] = []
+        album = build_album(_PLACEHOLDER_CHAT_ID, model.get("album_items") or [])
+        if album is not None:
+            steps.append(album)
+        text = model.get("text_html") or ""
+        if text:
+            steps.append(_text_step(text, model.get("text_entities"), kb))
+        return SendPlan(tuple(steps), "list")
+
+    # mixed: клава — на последний поддерживающий элемент; если последний — альбом, ничего не добавляем
+    steps = []
+    for idx, el in enumerate(media or []):
+        is_last = idx == len(media) - 1
+        t = (el.get("type") or "").lower()
+        p = (el.get("payload") or {})
+
+        if t in {"text", "html"}:
+            steps.append(_text_step((p.get("text") or "").strip(), p.get("entities"), kb if is_last else None))
+        elif t == "media":
+            steps.append(_media_step((p.get("kind") or "document").lower(), p, kb if is_last else None))
+        elif t == "album":
+            album = build_album(_PLACEHOLDER_CHAT_ID, p.get("items") or [])
+            if album is not None:
+                steps.append(album)
+    return SendPlan(tuple(steps), "last")
+
+
+__all__ = ["SendPlan", "compile_plan"]
@@ -5,14 +5,17 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from typing import Optional, Tuple
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar
 
 from aiogram.types import Message
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
 
 log = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 CAPTION_LIMIT = 1024  # лимит подписи к медиа по требованиям Telegram
+RETRY_AFTER_ATTEMPTS = 5  # сколько раз повторяем один вызов после 429
 
 
 def ensure_caption_fits(caption: str) -> None:
@@ -20,25 +23,59 @@ def ensure_caption_fits(caption: str) -> None:
         raise ValueError(f"CaptionTooLong: {len(caption)} > {CAPTION_LIMIT}")
 
 
-async def send_with_retry(coro) -> Tuple[Optional[Message], Optional[str], Optional[str]]:
+async def gated_call(
+    factory: Callable[[], Awaitable[T]],
+    limiter=None,
+    *,
+    max_retries: int = RETRY_AFTER_ATTEMPTS,
+) -> T:
+    """
+    Один вызов Bot API под общим ограничителем скорости.
+    factory — функция без аргументов, создающая корутину send_* (создаётся заново на каждую попытку).
+    limiter — объект с async acquire() (TokenBucket / AimdRateController) или None — без ограничения.
+
+    На TelegramRetryAfter вызов повторяется (до max_retries раз), получатель не теряется:
+    - если у limiter есть on_throttled() — он ставит глобальную паузу и снижает скорость;
+    - иначе ждём retry_after + 1 сек локально.
+    Успех сообщается в limiter.on_success() (если есть) — для плавного роста скорости.
     """
-    Унифицированный вызов send_* с одной повторной попыткой при RetryAfter.
-    Ждём retry_after + 1 сек и логируем предупреждение, чтобы снизить шанс повторного 429.
+    attempt = 0
+    while True:
+        if limiter is not None:
+            await limiter.acquire()
+        try:
+            res = await factory()
+        except TelegramRetryAfter as e:
+            attempt += 1
+            wait_s = int(getattr(e, "retry_after", 1)) or 1
+            on_throttled = getattr(limiter, "on_throttled", None)
+            if on_throttled is not None:
+                on_throttled(wait_s)
+            if attempt > max_retries:
+                raise
+            log.warning("RetryAfter: повтор %s/%s через %s с", attempt, max_retries, wait_s)
+            if on_throttled is None:
+                await asyncio.sleep(wait_s + 1)  # небольшая подстраховка
+            continue
+
+        on_success = getattr(limiter, "on_success", None)
+        if on_success is not None:
+            on_success()
+        return res
+
+
+async def send_with_retry(
+    factory: Callable[[], Awaitable[Message]],
+    limiter=None,
+) -> Tuple[Optional[Message], Optional[str], Optional[str]]:
+    """
+    Унифицированный вызов send_* с повторами при RetryAfter (см. gated_call).
+    Принимает фабрику корутины: одну и ту же корутину нельзя await-ить повторно.
     Возвращает (Message|None, error_code|None, error_message|None).
     """
     try:
-        msg = await coro
+        msg = await gated_call(factory, limiter)
         return msg, None, None
-    except TelegramRetryAfter as e:
-        wait_s = int(getattr(e, "retry_after", 1)) or 1
-        wait_s += 1  # небольшая подстраховка
-        log.warning("RetryAfter: sleeping for %s s before retry", wait_s)
-        await asyncio.sleep(wait_s)
-        try:
-            msg = await coro
-            return msg, None, None
-        except Exception as e2:
-            return None, classify_exc(e2), str(e2)
     except Exception as e:
         return None, classify_exc(e), str(e)
 
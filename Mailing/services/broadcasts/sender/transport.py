@@ -3,6 +3,7 @@
 # feat(sender): авто-кнопка «Настроить рассылки» (callback) для одиночных сообщений.
 # Альбомы (sendMediaGroup) — без кнопки (Bot API не поддерживает).
 # Дополнительно: единый детектор HTML и аккуратная работа с entities.
+# build_* собирают готовые объекты методов Bot API (без сети) — их же использует компилированный план рассылки.
 
 from __future__ import annotations
 
@@ -10,6 +11,7 @@ import re
 from typing import Any, Dict, List, Optional, Sequence, Union
 
 from aiogram import Bot
+from aiogram.methods import SendDocument, SendMediaGroup, SendMessage, SendPhoto, SendVideo
 from aiogram.types import (
     Message,
     MessageEntity,
@@ -52,10 +54,9 @@ def _with_subscriptions_markup(
         return current_markup
     return subscriptions_kb()
 
-# --- API отправки ---
+# --- сборка методов Bot API (без отправки) ---
 
-async def send_text(
-    bot: Bot,
+def build_text(
     chat_id: Union[int, str],
     text: str,
     *,
@@ -63,16 +64,12 @@ async def send_text(
     parse_html: bool = False,
     reply_markup: Optional[InlineKeyboardMarkup] = None,
     attach_subscriptions: bool = True,
-) -> Message:
-    """
-    Одиночное текстовое сообщение рассылки.
-    Если reply_markup не передан и attach_subscriptions=True — добавляем кнопку «Настроить рассылки».
-    """
+) -> SendMessage:
     reply_markup = _with_subscriptions_markup(reply_markup, enabled=attach_subscriptions)
     ents = _as_entities(entities)
 
     if ents:
-        return await bot.send_message(
+        return SendMessage(
             chat_id=chat_id,
             text=text,
             entities=ents,
@@ -80,22 +77,22 @@ async def send_text(
             disable_web_page_preview=True,
         )
     if parse_html or _looks_like_html(text):
-        return await bot.send_message(
+        return SendMessage(
             chat_id=chat_id,
             text=text,
             parse_mode="HTML",
             reply_markup=reply_markup,
             disable_web_page_preview=True,
         )
-    return await bot.send_message(
+    return SendMessage(
         chat_id=chat_id,
         text=text,
         reply_markup=reply_markup,
         disable_web_page_preview=True,
     )
 
-async def send_single_media(
-    bot: Bot,
+
+def build_single_media(
     chat_id: Union[int, str],
     media_type: str,
     payload: Dict[str, Any],
@@ -103,11 +100,7 @@ async def send_single_media(
     parse_caption_html: bool = False,
     reply_markup: Optional[InlineKeyboardMarkup] = None,
     attach_subscriptions: bool = True,
-) -> Message:
-    """
-    Одна медиа: photo|video|document.
-    Если reply_markup не передан и attach_subscriptions=True — добавляем кнопку «Настроить рассылки».
-    """
+) -> Union[SendPhoto, SendVideo, SendDocument]:
     reply_markup = _with_subscriptions_markup(reply_markup, enabled=attach_subscriptions)
 
     file_id = str(payload.get("file_id"))
@@ -119,7 +112,7 @@ async def send_single_media(
         parse_mode = "HTML"
 
     if media_type == "photo":
-        return await bot.send_photo(
+        return SendPhoto(
             chat_id=chat_id,
             photo=file_id,
             caption=caption,
@@ -129,7 +122,7 @@ async def send_single_media(
         )
 
     if media_type == "video":
-        return await bot.send_video(
+        return SendVideo(
             chat_id=chat_id,
             video=file_id,
             caption=caption,
@@ -139,7 +132,7 @@ async def send_single_media(
         )
 
     # document и «прочее» сводим к document
-    return await bot.send_document(
+    return SendDocument(
         chat_id=chat_id,
         document=file_id,
         caption=caption,
@@ -148,18 +141,17 @@ async def send_single_media(
         reply_markup=reply_markup,
     )
 
-async def send_album(
-    bot: Bot,
+
+def build_album(
     chat_id: Union[int, str],
     items: List[Dict[str, Any]],
-) -> List[Message]:
+) -> Optional[SendMediaGroup]:
     """
-    Альбом до 10 элементов (photo|video|document).
+    Альбом до 10 элементов (photo|video|document); None — если элементов нет.
     Подпись (и caption_entities/HTML) ставим у ПЕРВОГО элемента.
-    ВАЖНО: reply_markup у sendMediaGroup НЕ поддерживается — кнопку не добавляем.
     """
     if not items:
-        return []
+        return None
 
     media: List[Union[InputMediaPhoto, InputMediaVideo, InputMediaDocument]] = []
 
@@ -200,4 +192,64 @@ async def send_album(
                 )
             )
 
-    return await bot.send_media_group(chat_id=chat_id, media=media)
+    return SendMediaGroup(chat_id=chat_id, media=media)
+
+# --- API отправки ---
+
+async def send_text(
+    bot: Bot,
+    chat_id: Union[int, str],
+    text: str,
+    *,
+    entities: Optional[Sequence[Any]] = None,
+    parse_html: bool = False,
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+    attach_subscriptions: bool = True,
+) -> Message:
+    """
+    Одиночное текстовое сообщение рассылки.
+    Если reply_markup не передан и attach_subscriptions=True — добавляем кнопку «Настроить рассылки».
+    """
+    return await bot(build_text(
+        chat_id, text,
+        entities=entities,
+        parse_html=parse_html,
+        reply_markup=reply_markup,
+        attach_subscriptions=attach_subscriptions,
+    ))
+
+async def send_single_media(
+    bot: Bot,
+    chat_id: Union[int, str],
+    media_type: str,
+    payload: Dict[str, Any],
+    *,
+    parse_caption_html: bool = False,
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+    attach_subscriptions: bool = True,
+) -> Message:
+    """
+    Одна медиа: photo|video|document.
+    Если reply_markup не передан и attach_subscriptions=True — добавляем кнопку «Настроить рассылки».
+    """
+    return await bot(build_single_media(
+        chat_id, media_type, payload,
+        parse_caption_html=parse_caption_html,
+        reply_markup=reply_markup,
+        attach_subscriptions=attach_subscriptions,
+    ))
+
+async def send_album(
+    bot: Bot,
+    chat_id: Union[int, str],
+    items: List[Dict[str, Any]],
+) -> List[Message]:
+    """
+    Альбом до 10 элементов (photo|video|document).
+    Подпись (и caption_entities/HTML) ставим у ПЕРВОГО элемента.
+    ВАЖНО: reply_markup у sendMediaGroup НЕ поддерживается — кнопку не добавляем.
+    """
+    method = build_album(chat_id, items)
+    if method is None:
+        return []
+    return await bot(method)
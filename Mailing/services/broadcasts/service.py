@@ -5,25 +5,42 @@ from __future__ import annotations
 import asyncio
 import logging
 import json
+import os
 import time
 from collections import Counter
-from typing import Any, Dict, List, Optional, Tuple, Set
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Set
 
 import config
+import httpx
 from aiogram import Bot
 
 from common.db_api_client import db_api_client
-from common.utils.common import log_and_report
-from common.utils.time_msk import now_msk_naive
-
-from Mailing.services.audience import resolve_audience  # резолв аудитории (ids|kind|sql)
-from storage import remove_membership  # <- обёртка для membership
-from .sender import send_actual
+from common.utils.blocked_cleanup import get_blocked_cleanup
+from common.utils.common import log_and_report, warmup_bot_session
+from common.utils.idset import IdSet
+from common.utils.ratelimit import AimdRateController
+from common.utils.spool import JsonlSpool
+from common.utils.unreachable import get_unreachable
+from common.utils.time_msk import from_iso_naive, now_msk_naive, to_msk_naive
+
+from Mailing.services.audience import AudienceError, iter_audience  # постраничный резолв аудитории (ids|kind|sql)
+from Mailing.services.schedule import is_oneoff_text
+from .engine import SendEngine
+from .reporter import ReportUploader
+from .sender import SendPlan, compile_plan, send_plan
 
 log = logging.getLogger(__name__)
 
-# Меньший батч, чтобы чаще фиксировать прогресс
+# Минимальный (стартовый) батч репорта; дальше размер подстраивается под задержку бэкенда
 REPORT_BATCH = 50
+# Страница чтения уже доставленных при resume
+RESUME_PAGE = 1000
+# 4xx на репорт, которые имеет смысл повторять; остальные 4xx — батч не примут никогда («ядовитый»)
+_REPORT_RETRY_4XX = frozenset({408, 429})
+
+# Рассылки, которые прямо сейчас отправляются этим процессом (защита от двойного запуска)
+_active: Set[int] = set()
 
 
 def _now_msk_sql() -> str:
@@ -124,11 +141,14 @@ def _to_media_items(content: Any) -> List[Dict[str, Any]]:
 
 
 async def _try_materialize(broadcast_id: int, user_ids: List[int]) -> None:
-    """Создаём pending-записи в broadcast_deliveries (мягкий noop, если метод не реализован)."""
+    """
+    Создаём pending-записи в broadcast_deliveries (мягкий noop, если метод не реализован).
+    Вызывается на каждый чанк аудитории, поэтому общий размер рассылки не ограничен limit.
+    """
     if not user_ids:
         return
     try:
-        limit = min(max(1000, len(user_ids)), 200_000)
+        limit = max(1000, len(user_ids))
         res = await db_api_client.deliveries_materialize(
             broadcast_id, payload={"ids": user_ids, "limit": limit}
         )
@@ -150,7 +170,7 @@ def _build_report_items_strict(items: List[Dict[str, Any]]) -> List[Dict[str, An
       {"items":[{"user_id": int, "status": "sent|failed|skipped|pending",
                  "attempt_inc": 1, "sent_at": "YYYY-MM-DD HH:MM:SS",
                  "message_id"?: int, "error_code"?: str, "error_message"?: str}]}
-    None-поля не отправляем.
+    None-поля не отправляем. sent_at из элемента (если есть) сохраняется — важно при досылке из спула.
     """
     out: List[Dict[str, Any]] = []
     ts = _now_msk_sql()
@@ -163,7 +183,7 @@ def _build_report_items_strict(items: List[Dict[str, Any]]) -> List[Dict[str, An
         if uid <= 0 or status not in ("sent", "failed", "skipped", "pending"):
             continue
 
-        obj: Dict[str, Any] = {"user_id": uid, "status": status, "attempt_inc": 1, "sent_at": ts}
+        obj: Dict[str, Any] = {"user_id": uid, "status": status, "attempt_inc": 1, "sent_at": it.get("sent_at") or ts}
 
         mid = it.get("message_id")
         if isinstance(mid, int):
@@ -181,13 +201,17 @@ def _build_report_items_strict(items: List[Dict[str, Any]]) -> List[Dict[str, An
     return out
 
 
-async def _try_report(broadcast_id: int, items: List[Dict[str, Any]]) -> None:
-    """Батч-репорт результатов доставки."""
+async def _try_report(broadcast_id: int, items: List[Dict[str, Any]]) -> bool:
+    """
+    Батч-репорт результатов доставки. False — репорт не ушёл (элементы нужно сохранить и повторить).
+    Батч, который бэкенд отверг (4xx, кроме 408/429), не повторяется: он откладывается в
+    deliveries_<id>.rejected.jsonl и считается выгруженным — иначе он держал бы водяную метку спула.
+    """
     if not items:
-        return
+        return True
     payload_items = _build_report_items_strict(items)
     if not payload_items:
-        return
+        return True
     try:
         res = await db_api_client.deliveries_report(broadcast_id, items=payload_items)
         # чтобы было видно в обычных логах
@@ -199,8 +223,175 @@ async def _try_report(broadcast_id: int, items: List[Dict[str, Any]]) -> None:
                 log.info("report %s: backend updated=%s", broadcast_id, total)
     except AttributeError:
         log.debug("deliveries_report отсутствует в db_api_client — пропускаю")
+    except httpx.HTTPStatusError as e:
+        code = e.response.status_code
+        if code >= 500 or code in _REPORT_RETRY_4XX:
+            log.warning("report %s: ошибка отправки репорта: %s", broadcast_id, e)
+            return False
+        # повтор даст тот же ответ и навсегда задержит водяную метку спула — откладываем батч в сторону
+        log.error(
+            "report %s: бэкенд отверг батч (HTTP %s), %s элементов — в %s",
+            broadcast_id, code, len(payload_items), _rejected_path(broadcast_id),
+        )
+        try:
+            await asyncio.to_thread(_dead_letter, broadcast_id, code, payload_items)
+        except Exception as de:
+            log.error("report %s: отвергнутый батч не сохранён (%s) — отброшен", broadcast_id, de)
     except Exception as e:
         log.warning("report %s: ошибка отправки репорта: %s", broadcast_id, e)
+        return False
+    return True
+
+
+def _rejected_path(broadcast_id: int) -> str:
+    return os.path.join(config.STATE_DIR, "broadcasts", f"deliveries_{int(broadcast_id)}.rejected.jsonl")
+
+
+def _dead_letter(broadcast_id: int, status_code: int, items: List[Dict[str, Any]]) -> None:
+    """Отвергнутые бэкендом репорты — построчно в файл рядом со спулом (разбор вручную)."""
+    path = _rejected_path(broadcast_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for it in items:
+            f.write(json.dumps({"status_code": status_code, "item": it}, ensure_ascii=False) + "\n")
+
+
+# ---- SPOOL / RESUME ----
+
+def _spool_path(broadcast_id: int) -> str:
+    return os.path.join(config.STATE_DIR, "broadcasts", f"deliveries_{int(broadcast_id)}.jsonl")
+
+
+def _open_spool(broadcast_id: int) -> Optional[JsonlSpool]:
+    """Спул репортов рассылки; при проблемах с диском работаем без него (как раньше)."""
+    try:
+        return JsonlSpool(_spool_path(broadcast_id))
+    except Exception as e:
+        log.warning("Рассылка id=%s: спул недоступен (%s), репорты только в памяти", broadcast_id, e)
+        return None
+
+
+async def _replay_spool(broadcast_id: int, spool: JsonlSpool, since: Optional[datetime] = None) -> Set[int]:
+    """
+    Досылает в БД репорты, оставшиеся в спуле после падения.
+    Возвращает user_id со статусом sent из спула (для resume — даже если репорт не удалось дослать);
+    since — только доставленных не раньше начала текущего запуска.
+    """
+    pending = spool.pending()
+    if not pending:
+        return set()
+
+    sent_ids = {
+        int(it["user_id"]) for _, it in pending
+        if isinstance(it, dict) and it.get("status") == "sent" and it.get("user_id") is not None
+        and (since is None or _sent_since(it, since))
+    }
+    log.info("Рассылка id=%s: в спуле %s недосланных репортов — досылаю", broadcast_id, len(pending))
+    for i in range(0, len(pending), REPORT_BATCH):
+        chunk = pending[i:i + REPORT_BATCH]
+        if not await _try_report(broadcast_id, [it for _, it in chunk if isinstance(it, dict)]):
+            log.warning("Рассылка id=%s: досылка спула прервана, остаток сохранён на диске", broadcast_id)
+            break
+        spool.ack(chunk[-1][0])
+    return sent_ids
+
+
+def _run_path(broadcast_id: int) -> str:
+    return os.path.join(config.STATE_DIR, "broadcasts", f"run_{int(broadcast_id)}.json")
+
+
+def _start_run(broadcast_id: int) -> None:
+    """
+    Отметка начала нового запуска (МСК, в формате sent_at репортов): resume пропускает только тех,
+    кому доставлено не раньше неё, — доставки прошлых запусков cron-рассылки не в счёт.
+    """
+    path = _run_path(broadcast_id)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"started_at": _now_msk_sql()}, f)
+        os.replace(tmp, path)
+    except Exception as e:
+        log.warning("Рассылка id=%s: начало запуска не сохранено (%s) — resume учтёт только спул", broadcast_id, e)
+
+
+def _load_run_start(broadcast_id: int) -> Optional[datetime]:
+    try:
+        with open(_run_path(broadcast_id), encoding="utf-8") as f:
+            return from_iso_naive(str(json.load(f).get("started_at") or ""))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.warning("Рассылка id=%s: отметка начала запуска не прочитана: %s", broadcast_id, e)
+        return None
+
+
+def _finish_run(broadcast_id: int) -> None:
+    try:
+        os.remove(_run_path(broadcast_id))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log.warning("Рассылка id=%s: отметка запуска не удалена: %s", broadcast_id, e)
+
+
+def _sent_since(row: Dict[str, Any], since: datetime) -> bool:
+    sent_at = from_iso_naive(str(row.get("sent_at") or ""))
+    return sent_at is not None and to_msk_naive(sent_at) >= since
+
+
+async def _load_sent_ids(broadcast_id: int, since: Optional[datetime] = None) -> IdSet:
+    """
+    Чекпоинт: кому рассылка уже доставлена (broadcast_deliveries.status = sent).
+    since — только доставки текущего запуска (sent_at не раньше его начала, МСК naive).
+    """
+    done = IdSet()
+    offset = 0
+    while True:
+        rows = await db_api_client.list_deliveries(broadcast_id, status="sent", limit=RESUME_PAGE, offset=offset)
+        for r in rows or []:
+            if since is not None and not _sent_since(r, since):
+                continue
+            try:
+                done.add(int(r["user_id"]))
+            except Exception:
+                continue
+        if not rows or len(rows) < RESUME_PAGE:
+            return done
+        offset += len(rows)
+
+
+class _AudienceFeed:
+    """
+    Поток получателей для SendEngine: страница резолва → materialize → отправка.
+    Уже доставленные (resume) отбрасываются здесь же; total/skipped считаются по ходу.
+    """
+
+    def __init__(self, broadcast_id: int, first: List[int], rest: AsyncIterator[List[int]], already: IdSet) -> None:
+        self.broadcast_id = broadcast_id
+        self._first: Optional[List[int]] = first
+        self._rest = rest
+        self._already = already
+        self.total = 0
+        self.skipped = 0
+
+    async def _chunks(self) -> AsyncIterator[List[int]]:
+        if self._first is not None:
+            first, self._first = self._first, None
+            yield first
+        async for chunk in self._rest:
+            yield chunk
+
+    async def __aiter__(self) -> AsyncIterator[int]:
+        async for chunk in self._chunks():
+            await _try_materialize(self.broadcast_id, chunk)
+            self.total += len(chunk)
+            for uid in chunk:
+                if uid in self._already:
+                    self.skipped += 1
+                    continue
+                yield uid
 
 
 # ---- AUTO-CLEANUP FOR BLOCKED USERS ----
@@ -213,33 +404,6 @@ def _is_blocked_error(err_code: Optional[str], err_msg: Optional[str]) -> bool:
     return "bot was blocked by the user" in s2 or ("forbidden" in s2 and "blocked" in s2)
 
 
-async def _cleanup_after_block(user_id: int) -> None:
-    """Удаляем membership только по BOT_ID и запись в user_subscriptions."""
-    # 1) membership (только бот)
-    try:
-        await remove_membership(user_id, config.BOT_ID)
-        m_ok = True
-    except Exception as exc:
-        m_ok = False
-        log.error("user_id=%s – Ошибка remove_membership(bot): %s", user_id, exc, extra={"user_id": user_id})
-
-    # 2) user_subscriptions
-    try:
-        await db_api_client.delete_user_subscriptions(user_id)
-        s_ok = True
-    except Exception as exc:
-        s_ok = False
-        log.error("user_id=%s – Ошибка delete_user_subscriptions: %s", user_id, exc, extra={"user_id": user_id})
-
-    log.info(
-        "user_id=%s – Автоочистка после Forbidden: %s, %s",
-        user_id,
-        "membership(bot)=OK" if m_ok else "membership(bot)=ERR",
-        "subscriptions=OK" if s_ok else "subscriptions=ERR",
-        extra={"user_id": user_id},
-    )
-
-
 async def _notify_admins_about_broadcast(
     bot: Bot,
     *,
@@ -249,6 +413,10 @@ async def _notify_admins_about_broadcast(
     failed: int,
     started_ts: float,
     errors_counter: Counter,
+    limiter: Optional[AimdRateController] = None,
+    skipped: int = 0,
+    cleanup: Optional[Dict[str, int]] = None,
+    unreachable: int = 0,
 ) -> None:
     admins = getattr(config, "ID_ADMIN_USER", set()) or set()
     if not admins:
@@ -265,6 +433,20 @@ async def _notify_admins_about_broadcast(
         f"Ошибок: <b>{failed}</b>",
         f"Длительность: <code>{dur:.1f}с</code>",
     ]
+    if skipped:
+        parts.insert(3, f"Доставлено до перезапуска (пропущено): <b>{skipped}</b>")
+    if unreachable:
+        parts.insert(-1, f"Пропущено (заблокировали бота ранее): <b>{unreachable}</b>")
+    if limiter is not None:
+        parts.append(f"Скорость в конце: <code>{limiter.bucket.rate:.1f} msg/с</code>, 429: <b>{limiter.throttled}</b>")
+    if cleanup and cleanup.get("queued"):
+        line = f"Автоочистка заблокировавших: <b>{cleanup.get('done', 0)}</b> из {cleanup['queued']}"
+        if cleanup.get("failed"):
+            line += f", ошибок: {cleanup['failed']}"
+        pending = cleanup["queued"] - cleanup.get("done", 0) - cleanup.get("failed", 0)
+        if pending > 0:
+            line += f", в очереди: {pending}"
+        parts.append(line)
 
     if errors_counter:
         top = ", ".join(f"{k or 'Unknown'}={v}" for k, v in errors_counter.most_common(5))
@@ -278,105 +460,237 @@ async def _notify_admins_about_broadcast(
             log.warning("admin notify failed user_id=%s: %s", uid, e)
 
 
-async def send_broadcast(bot: Bot, broadcast: dict, throttle_per_sec: Optional[int] = None) -> Tuple[int, int]:
+async def send_broadcast(
+    bot: Bot,
+    broadcast: dict,
+    throttle_per_sec: Optional[int] = None,
+    *,
+    resume: bool = False,
+) -> Tuple[int, int]:
     """
     Основная отправка: читает broadcast['content'], резолвит аудиторию и шлёт каждому.
+    Отправки идут конкурентно (BROADCAST_CONCURRENCY), общий темп держит token bucket.
+
+    Каждый результат сначала пишется в локальный спул (STATE_DIR), потом батчем уходит в БД;
+    недосланное после падения досылается при следующем запуске этой рассылки.
+    resume=True — продолжение прерванной рассылки: получатели со статусом sent в текущем запуске
+    (в broadcast_deliveries не раньше его начала или в спуле) пропускаются и учитываются в sent.
+
     Возвращает (sent, failed).
     """
     bid = broadcast["id"]
+    if bid in _active:
+        log.warning("Рассылка id=%s уже отправляется этим процессом — повторный запуск пропущен", bid)
+        return 0, 0
+
     rate = throttle_per_sec or getattr(config, "BROADCAST_RATE_PER_SEC", 29)
     rate = max(1, int(rate))
-    window = 1.0 / rate
+    concurrency = int(getattr(config, "BROADCAST_CONCURRENCY", 8))
 
     raw_content = broadcast.get("content")
     media_items = _to_media_items(raw_content)
     if not media_items:
         log.error("Рассылка id=%s не отправлена: content пуст или не распознан", bid)
         return 0, 0
+    # контент разбираем один раз на всю рассылку; на получателя — только подстановка chat_id
+    try:
+        plan = compile_plan(media_items)
+    except Exception as e:
+        log.error("Рассылка id=%s не отправлена: контент не собирается в сообщение: %s", bid, e)
+        return 0, 0
 
-    # 2) Аудитория
+    # 2) Аудитория — потоком страниц; первую ждём сразу, чтобы не запускать пустую рассылку
     try:
         target = await db_api_client.get_broadcast_target(bid)
     except Exception as e:
         log.error("Не удалось получить аудиторию рассылки id=%s: %s", bid, e)
         return 0, 0
 
-    audience = await resolve_audience(target)
-    if not audience:
+    pages = iter_audience(target)
+    try:
+        first = await anext(pages, None)
+    except AudienceError as e:
+        log.error("Рассылка id=%s не отправлена: %s", bid, e)
+        return 0, 0
+    if not first:
+        await pages.aclose()
         log.warning("Рассылка id=%s не отправлена: аудитория пустая", bid)
         return 0, 0
 
-    # 3) Материализуем pending
-    await _try_materialize(bid, audience)
+    _active.add(bid)
+    spool = _open_spool(bid)
+    try:
+        since = _load_run_start(bid) if resume else None
+        # 3) Досылаем хвост прошлого запуска; pending материализуются по мере прихода страниц
+        spooled_sent = await _replay_spool(bid, spool, since=since) if spool is not None else set()
+
+        already = IdSet(capacity=8)
+        if not resume:
+            _start_run(bid)
+        else:
+            schedule = (broadcast.get("schedule") or "").strip()
+            try:
+                if since is not None or not schedule or is_oneoff_text(schedule):
+                    # разовая рассылка запускается один раз — все её доставки относятся к этому запуску
+                    already = await _load_sent_ids(bid, since=since)
+                else:
+                    log.warning(
+                        "Resume рассылки id=%s: начало прерванного запуска неизвестно — доставки прошлых "
+                        "запусков cron не отличить, пропускаем только доставленных из спула", bid,
+                    )
+            except Exception as e:
+                # без чекпоинта продолжать нельзя — иначе повторим рассылку всем
+                log.error("Рассылка id=%s: не удалось прочитать доставки для resume: %s", bid, e)
+                return 0, 0
+            already |= spooled_sent
+            log.info("Resume рассылки id=%s: уже доставлено=%s", bid, len(already))
+
+        feed = _AudienceFeed(bid, first, pages, already)
+        result = await _run_broadcast(bot, broadcast, plan, feed, rate, concurrency, spool)
+        # запуск дошёл до конца; прерванный (исключение) оставляет отметку для resume
+        _finish_run(bid)
+        return result
+    finally:
+        await pages.aclose()
+        if spool is not None:
+            spool.close()
+        _active.discard(bid)
+
 
-    log.info("Начинаю рассылку id=%s: аудитория=%s, скорость=%s msg/с", bid, len(audience), rate)
+async def _run_broadcast(
+    bot: Bot,
+    broadcast: dict,
+    plan: SendPlan,
+    audience: _AudienceFeed,
+    rate: int,
+    concurrency: int,
+    spool: Optional[JsonlSpool],
+) -> Tuple[int, int]:
+    bid = broadcast["id"]
+    log.info(
+        "Начинаю рассылку id=%s: аудитория потоком, скорость=%s msg/с, параллельно=%s",
+        bid, rate, concurrency,
+    )
 
     sent = 0
     failed = 0
-    report_buf: List[Dict[str, Any]] = []
+    unreachable_skipped = 0
+    unreachable = get_unreachable()
 
-    cleaned_blocked: Set[int] = set()
     blocked_failed_count = 0
+    cleanup_tag = f"broadcast:{bid}"
+    cleanup = get_blocked_cleanup()
     errors_counter: Counter = Counter()
     started_ts = time.time()
 
-    async def _flush():
-        nonlocal report_buf
-        if report_buf:
-            await _try_report(bid, report_buf)
-            report_buf.clear()
-
-    # 4) Цикл отправки + периодический репорт
+    limiter = AimdRateController(
+        rate,
+        min_rate=getattr(config, "BROADCAST_RATE_MIN", 1.0),
+        max_rate=max(rate, getattr(config, "BROADCAST_RATE_MAX", 30.0)),
+        increase_step=getattr(config, "BROADCAST_RATE_INCREASE_STEP", 1.0),
+        increase_every=getattr(config, "BROADCAST_RATE_INCREASE_EVERY", 100),
+        decrease_factor=getattr(config, "BROADCAST_RATE_DECREASE", 0.5),
+    )
+    engine = SendEngine(concurrency=concurrency)
+
+    # репорты выгружает фоновый воркер: цикл отправки не ждёт DB-API (кроме заполненной очереди)
+    uploader = ReportUploader(
+        lambda items: _try_report(bid, items),
+        spool=spool,
+        name=str(bid),
+        max_pending=getattr(config, "BROADCAST_REPORT_QUEUE", 5000),
+        min_batch=REPORT_BATCH,
+        max_batch=getattr(config, "BROADCAST_REPORT_BATCH_MAX", 1000),
+    ).start()
+    # хвост прошлого запуска, который не удалось дослать сразу, — через ту же очередь
+    # (иначе водяная метка спула обогнала бы его)
+    if spool is not None:
+        for _, item in spool.pending():
+            if isinstance(item, dict):
+                await uploader.submit(item)
+
+    async def _record(item: Dict[str, Any]) -> None:
+        item["sent_at"] = _now_msk_sql()
+        await uploader.submit(item)
+
+    async def _deliver(uid: int) -> None:
+        nonlocal sent, failed, blocked_failed_count, unreachable_skipped
+        # известные «заблокировавшие» — не тратим на них лимит, в БД это skipped, а не failed
+        if uid in unreachable:
+            unreachable_skipped += 1
+            await _record({
+                "user_id": uid,
+                "status": "skipped",
+                "error_code": "Unreachable",
+                "error_message": "пользователь ранее заблокировал бота",
+            })
+            return
+
+        ok, msg_id, err_code, err_msg = await send_plan(bot, plan, uid, limiter=limiter)
+        if ok:
+            sent += 1
+            await _record({"user_id": uid, "status": "sent", "message_id": msg_id})
+        else:
+            failed += 1
+            errors_counter.update([err_code or "Unknown"])
+            await _record({
+                "user_id": uid,
+                "status": "failed",
+                "message_id": msg_id,
+                "error_code": err_code,
+                "error_message": (err_msg[:1000] if err_msg else None),
+            })
+
+            if err_code == "Forbidden":
+                unreachable.add(uid)
+            # Автоочистка на Forbidden (bot blocked) — в фоне, цикл отправки не ждёт HTTP
+            if _is_blocked_error(err_code, err_msg):
+                blocked_failed_count += 1
+                cleanup.submit(uid, cleanup_tag)
+
+    # 4) Конкурентная отправка + периодический репорт
+    # соединения к Bot API — заранее, по одному на параллельную отправку (первые секунды без рукопожатий)
+    warmed = await warmup_bot_session(concurrency, bot=bot)
+    log.info("Рассылка id=%s: прогрето соединений Bot API: %s/%s", bid, warmed, concurrency)
     try:
-        for uid in audience:
-            ok, msg_id, err_code, err_msg = await send_actual(bot, uid, media_items, kb_for_text=None)
-            if ok:
-                sent += 1
-                report_buf.append({"user_id": uid, "status": "sent", "message_id": msg_id})
-            else:
-                failed += 1
-                errors_counter.update([err_code or "Unknown"])
-                report_buf.append({
-                    "user_id": uid,
-                    "status": "failed",
-                    "message_id": msg_id,
-                    "error_code": err_code,
-                    "error_message": (err_msg[:1000] if err_msg else None),
-                })
-
-                # Автоочистка на Forbidden (bot blocked)
-                if uid not in cleaned_blocked and _is_blocked_error(err_code, err_msg):
-                    await _cleanup_after_block(uid)
-                    cleaned_blocked.add(uid)
-                    blocked_failed_count += 1
-
-            if len(report_buf) >= REPORT_BATCH:
-                await _flush()
-
-            await asyncio.sleep(window)
+        await engine.run(audience, _deliver)
     finally:
-        # добросим хвост при любом исходе
-        await _flush()
+        # дренаж очереди репортов при любом исходе (не ушедшее останется в спуле до следующего запуска)
+        await uploader.close()
+        log.info("Рассылка id=%s: репорты %s", bid, uploader.stats())
+        # очистку ждём недолго — только чтобы в уведомлении были итоги; хвост доработает в фоне
+        await cleanup.drain(timeout=30)
+        cleanup_stats = cleanup.pop_stats(cleanup_tag)
+        await unreachable.save()
         # уведомление админам — по факту завершения цикла/ошибки
         try:
             await _notify_admins_about_broadcast(
                 bot,
                 b=broadcast,
-                total=len(audience),
+                total=audience.total,
                 sent=sent,
                 failed=failed,
                 started_ts=started_ts,
                 errors_counter=errors_counter,
+                limiter=limiter,
+                skipped=audience.skipped,
+                cleanup=cleanup_stats,
+                unreachable=unreachable_skipped,
             )
         except Exception as e:
             log.warning("notify admins failed for broadcast %s: %s", bid, e)
 
     # 5) Итоговые логи
+    if limiter.throttled:
+        log.info(
+            "Рассылка id=%s: 429 получено %s раз, итоговая скорость %.1f msg/с",
+            bid, limiter.throttled, limiter.bucket.rate,
+        )
     if sent == 0 and failed > 0:
         if blocked_failed_count == failed:
             log.info(
                 "Рассылка id=%s: аудитория недоступна (все адресаты заблокировали бота). "
-                "Ошибок не создаём, автоочистка выполнена.", bid
+                "Ошибок не создаём, автоочистка поставлена в очередь.", bid
             )
         else:
             log.error("Рассылка id=%s не доставлена никому (ошибок=%s)", bid, failed)
@@ -389,7 +703,8 @@ async def send_broadcast(bot: Bot, broadcast: dict, throttle_per_sec: Optional[i
     else:
         log.info("Рассылка id=%s доставлена полностью: отправлено=%s", bid, sent)
 
-    return sent, failed
+    log.info("Рассылка id=%s: аудитория=%s, пропущено как доставленные=%s", bid, audience.total, audience.skipped)
+    return sent + audience.skipped, failed
 
 
 async def mark_broadcast_sent(broadcast_id: int) -> dict:
@@ -397,19 +712,24 @@ async def mark_broadcast_sent(broadcast_id: int) -> dict:
     return await db_api_client.update_broadcast(broadcast_id, status="sent")
 
 
-async def try_send_now(bot: Bot, broadcast_id: int) -> None:
+async def try_send_now(bot: Bot, broadcast_id: int, *, resume: bool = False) -> Optional[Tuple[int, int]]:
     """
     Немедленный запуск:
       1) статус 'sending'
-      2) send_broadcast(...)
+      2) send_broadcast(...) (resume=True — продолжить прерванную, пропуская уже доставленных)
       3) если что-то отправили — 'sent', иначе 'failed'
+    Возвращает (sent, failed) или None, если запуск не состоялся.
     """
+    if broadcast_id in _active:
+        log.warning("Рассылка id=%s уже отправляется — немедленный запуск пропущен", broadcast_id)
+        return None
+
     try:
         b = await db_api_client.get_broadcast(broadcast_id)
         log.info("Получена рассылка id=%s для немедленного запуска", broadcast_id)
     except Exception as e:
         log.error("Не удалось загрузить рассылку id=%s: %s", broadcast_id, e)
-        return
+        return None
 
     try:
         await db_api_client.update_broadcast(broadcast_id, status="sending")
@@ -417,7 +737,7 @@ async def try_send_now(bot: Bot, broadcast_id: int) -> None:
         log.warning("Не удалось выставить статус 'sending' для id=%s: %s", broadcast_id, e)
 
     try:
-        sent, failed = await send_broadcast(bot, b)
+        sent, failed = await send_broadcast(bot, b, resume=resume)
         if sent > 0:
             await mark_broadcast_sent(broadcast_id)
         else:
@@ -425,12 +745,63 @@ async def try_send_now(bot: Bot, broadcast_id: int) -> None:
                 await db_api_client.update_broadcast(broadcast_id, status="failed")
             except Exception as e2:
                 log.warning("Не удалось пометить 'failed' id=%s: %s", broadcast_id, e2)
+        return sent, failed
     except Exception as e:
         log.error("Ошибка при немедленной отправке рассылки id=%s: %s", broadcast_id, e)
         try:
             await db_api_client.update_broadcast(broadcast_id, status="failed")
         except Exception as e2:
             log.warning("Не удалось пометить 'failed' id=%s после ошибки: %s", broadcast_id, e2)
+        return None
+
+
+async def _replay_orphan_spools(skip: Set[int]) -> None:
+    """Досылает спулы рассылок, которые не будут перезапущены (упали уже после отправки)."""
+    root = os.path.join(config.STATE_DIR, "broadcasts")
+    try:
+        names = sorted(os.listdir(root))
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        log.warning("Спулы рассылок: не удалось прочитать каталог %s: %s", root, e)
+        return
+
+    for name in names:
+        if not (name.startswith("deliveries_") and name.endswith(".jsonl")):
+            continue
+        try:
+            bid = int(name[len("deliveries_"):-len(".jsonl")])
+        except ValueError:
+            continue
+        if bid in skip or bid in _active:
+            continue
+        spool = _open_spool(bid)
+        if spool is None:
+            continue
+        try:
+            await _replay_spool(bid, spool)
+        finally:
+            spool.close()
+
+
+async def resume_interrupted_broadcasts(bot: Bot) -> int:
+    """
+    Запуск после рестарта: рассылки в статусе 'sending' продолжаются с места остановки,
+    оставшиеся спулы остальных рассылок досылаются в БД. Возвращает число продолженных рассылок.
+    """
+    try:
+        rows = await db_api_client.list_broadcasts(status="sending", limit=100)
+    except Exception as e:
+        log.error("Resume рассылок: не удалось получить список 'sending': %s", e)
+        rows = []
+
+    ids = [int(b["id"]) for b in rows or [] if b.get("id") is not None]
+    await _replay_orphan_spools(set(ids))
+
+    for bid in ids:
+        log.info("Resume рассылки id=%s после перезапуска", bid)
+        await try_send_now(bot, bid, resume=True)
+    return len(ids)
 
 
-__all__ = ["send_broadcast", "try_send_now", "mark_broadcast_sent"]
+__all__ = ["send_broadcast", "try_send_now", "mark_broadcast_sent", "resume_interrupted_broadcasts"]
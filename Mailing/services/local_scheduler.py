@@ -4,22 +4,29 @@
 from __future__ import annotations
 
 import asyncio
+import heapq
+import json
 import logging
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Dict, Optional, List
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, List, Tuple
 
 from aiogram import Bot
 
+import config
 from common.db_api_client import db_api_client
+from common.utils.chatlink import parse_exp_aware
 from common.utils.common import log_and_report
 from common.utils.time_msk import MSK
 from Mailing.services.schedule import (
-    parse_and_preview,
+    compile_schedule,
     ScheduleError,
     is_oneoff_text,
-    parse_oneoff_msk,
 )
+from Mailing.services.schedule_index import get_next_fire_index
 from Mailing.services.broadcasts.service import try_send_now
 
 log = logging.getLogger(__name__)
@@ -27,13 +34,79 @@ log = logging.getLogger(__name__)
 
 @dataclass
 class _Planned:
-    task: asyncio.Task
+    bot: Bot
     next_dt: datetime
-    schedule_text: Optional[str]  # None — если задача поставлена по run_at (совместимость)
+    schedule_text: Optional[str]  # None — если запуск поставлен по run_at (совместимость)
+    version: int
+    queued: bool = False  # время наступило: запуск в очереди воркеров или уже идёт
 
 
-# Активные локальные задачи: broadcast_id → _Planned
-_tasks: Dict[int, _Planned] = {}
+@dataclass
+class _CatchUp:
+    """Догоняющие запуски после простоя: пропущенные времена по порядку, выполняются одним воркером."""
+    bot: Bot
+    schedule_text: str
+    slots: List[datetime]
+
+
+# Один планировщик на процесс: min-heap (время запуска, версия, broadcast_id) + одна петля ожидания.
+# Перепланирование/отмена — новая версия в _plans (O(log n)), устаревшие записи кучи пропускаются при извлечении.
+# Наступившие запуски выполняют BROADCAST_SCHEDULER_WORKERS воркеров из очереди.
+_plans: Dict[int, _Planned] = {}
+_heap: List[Tuple[float, int, int]] = []
+_version = 0
+_due: Optional[asyncio.Queue] = None
+_wakeup: Optional[asyncio.Event] = None
+_loop_tasks: List[asyncio.Task] = []
+_running: set[int] = set()
+_stats: Counter = Counter()
+
+# дольше не спим: после сна/suspend хоста монотонные таймеры отстают — сверяемся с настенными часами
+_MAX_SLEEP = 60.0
+
+
+@dataclass
+class _SyncState:
+    keyset: bool = True  # бэк понимает after_id (иначе — страницы по offset)
+    delta: bool = True  # бэк понимает updated_since (иначе — каждый раз полный проход)
+    cursor: Optional[datetime] = None  # максимальный updated_at из увиденных строк (часы бэка)
+    delta_etag: Optional[Tuple[str, str]] = None  # (updated_since, ETag) последнего одностраничного дельта-ответа
+    page_etags: Dict[int, Tuple[str, List[int]]] = field(default_factory=dict)  # after_id → (ETag, id страницы)
+    full_at: float = 0.0  # monotonic последнего полного прохода
+
+
+# Синхронизация с БД: дельта по updated_since (стоимость — по числу изменений), полный проход — изредка
+# или если бэк дельту не умеет; план пересчитывается (croniter) только для изменившихся строк.
+_sync = _SyncState()
+# что синхронизация последний раз видела по рассылке: ((schedule, enabled), был ли после этого план)
+_synced: Dict[int, Tuple[Tuple[str, bool], bool]] = {}
+# запуск не состоялся и план снят — строка в дельту не попадёт, перечитываем её поштучно
+_dirty: set[int] = set()
+
+# перекрытие окна дельты: строки с тем же updated_at, что и курсор, записанные позже, не теряются
+_DELTA_OVERLAP = timedelta(seconds=5)
+
+
+@dataclass
+class _FiredState:
+    """Переживает рестарт (STATE_DIR): когда планировщик точно работал и какие запуски уже стартовали."""
+    alive_at: Optional[float] = None  # время последней успешной синхронизации (epoch)
+    fired: Dict[int, float] = field(default_factory=dict)  # id → время (по расписанию) последнего стартовавшего запуска
+    loaded: bool = False
+    dirty: bool = False
+
+
+# Пропущенные за время простоя запуски (BROADCAST_MISFIRE_POLICY) считаются один раз — в первом полном
+# проходе синхронизации после старта — и ставятся в ту же очередь воркеров, что и обычные запуски.
+_fired_state = _FiredState()
+_fired_lock: Optional[asyncio.Lock] = None
+_catchup_armed = True
+# id → расписание догоняющего запуска, который поставлен в очередь и ещё не завершён: пока первый полный проход
+# не прошёл целиком, каждая следующая синхронизация снова видит те же пропуски — второй раз их не ставим
+_catchup_queued: Dict[int, str] = {}
+
+# политика all: больше последних пропущенных запусков одной рассылки не догоняем
+_MISFIRE_MAX_RUNS = 24
 
 
 # ---------- helpers ----------
@@ -41,9 +114,6 @@ _tasks: Dict[int, _Planned] = {}
 def _now_aw() -> datetime:
     return datetime.now(MSK)
 
-def _secs_until(dt: datetime) -> float:
-    return max(0.0, (dt - _now_aw()).total_seconds())
-
 async def _load_broadcast(bid: int) -> Optional[dict]:
     try:
         return await db_api_client.get_broadcast(bid)
@@ -62,24 +132,16 @@ def _next_dt_from_text(schedule_text: str) -> Optional[datetime]:
     if not schedule_text:
         return None
 
-    # one-off
-    if is_oneoff_text(schedule_text):
-        try:
-            dt = parse_oneoff_msk(schedule_text)
-        except ScheduleError as e:
-            log.warning("Некорректная разовая дата '%s': %s", schedule_text, e)
-            return None
-        return dt if dt > _now_aw() else None
-
-    # cron
+    # разбор — из кеша по тексту расписания (croniter не создаётся заново на каждый пересчёт)
     try:
-        _kind, dates = parse_and_preview(schedule_text, count=1)
-        if not dates:
-            return None
-        return dates[0]
+        compiled = compile_schedule(schedule_text)
     except ScheduleError as e:
-        log.warning("Некорректное расписание '%s': %s", schedule_text, e)
+        if is_oneoff_text(schedule_text):
+            log.warning("Некорректная разовая дата '%s': %s", schedule_text, e)
+        else:
+            log.warning("Некорректное расписание '%s': %s", schedule_text, e)
         return None
+    return compiled.next_after(_now_aw())
 
 
 async def _disable_oneoff(bid: int, schedule_text: str) -> None:
@@ -90,6 +152,439 @@ async def _disable_oneoff(bid: int, schedule_text: str) -> None:
         log.warning("Не удалось выключить one-off #%s (schedule='%s'): %s", bid, schedule_text, e)
 
 
+# ---------- планировщик ----------
+
+def _ensure_loop() -> None:
+    global _due, _wakeup
+    if _loop_tasks and not any(t.done() for t in _loop_tasks):
+        return
+    for t in _loop_tasks:
+        t.cancel()
+    _loop_tasks.clear()
+    _due = asyncio.Queue()
+    _wakeup = asyncio.Event()
+    _loop_tasks.append(asyncio.create_task(_timer_loop(), name="broadcast_scheduler"))
+    for i in range(int(getattr(config, "BROADCAST_SCHEDULER_WORKERS", 4))):
+        _loop_tasks.append(asyncio.create_task(_fire_worker(), name=f"broadcast_scheduler_worker_{i}"))
+    # петлю перезапускаем после сбоя: планы из потерянной очереди ставим заново
+    for bid, plan in _plans.items():
+        plan.queued = False
+        _due_push(bid, plan)
+
+
+def _due_push(bid: int, plan: _Planned) -> None:
+    entry = (plan.next_dt.timestamp(), plan.version, bid)
+    heapq.heappush(_heap, entry)
+    # устаревших записей больше, чем живых, — пересобираем кучу (амортизированно O(1) на операцию)
+    if len(_heap) > 2 * len(_plans) + 64:
+        _heap[:] = [(p.next_dt.timestamp(), p.version, b) for b, p in _plans.items()]
+        heapq.heapify(_heap)
+    if _wakeup is not None and _heap[0] == entry:
+        _wakeup.set()  # новый ближайший запуск — петля пересчитает сон
+
+
+def _plan(bot: Bot, bid: int, next_dt: datetime, schedule_text: Optional[str]) -> None:
+    global _version
+    _ensure_loop()
+    _version += 1
+    plan = _Planned(bot=bot, next_dt=next_dt, schedule_text=schedule_text, version=_version)
+    _plans[bid] = plan
+    _due_push(bid, plan)
+
+
+def _unplan(bid: int) -> bool:
+    """Снимает план (запись в куче станет устаревшей). Идущий запуск не прерывается."""
+    return _plans.pop(bid, None) is not None
+
+
+async def _timer_loop() -> None:
+    while True:
+        now = time.time()
+        while _heap and _heap[0][0] <= now:
+            _ts, version, bid = heapq.heappop(_heap)
+            plan = _plans.get(bid)
+            if plan is None or plan.version != version or plan.queued:
+                continue  # отменён, перепланирован или уже отдан воркерам
+            plan.queued = True
+            _due.put_nowait((bid, plan))
+        sleep_s = min(_heap[0][0] - now, _MAX_SLEEP) if _heap else _MAX_SLEEP
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=max(0.0, sleep_s))
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _fire_worker() -> None:
+    while True:
+        bid, job = await _due.get()
+        catchup = isinstance(job, _CatchUp)
+        # план могли снять/поменять, пока запуск ждал свободного воркера
+        if not catchup and _plans.get(bid) is not job:
+            continue
+        _running.add(bid)
+        try:
+            if catchup:
+                await _fire_catchup(bid, job)
+            elif job.schedule_text is None:
+                await _fire_run_at(job.bot, bid, job)
+            else:
+                await _fire_scheduled(job.bot, bid, job)
+        except Exception as e:
+            log.exception("Ошибка при выполнении задачи для рассылки #%s: %s", bid, e)
+        finally:
+            _running.discard(bid)
+            _stats["catchup" if catchup else "fired"] += 1
+            if catchup:
+                # пропуски уже отмечены в _fired_state; строку перечитаем, чтобы план поставила синхронизация
+                _catchup_queued.pop(bid, None)
+                _dirty.add(bid)
+            # запуск не состоялся (рассылка не загрузилась/выключена) — план снимаем, следующий поставит синхронизация
+            if not catchup and _plans.get(bid) is job:
+                _unplan(bid)
+                _dirty.add(bid)
+
+
+async def _send(bot: Bot, bid: int) -> None:
+    """Запуск рассылки: бэкенд + локальная отправка."""
+    try:
+        await db_api_client.send_broadcast_now(bid)
+    except Exception as exc:
+        log.warning("Бэкенд не смог запустить рассылку #%s: %s", bid, exc)
+    try:
+        await try_send_now(bot, bid)
+    except Exception as exc:
+        log.error("Локальный запуск рассылки #%s не удался: %s", bid, exc)
+
+
+async def _fire_scheduled(bot: Bot, bid: int, plan: _Planned) -> None:
+    schedule_text = plan.schedule_text
+    fresh = await _load_broadcast(bid)
+    if not fresh:
+        return
+    fresh_enabled = bool(fresh.get("enabled", fresh.get("is_enabled", True)))
+    fresh_schedule = (fresh.get("schedule") or "").strip()
+    if not fresh_enabled or fresh_schedule != schedule_text:
+        log.info("Перед запуском параметры рассылки #%s изменились — запуск отменён", bid)
+        return
+
+    # отметка до отправки: упадём посреди рассылки — после рестарта её продолжит resume, а не догоняющий запуск
+    await _mark_fired(bid, plan.next_dt)
+    await _send(bot, bid)
+
+    # После отправки (если за это время план не сняли и не заменили):
+    if _plans.get(bid) is not plan:
+        return
+    _unplan(bid)
+    if is_oneoff_text(schedule_text):
+        await _disable_oneoff(bid, schedule_text)
+    else:
+        # cron — перепланируем
+        await ensure_task_for(bot, dict(id=bid, schedule=schedule_text, enabled=True))
+
+
+async def _fire_catchup(bid: int, job: _CatchUp) -> None:
+    for slot in job.slots:
+        fresh = await _load_broadcast(bid)
+        if not fresh or _row_key(fresh) != (job.schedule_text, True):
+            log.info("Догоняющий запуск рассылки #%s отменён: параметры изменились", bid)
+            return
+        log.info("Догоняющий запуск рассылки #%s за %s (МСК)", bid, slot.strftime("%Y-%m-%d %H:%M:%S"))
+        await _mark_fired(bid, slot)
+        await _send(job.bot, bid)
+    if is_oneoff_text(job.schedule_text):
+        await _disable_oneoff(bid, job.schedule_text)
+
+
+async def _fire_run_at(bot: Bot, bid: int, plan: _Planned) -> None:
+    _unplan(bid)
+    try:
+        await db_api_client.send_broadcast_now(bid)
+    except Exception as exc:
+        await log_and_report(exc, f"локальная отправка, id={bid}")
+        return
+    try:
+        await try_send_now(bot, bid)
+    except Exception:
+        pass
+
+
+def scheduler_stats() -> Dict[str, Any]:
+    return {
+        "planned": len(_plans),
+        "heap": len(_heap),
+        "queued": _due.qsize() if _due is not None else 0,
+        "running": len(_running),
+        "fired": _stats["fired"],
+        "catchup": _stats["catchup"],
+        "misfire_policy": getattr(config, "BROADCAST_MISFIRE_POLICY", "once"),
+        "sync": {
+            "mode": "delta" if _sync.delta and _sync.keyset and _sync.cursor is not None else ("full" if _sync.keyset else "offset"),
+            "known": len(_synced),
+            "dirty": len(_dirty),
+            "full": _stats["sync_full"],
+            "delta": _stats["sync_delta"],
+            "not_modified": _stats["sync_not_modified"],
+            "applied": _stats["sync_applied"],
+        },
+        "index": get_next_fire_index().stats(),
+    }
+
+
+# ---------- пропущенные запуски ----------
+
+def _state_path() -> str:
+    return os.path.join(config.STATE_DIR, "scheduler_state.json")
+
+
+def _load_fired_state() -> _FiredState:
+    st = _fired_state
+    if st.loaded:
+        return st
+    st.loaded = True
+    path = _state_path()
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        st.alive_at = float(data["alive_at"]) if data.get("alive_at") else None
+        st.fired = {int(k): float(v) for k, v in (data.get("fired") or {}).items()}
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log.warning("Планировщик: состояние %s не прочитано (%s) — пропущенные cron-запуски не догоняем", path, e)
+    return st
+
+
+def _write_state(path: str, data: dict) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+async def _save_fired_state() -> None:
+    """Сохраняет состояние, если были изменения (запись файла — в отдельном потоке)."""
+    global _fired_lock
+    st = _load_fired_state()
+    if not st.dirty:
+        return
+    if _fired_lock is None:
+        _fired_lock = asyncio.Lock()
+    async with _fired_lock:
+        if not st.dirty:
+            return
+        st.dirty = False
+        data = {"v": 1, "alive_at": st.alive_at, "fired": {str(k): v for k, v in st.fired.items()}}
+        try:
+            await asyncio.to_thread(_write_state, _state_path(), data)
+        except Exception as e:
+            st.dirty = True
+            log.error("Планировщик: не удалось сохранить %s: %s", _state_path(), e)
+
+
+async def _mark_fired(bid: int, slot: datetime) -> None:
+    st = _load_fired_state()
+    ts = slot.timestamp()
+    if ts > st.fired.get(bid, float("-inf")):
+        st.fired[bid] = ts
+        st.dirty = True
+    await _save_fired_state()
+
+
+async def _touch_alive() -> None:
+    """Отметка «планировщик работал до этого момента»: после рестарта пропущенным считается то, что позже неё."""
+    st = _load_fired_state()
+    st.alive_at = time.time()
+    st.dirty = True
+    await _save_fired_state()
+
+
+def _missed_slots(br: dict) -> List[datetime]:
+    """Запуски, пропущенные за время простоя (не старше BROADCAST_MISFIRE_GRACE), с учётом политики."""
+    policy = getattr(config, "BROADCAST_MISFIRE_POLICY", "once")
+    schedule_text, enabled = _row_key(br)
+    if policy == "skip" or not schedule_text or not enabled:
+        return []
+    try:
+        compiled = compile_schedule(schedule_text)
+    except ScheduleError:
+        return []
+
+    st = _load_fired_state()
+    bid = int(br.get("id"))
+    now = _now_aw()
+    start = now.timestamp() - float(getattr(config, "BROADCAST_MISFIRE_GRACE", 3600))
+    start = max(start, st.fired.get(bid, start))
+    if compiled.kind == "oneoff":
+        # включённая разовая в прошлом так и не стартовала: после запуска её выключают
+        if br.get("status") == "sent":
+            return []
+        dt = compiled.next_after(datetime.fromtimestamp(start, MSK))
+        return [dt] if dt is not None and dt <= now else []
+
+    # cron: пропущенным считаем только то, что должно было сработать после последней синхронизации прошлого процесса
+    if st.alive_at is None:
+        return []
+    slots: List[datetime] = []
+    dt = compiled.next_after(datetime.fromtimestamp(max(start, st.alive_at), MSK))
+    while dt is not None and dt <= now:
+        slots.append(dt)
+        dt = compiled.next_after(dt)
+    return slots[-1:] if policy == "once" else slots[-_MISFIRE_MAX_RUNS:]
+
+
+def _queue_catchup(bot: Bot, bid: int, schedule_text: str, slots: List[datetime]) -> None:
+    _ensure_loop()
+    _catchup_queued[bid] = schedule_text
+    _due.put_nowait((bid, _CatchUp(bot=bot, schedule_text=schedule_text, slots=slots)))
+    log.info(
+        "Рассылка #%s: пропущено за время простоя, догоняем запусков — %s (политика %s)",
+        bid, len(slots), getattr(config, "BROADCAST_MISFIRE_POLICY", "once"),
+    )
+
+
+# ---------- синхронизация ----------
+
+def _row_key(br: dict) -> Tuple[str, bool]:
+    return (br.get("schedule") or "").strip(), bool(br.get("enabled", br.get("is_enabled", True)))
+
+
+def _max_updated(rows: List[dict], current: Optional[datetime]) -> Optional[datetime]:
+    for br in rows:
+        ts = parse_exp_aware(br.get("updated_at"))
+        if ts is not None and (current is None or ts > current):
+            current = ts
+    return current
+
+
+async def _apply(bot: Bot, br: dict) -> None:
+    """План пересчитывается, только если строка изменилась с прошлой синхронизации или план с тех пор пропал."""
+    bid = int(br.get("id"))
+    key = _row_key(br)
+    get_next_fire_index().upsert(br)  # название/статус могли смениться и без смены расписания
+    if _catchup_armed and bid not in _catchup_queued:
+        slots = _missed_slots(br)
+        if slots:
+            _queue_catchup(bot, bid, key[0], slots)
+    if _catchup_queued.get(bid) == key[0] and is_oneoff_text(key[0]):
+        # разовую не планируем и не выключаем: это сделает догоняющий запуск
+        _synced[bid] = (key, False)
+        return
+    if bid not in _dirty and _synced.get(bid) == (key, bid in _plans):
+        return
+    _dirty.discard(bid)
+    await ensure_task_for(bot, br)
+    _synced[bid] = (key, bid in _plans)
+    _stats["sync_applied"] += 1
+
+
+async def _full_scan(bot: Bot) -> None:
+    """Все рассылки постранично (keyset по id; бэк без after_id — offset); снимает планы исчезнувших."""
+    limit = int(getattr(config, "BROADCAST_SYNC_PAGE", 500))
+    seen: set[int] = set()
+    cursor = _sync.cursor
+
+    if _sync.keyset:
+        etags: Dict[int, Tuple[str, List[int]]] = {}
+        after_id = 0
+        while True:
+            cached = _sync.page_etags.get(after_id)
+            rows, etag = await db_api_client.list_broadcasts_page(
+                after_id=after_id, limit=limit, etag=cached[0] if cached else None
+            )
+            if rows is None:
+                # 304: страница та же, что в прошлый раз, — её строки уже применены
+                ids = cached[1]
+                _stats["sync_not_modified"] += 1
+            else:
+                ids = [int(br.get("id")) for br in rows]
+                if any(i <= after_id for i in ids) or ids != sorted(ids):
+                    log.info("DB-API не поддерживает after_id — рассылки синхронизируются страницами по offset")
+                    _sync.keyset = False
+                    break
+                for br in rows:
+                    await _apply(bot, br)
+                cursor = _max_updated(rows, cursor)
+            if etag:
+                etags[after_id] = (etag, ids)
+            seen.update(ids)
+            if len(ids) < limit:
+                break
+            after_id = ids[-1]
+        _sync.page_etags = etags
+
+    if not _sync.keyset:
+        seen.clear()
+        offset = 0
+        while True:
+            rows = await db_api_client.list_broadcasts(limit=limit, offset=offset) or []
+            for br in rows:
+                seen.add(int(br.get("id")))
+                await _apply(bot, br)
+            cursor = _max_updated(rows, cursor)
+            if len(rows) < limit:
+                break
+            offset += len(rows)
+
+    # снимем планы рассылок, которых больше нет в БД
+    for bid in list(_plans.keys()):
+        if bid not in seen:
+            await cancel(bid)
+    for bid in [b for b in _synced if b not in seen]:
+        del _synced[bid]
+    _dirty.intersection_update(seen)
+    _sync.cursor = cursor
+    index = get_next_fire_index()
+    index.retain(seen)
+    index.ready = True
+
+    global _catchup_armed
+    _catchup_armed = False
+    st = _load_fired_state()
+    for bid in [b for b in st.fired if b not in seen]:
+        del st.fired[bid]
+        st.dirty = True
+
+
+async def _delta_scan(bot: Bot) -> bool:
+    """Только строки, изменённые с прошлого прохода. False — бэк фильтр updated_since не применил."""
+    limit = int(getattr(config, "BROADCAST_SYNC_PAGE", 500))
+    since_dt = _sync.cursor - _DELTA_OVERLAP
+    since = since_dt.isoformat()
+    cursor = _sync.cursor
+    after_id = 0
+    while True:
+        etag = None
+        if after_id == 0 and _sync.delta_etag and _sync.delta_etag[0] == since:
+            etag = _sync.delta_etag[1]
+        rows, new_etag = await db_api_client.list_broadcasts_page(
+            after_id=after_id, limit=limit, updated_since=since, etag=etag
+        )
+        if rows is None:
+            _stats["sync_not_modified"] += 1  # 304: с прошлого прохода ничего не менялось
+            return True
+        for br in rows:
+            ts = parse_exp_aware(br.get("updated_at"))
+            if ts is None or ts < since_dt:
+                log.info("DB-API не фильтрует рассылки по updated_since — синхронизация полными проходами")
+                _sync.delta = False
+                return False
+        if after_id == 0:
+            _sync.delta_etag = (since, new_etag) if new_etag and len(rows) < limit else None
+        for br in rows:
+            await _apply(bot, br)
+        cursor = _max_updated(rows, cursor)
+        if len(rows) < limit:
+            break
+        after_id = int(rows[-1].get("id"))
+    # курсор сдвигаем только после всех страниц: они идут по id, а не по updated_at
+    _sync.cursor = cursor
+    return True
+
+
 # ---------- публичный API ----------
 
 async def schedule_after_create(bot: Bot, broadcast_id: int) -> None:
@@ -100,128 +595,81 @@ async def schedule_after_create(bot: Bot, broadcast_id: int) -> None:
 
 
 async def cancel(broadcast_id: int) -> None:
-    """Отменить локальную задачу (если есть)."""
-    planned = _tasks.pop(broadcast_id, None)
-    if planned and not planned.task.done():
-        planned.task.cancel()
-        try:
-            await planned.task
-        except asyncio.CancelledError:
-            pass
-        except Exception:
-            pass
+    """Снять запланированный запуск (если есть); уже идущая отправка доработает."""
+    if _unplan(broadcast_id):
         log.info("Задача для рассылки #%s отменена", broadcast_id)
 
 
 async def ensure_task_for(bot: Bot, br: dict) -> None:
-    """Поставить или обновить ближайшую задачу для рассылки."""
+    """Поставить или обновить ближайший запуск для рассылки."""
     bid = int(br.get("id"))
+    get_next_fire_index().upsert(br)
     schedule_text = (br.get("schedule") or "").strip()
     enabled = bool(br.get("enabled", br.get("is_enabled", True)))
 
-    # выключена или пустое расписание — просто снимем локальную задачу
+    # выключена или пустое расписание — просто снимем план
     if not schedule_text or not enabled:
-        if bid in _tasks:
+        if bid in _plans:
             await cancel(bid)
         return
 
+    existed = _plans.get(bid)
+    # запуск уже наступил (ждёт воркера или идёт) по тому же расписанию — после него воркер перепланирует сам
+    if existed and existed.queued and existed.schedule_text == schedule_text:
+        return
+
     is_oneoff = is_oneoff_text(schedule_text)
     next_dt = _next_dt_from_text(schedule_text)
 
     # просроченный one-off — тихо выключить
     if is_oneoff and next_dt is None:
-        if bid in _tasks:
+        if bid in _plans:
             await cancel(bid)
         await _disable_oneoff(bid, schedule_text)
         return
 
     # некорректное расписание или нет ближайшей точки
     if next_dt is None:
-        if bid in _tasks:
+        if bid in _plans:
             await cancel(bid)
         return
 
-    existed = _tasks.get(bid)
     if existed and existed.schedule_text == schedule_text and abs((existed.next_dt - next_dt).total_seconds()) < 1:
         return
-    if existed:
-        await cancel(bid)
-
-    async def _runner():
-        try:
-            sleep_s = _secs_until(next_dt)
-            if sleep_s > 0:
-                try:
-                    await asyncio.sleep(sleep_s)
-                except asyncio.CancelledError:
-                    log.info("Задача для рассылки #%s отменена до запуска", bid)
-                    return
-
-            fresh = await _load_broadcast(bid)
-            if not fresh:
-                return
-            fresh_enabled = bool(fresh.get("enabled", fresh.get("is_enabled", True)))
-            fresh_schedule = (fresh.get("schedule") or "").strip()
-            if not fresh_enabled or fresh_schedule != schedule_text:
-                log.info("Перед запуском параметры рассылки #%s изменились — запуск отменён", bid)
-                return
-
-            # Запускаем рассылку (бэкенд + локально)
-            try:
-                await db_api_client.send_broadcast_now(bid)
-            except Exception as exc:
-                log.warning("Бэкенд не смог запустить рассылку #%s: %s", bid, exc)
-            try:
-                await try_send_now(bot, bid)
-            except Exception as exc:
-                log.error("Локальный запуск рассылки #%s не удался: %s", bid, exc)
-
-            # После отправки:
-            if is_oneoff:
-                # ВАЖНО: не cancel() текущего таска — убираем из реестра и выключаем запись
-                _tasks.pop(bid, None)
-                await _disable_oneoff(bid, schedule_text)
-            else:
-                # cron — перепланируем
-                nxt = _next_dt_from_text(schedule_text)
-                if nxt:
-                    await ensure_task_for(bot, dict(id=bid, schedule=schedule_text, enabled=True))
-                else:
-                    await cancel(bid)
-
-        except Exception as e:
-            log.exception("Ошибка при выполнении задачи для рассылки #%s: %s", bid, e)
 
-    task = asyncio.create_task(_runner(), name=f"broadcast_plan_{bid}")
-    _tasks[bid] = _Planned(task=task, next_dt=next_dt, schedule_text=schedule_text)
+    _plan(bot, bid, next_dt, schedule_text)
     log.info("Запланирована рассылка #%s на %s (МСК)", bid, next_dt.strftime("%Y-%m-%d %H:%M:%S"))
 
 
 async def refresh_all(bot: Bot) -> None:
-    """Синхронизировать локальные задачи с БД (для воркера)."""
-    broadcasts: List[dict] = []
+    """
+    Синхронизировать локальные планы с БД (для воркера):
+    обычно — только изменённые с прошлого прохода рассылки (updated_since + ETag),
+    раз в BROADCAST_SYNC_FULL_EVERY секунд (и если бэк дельту не умеет) — полный постраничный проход.
+    """
     try:
-        broadcasts = await db_api_client.list_broadcasts()
-    except AttributeError:
-        try:
-            broadcasts = await db_api_client.get_broadcasts()
-        except AttributeError:
-            log.warning("В API нет метода для списка рассылок — синхронизация невозможна")
-            return
+        for bid in list(_dirty):
+            br = await _load_broadcast(bid)
+            if br:
+                await _apply(bot, br)
+
+        full_every = float(getattr(config, "BROADCAST_SYNC_FULL_EVERY", 3600))
+        if (
+            _sync.delta
+            and _sync.keyset
+            and _sync.cursor is not None
+            and time.monotonic() - _sync.full_at < full_every
+            and await _delta_scan(bot)
+        ):
+            _stats["sync_delta"] += 1
+        else:
+            await _full_scan(bot)
+            _sync.full_at = time.monotonic()
+            _stats["sync_full"] += 1
     except Exception as e:
-        log.warning("Ошибка при получении списка рассылок: %s", e)
+        log.warning("Ошибка при синхронизации рассылок: %s", e)
         return
-
-    seen = set()
-    for br in broadcasts or []:
-        bid = int(br.get("id"))
-        seen.add(bid)
-        await ensure_task_for(bot, br)
-
-    # удалим локальные задачи для рассылок, которых больше нет в списке
-    for bid in list(_tasks.keys()):
-        if bid not in seen:
-            await cancel(bid)
+    await _touch_alive()
 
 
 async def run_refresh_loop(bot: Bot, interval_seconds: int) -> None:
@@ -240,52 +688,15 @@ async def run_refresh_loop(bot: Bot, interval_seconds: int) -> None:
 
 # ---------- совместимость: старый API run_at ----------
 
-async def _send_when_due_run_at(bot: Bot, broadcast_id: int, run_at: datetime) -> None:
-    try:
-        delay = _secs_until(run_at if run_at.tzinfo else run_at.replace(tzinfo=MSK))
-        if delay > 0:
-            try:
-                await asyncio.sleep(delay)
-            except asyncio.CancelledError:
-                return
-
-        try:
-            await db_api_client.send_broadcast_now(broadcast_id)
-        except Exception as exc:
-            await log_and_report(exc, f"локальная отправка, id={broadcast_id}")
-            return
-        finally:
-            _tasks.pop(broadcast_id, None)
-
-        try:
-            await try_send_now(bot, broadcast_id)
-        except Exception:
-            pass
-
-    except Exception as exc:
-        await log_and_report(exc, f"локальная задача, id={broadcast_id}")
-
-
 def schedule_broadcast_send(bot: Bot, broadcast_id: int, run_at: datetime) -> None:
     try:
-        old = _tasks.pop(broadcast_id, None)
-        if old and not old.task.done():
-            old.task.cancel()
-
-        task = asyncio.create_task(_send_when_due_run_at(bot, broadcast_id, run_at))
-        _tasks[broadcast_id] = _Planned(
-            task=task,
-            next_dt=run_at if run_at.tzinfo else run_at.replace(tzinfo=MSK),
-            schedule_text=None,
-        )
+        _plan(bot, int(broadcast_id), run_at if run_at.tzinfo else run_at.replace(tzinfo=MSK), None)
     except Exception:
         pass
 
 
 def cancel_broadcast_send(broadcast_id: int) -> None:
     try:
-        old = _tasks.pop(broadcast_id, None)
-        if old and not old.task.done():
-            old.task.cancel()
+        _unplan(int(broadcast_id))
     except Exception:
         pass
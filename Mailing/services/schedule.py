@@ -5,7 +5,8 @@ from __future__ import annotations
 
 import re
 from datetime import datetime, timedelta
-from typing import List, Tuple, Literal
+from functools import lru_cache
+from typing import List, Optional, Tuple, Literal, Union
 from zoneinfo import ZoneInfo
 
 try:
@@ -67,17 +68,68 @@ def preview_cron(s: str, count: int = 5) -> List[datetime]:
     return [it.get_next(datetime).astimezone(_TZ) for _ in range(max(1, int(count)))]
 
 
-def parse_and_preview(schedule: str, count: int = 5) -> Tuple[Kind, List[datetime]]:
+# -------- скомпилированные расписания (кеш по тексту) --------
+
+class CompiledSchedule:
+    """
+    Разобранное расписание: one-off — готовая дата, cron — один экземпляр croniter на текст,
+    который переиспользуется через set_current (выражение второй раз не разбирается).
+    """
+
+    __slots__ = ("text", "kind", "_dt", "_cron")
+
+    def __init__(self, text: str, kind: Kind, dt: Optional[datetime] = None, cron=None) -> None:
+        self.text = text
+        self.kind = kind
+        self._dt = dt
+        self._cron = cron
+
+    def next_after(self, start: Optional[datetime] = None) -> Optional[datetime]:
+        """Ближайший запуск строго после start (по умолчанию — сейчас); прошедший one-off — None."""
+        start = start or datetime.now(_TZ)
+        if self.kind == "oneoff":
+            return self._dt if self._dt > start else None
+        self._cron.set_current(start, force=True)
+        return self._cron.get_next(datetime).astimezone(_TZ)
+
+    def preview(self, count: int = 5) -> List[datetime]:
+        if self.kind == "oneoff":
+            return [ensure_future(self._dt)]
+        self._cron.set_current(datetime.now(_TZ), force=True)
+        return [self._cron.get_next(datetime).astimezone(_TZ) for _ in range(max(1, int(count)))]
+
+
+@lru_cache(maxsize=4096)
+def _compile(schedule: str) -> Union[CompiledSchedule, str]:
+    # ошибку кешируем текстом: один и тот же экземпляр исключения при каждом raise копил бы traceback
+    try:
+        # one-off — распознаём мягко (1–2 цифры)
+        if is_oneoff_text(schedule):
+            return CompiledSchedule(schedule, "oneoff", dt=parse_oneoff_msk(schedule))
+    except ScheduleError as e:
+        return str(e)
+    # иначе — это cron
+    if not is_valid_cron(schedule):
+        return "Неверный cron (5 полей). Пример: <code>0 15 * * 1,3,5</code>"
+    if croniter is None:
+        return "Для cron-превью добавьте зависимость <code>croniter</code>."
+    return CompiledSchedule(schedule, "cron", cron=croniter(schedule, datetime.now(_TZ)))
+
+
+def compile_schedule(schedule: str) -> CompiledSchedule:
+    """Разобранное расписание из кеша (по тексту); некорректное или пустое — ScheduleError."""
     schedule = (schedule or "").strip()
     if not schedule:
         raise ScheduleError("Пустое расписание. Введите дату/время или cron.")
-    # one-off — распознаём мягко (1–2 цифры)
-    if is_oneoff_text(schedule):
-        return "oneoff", [ensure_future(parse_oneoff_msk(schedule))]
-    # иначе — это cron
-    if not is_valid_cron(schedule):
-        raise ScheduleError("Неверный cron (5 полей). Пример: <code>0 15 * * 1,3,5</code>")
-    return "cron", preview_cron(schedule, count=count)
+    compiled = _compile(schedule)
+    if isinstance(compiled, str):
+        raise ScheduleError(compiled)
+    return compiled
+
+
+def parse_and_preview(schedule: str, count: int = 5) -> Tuple[Kind, List[datetime]]:
+    compiled = compile_schedule(schedule)
+    return compiled.kind, compiled.preview(count)
 
 
 def format_preview(kind: str, dates: List[datetime]) -> str:
@@ -0,0 +1,124 @@
+# Mailing/services/schedule_index.py
+# Индекс ближайших запусков рассылок в памяти, упорядоченный по времени (bisect).
+# Держит его планировщик (синхронизация с БД, ensure_task_for); «ближайшие 7 дней» в менеджере —
+# выборка по диапазону вместо разбора расписаний всех рассылок на каждый клик.
+
+from __future__ import annotations
+
+import bisect
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from common.utils.time_msk import MSK
+from Mailing.services.schedule import ScheduleError, compile_schedule
+
+# поля строки рассылки, которые нужны списку менеджера (content и прочее в памяти не держим)
+_META = ("id", "title", "kind", "schedule", "enabled", "status")
+
+
+class NextFireIndex:
+    """
+    - upsert(br) — строка рассылки (можно неполную: поля сливаются с прежними); время запуска
+      пересчитывается только при смене текста расписания (разбор — из кеша compile_schedule);
+    - remove(bid) / retain(ids) — рассылки больше нет в БД;
+    - between(start, end, predicate) — строки с ближайшим запуском в [start, end] по возрастанию времени
+      (в строке — "_next_dt"); прошедшие запуски (выключенный cron сам не перепланируется) пересчитываются
+      лениво при выборке;
+    - ready — индекс заполнен полным проходом синхронизации; до этого менеджер читает БД сам.
+    """
+
+    def __init__(self) -> None:
+        self._keys: List[Tuple[datetime, int]] = []  # (ближайший запуск, id) по возрастанию
+        self._entries: Dict[int, Tuple[Optional[datetime], Dict[str, Any]]] = {}  # id → (запуск или None, поля)
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _next(schedule: str, now: datetime) -> Optional[datetime]:
+        try:
+            return compile_schedule(schedule).next_after(now)
+        except ScheduleError:
+            return None
+
+    def _set(self, bid: int, next_dt: Optional[datetime], meta: Dict[str, Any]) -> None:
+        old = self._entries.get(bid)
+        if old is not None and old[0] is not None and old[0] != next_dt:
+            i = bisect.bisect_left(self._keys, (old[0], bid))
+            if i < len(self._keys) and self._keys[i] == (old[0], bid):
+                del self._keys[i]
+        if next_dt is not None and (old is None or old[0] != next_dt):
+            bisect.insort(self._keys, (next_dt, bid))
+        self._entries[bid] = (next_dt, meta)
+
+    def upsert(self, br: Dict[str, Any]) -> None:
+        bid = int(br["id"])
+        old = self._entries.get(bid)
+        meta = dict(old[1]) if old is not None else {}
+        meta.update({k: br[k] for k in _META if k in br})
+        schedule = (meta.get("schedule") or "").strip()
+        if old is not None and (old[1].get("schedule") or "").strip() == schedule:
+            next_dt = old[0]
+        else:
+            next_dt = self._next(schedule, datetime.now(MSK)) if schedule else None
+        self._set(bid, next_dt, meta)
+
+    def remove(self, bid: int) -> None:
+        old = self._entries.get(bid)
+        if old is None:
+            return
+        self._set(bid, None, old[1])
+        del self._entries[bid]
+
+    def retain(self, ids: Iterable[int]) -> None:
+        """Оставить только рассылки из ids (после полного прохода: остальных в БД уже нет)."""
+        keep = set(ids)
+        for bid in [b for b in self._entries if b not in keep]:
+            self.remove(bid)
+
+    def _refresh_stale(self, now: datetime) -> None:
+        cut = bisect.bisect_left(self._keys, (now,))
+        if not cut:
+            return
+        stale = self._keys[:cut]
+        del self._keys[:cut]
+        for _dt, bid in stale:
+            meta = self._entries[bid][1]
+            next_dt = self._next((meta.get("schedule") or "").strip(), now)
+            self._entries[bid] = (next_dt, meta)
+            if next_dt is not None:
+                bisect.insort(self._keys, (next_dt, bid))
+
+    def between(
+        self,
+        start: datetime,
+        end: datetime,
+        predicate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> List[Dict[str, Any]]:
+        self._refresh_stale(start)
+        lo = bisect.bisect_left(self._keys, (start,))
+        hi = bisect.bisect_right(self._keys, (end, float("inf")))
+        out: List[Dict[str, Any]] = []
+        for next_dt, bid in self._keys[lo:hi]:
+            meta = self._entries[bid][1]
+            if predicate is None or predicate(meta):
+                out.append({**meta, "_next_dt": next_dt})
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {"known": len(self._entries), "upcoming": len(self._keys), "ready": self.ready}
+
+
+_index: Optional[NextFireIndex] = None
+
+
+def get_next_fire_index() -> NextFireIndex:
+    """Общий индекс процесса (создаётся лениво)."""
+    global _index
+    if _index is None:
+        _index = NextFireIndex()
+    return _index
+
+
+__all__ = ["NextFireIndex", "get_next_fire_index"]
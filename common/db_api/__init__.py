@@ -3,7 +3,7 @@ from __future__ import annotations
 
 from typing import Optional
 
-from .base import BaseApi
+from .base import BaseApi, CircuitOpenError, DeadlineExceeded, db_call_budget, db_deadline
 from .users import UsersMixin
 from .chats import ChatsMixin
 from .memberships import MembershipsMixin
@@ -36,4 +36,4 @@ class DBApiClient(  # сохраняем то же имя класса
 # Готовый singleton, как и раньше
 db_api_client = DBApiClient()
 
-__all__ = ["DBApiClient", "db_api_client"]
+__all__ = ["DBApiClient", "db_api_client", "CircuitOpenError", "DeadlineExceeded", "db_call_budget", "db_deadline"]
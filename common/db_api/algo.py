@@ -10,9 +10,7 @@ log = logging.getLogger(__name__)
 class AlgoMixin(BaseApi):
     async def get_progress(self, user_id: int) -> dict:
         try:
-            r = await self.client.get(f"/algo/{user_id}")
-            r.raise_for_status()
-            return r.json()
+            return await self._get_json(f"/algo/{user_id}")
         except Exception as e:
             log.error("Алгоритм: ошибка получения прогресса — user_id=%s, ошибка=%s", user_id, e, extra={"user_id": user_id})
             raise
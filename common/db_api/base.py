@@ -1,10 +1,16 @@
 # services/db_api/base.py
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Optional
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import httpx
+import config
 from config import DB_API_URL, API_KEY_VALUE
 
 log = logging.getLogger(__name__)
@@ -35,15 +41,333 @@ async def _log_response(response: httpx.Response):
         pass
 
 
+# ---------- бюджеты времени и автомат (circuit breaker) ----------
+
+class CircuitOpenError(httpx.TransportError):
+    """Эндпоинт временно отключён автоматом: запрос не отправлялся."""
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """Бюджет времени вызова (или всего обработчика) исчерпан."""
+
+
+# Абсолютный дедлайн (time.monotonic) для всех вызовов DB-API в текущем контексте
+_deadline: ContextVar[Optional[float]] = ContextVar("db_api_deadline", default=None)
+
+
+@contextmanager
+def db_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Общий бюджет на все вызовы DB-API внутри блока (вложенные блоки могут только сократить его).
+    None — снять внешний бюджет (для фоновых воркеров, запущенных из обработчика).
+    """
+    if seconds is None:
+        token = _deadline.set(None)
+    else:
+        new = time.monotonic() + max(0.0, float(seconds))
+        cur = _deadline.get()
+        token = _deadline.set(min(cur, new) if cur is not None else new)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+# Бюджет одного вызова вместо call_budget транспорта (None — бюджет транспорта)
+_call_budget: ContextVar[Optional[float]] = ContextVar("db_api_call_budget", default=None)
+
+
+@contextmanager
+def db_call_budget(seconds: float) -> Iterator[None]:
+    """
+    Бюджет на каждый вызов DB-API внутри блока вместо DB_API_CALL_BUDGET — для тяжёлых пакетных эндпоинтов.
+    Внешний db_deadline() по-прежнему действует: общий дедлайн этот бюджет только сокращает.
+    """
+    token = _call_budget.set(max(0.0, float(seconds)))
+    try:
+        yield
+    finally:
+        _call_budget.reset(token)
+
+
+_ID_SEGMENT = re.compile(r"/-?\d+(?=/|$)")
+_IDEMPOTENT = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+_RETRY_STATUS = frozenset({502, 503, 504})
+# ответы на пакетную запись, означающие «у бэка нет такого маршрута» (см. BaseApi._put_bulk)
+_NO_ROUTE = frozenset({404, 405, 422, 501})
+
+_CLOSED, _OPEN, _HALF_OPEN = "closed", "open", "half_open"
+
+
+def _endpoint(request: httpx.Request) -> str:
+    """Ключ автомата: метод + путь без числовых id (/users/42 → /users/{id})."""
+    return f"{request.method} {_ID_SEGMENT.sub('/{id}', request.url.path)}"
+
+
+class _Breaker:
+    __slots__ = ("key", "state", "failures", "opened_at", "reset", "probing", "opens", "rejected")
+
+    def __init__(self, key: str, reset: float) -> None:
+        self.key = key
+        self.state = _CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.reset = reset
+        self.probing = False
+        self.opens = 0
+        self.rejected = 0
+
+    def allow(self, now: float) -> bool:
+        if self.state == _CLOSED:
+            return True
+        if self.state == _OPEN:
+            if now - self.opened_at < self.reset:
+                return False
+            self.state = _HALF_OPEN
+            self.probing = False
+            log.info("DB-API: %s — пробный запрос после паузы", self.key, extra={"user_id": "system"})
+        # half-open: пропускаем ровно один пробный запрос
+        if self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def success(self, base_reset: float) -> None:
+        if self.state != _CLOSED:
+            log.info("DB-API: %s снова доступен — автомат замкнут", self.key, extra={"user_id": "system"})
+        self.state = _CLOSED
+        self.failures = 0
+        self.probing = False
+        self.reset = base_reset
+
+    def failure(self, now: float, threshold: int, max_reset: float) -> None:
+        self.failures += 1
+        if self.state == _HALF_OPEN:
+            # проба не прошла — пауза растёт вдвое
+            self.reset = min(max_reset, self.reset * 2)
+        elif self.failures < threshold:
+            return
+        self.state = _OPEN
+        self.opened_at = now
+        self.probing = False
+        self.opens += 1
+        log.warning(
+            "DB-API: %s — %s ошибок подряд, автомат разомкнут на %.0f с",
+            self.key, self.failures, self.reset, extra={"user_id": "system"},
+        )
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """
+    Транспорт httpx для DB-API вместо глобальных повторов:
+    - бюджет на вызов (call_budget, в блоке db_call_budget() — свой) — вместе со всеми повторами;
+      внешний db_deadline() может его сократить;
+    - повторы 5xx/сетевых ошибок с экспоненциальной паузой, только пока хватает бюджета:
+      идемпотентные методы — на любые такие ошибки, POST/PATCH — только если соединение не установилось;
+    - автомат на эндпоинт: failures ошибок подряд → быстрый отказ (CircuitOpenError) на reset секунд,
+      затем один пробный запрос; неудачная проба удваивает паузу (до 8× reset).
+    """
+
+    def __init__(
+        self,
+        inner: Optional[httpx.AsyncBaseTransport] = None,
+        *,
+        call_budget: float = 5.0,
+        retries: int = 3,
+        backoff_min: float = 0.5,
+        backoff_max: float = 5.0,
+        failures: int = 5,
+        reset: float = 15.0,
+    ) -> None:
+        self._inner = inner or httpx.AsyncHTTPTransport()
+        self.call_budget = float(call_budget)
+        self.retries = max(1, int(retries))
+        self.backoff_min = float(backoff_min)
+        self.backoff_max = float(backoff_max)
+        self.failures = max(1, int(failures))
+        self.reset = float(reset)
+        self._breakers: Dict[str, _Breaker] = {}
+
+    def _breaker(self, key: str) -> _Breaker:
+        br = self._breakers.get(key)
+        if br is None:
+            br = self._breakers[key] = _Breaker(key, self.reset)
+        return br
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = _endpoint(request)
+        br = self._breaker(key)
+        budget = _call_budget.get()
+        deadline = time.monotonic() + (self.call_budget if budget is None else budget)
+        outer = _deadline.get()
+        if outer is not None:
+            deadline = min(deadline, outer)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            now = time.monotonic()
+            left = deadline - now
+            if left <= 0:
+                raise DeadlineExceeded(f"DB-API: бюджет времени исчерпан ({key})", request=request)
+            if not br.allow(now):
+                br.rejected += 1
+                raise CircuitOpenError(f"DB-API: {key} временно недоступен (автомат разомкнут)", request=request)
+
+            response: Optional[httpx.Response] = None
+            error: Optional[Exception] = None
+            try:
+                async with asyncio.timeout(left):
+                    response = await self._inner.handle_async_request(request)
+            except TimeoutError:
+                error = DeadlineExceeded(f"DB-API: бюджет времени исчерпан ({key})", request=request)
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                br.probing = False
+                raise
+
+            if response is not None and response.status_code < 500:
+                br.success(self.reset)
+                return response
+
+            br.failure(time.monotonic(), self.failures, self.reset * 8)
+
+            if response is not None:
+                retryable = request.method in _IDEMPOTENT and response.status_code in _RETRY_STATUS
+            else:
+                retryable = request.method in _IDEMPOTENT or isinstance(error, httpx.ConnectError)
+            pause = min(self.backoff_max, self.backoff_min * (2 ** (attempt - 1)))
+            if (
+                not retryable
+                or isinstance(error, DeadlineExceeded)
+                or attempt >= self.retries
+                or br.state == _OPEN
+                or time.monotonic() + pause >= deadline
+            ):
+                if error is not None:
+                    raise error
+                return response  # 5xx — вызывающий получит HTTPStatusError из raise_for_status()
+
+            if response is not None:
+                await response.aclose()
+            log.warning(
+                "DB-API: %s — попытка %s не удалась (%s), повтор через %.1f с",
+                key, attempt, error if error is not None else response.status_code, pause,
+                extra={"user_id": "system"},
+            )
+            await asyncio.sleep(pause)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Состояние автоматов по эндпоинтам (только те, что хоть раз срабатывали или сейчас не замкнуты)."""
+        return {
+            key: {"state": br.state, "failures": br.failures, "opens": br.opens, "rejected": br.rejected}
+            for key, br in self._breakers.items()
+            if br.opens or br.state != _CLOSED
+        }
+
+
 class BaseApi:
+    """
+    Single-flight для чтений: одинаковые GET (путь + параметры), которые уже летят, не дублируются —
+    все ждут один HTTP-вызов и получают один и тот же разобранный JSON (его нельзя мутировать на месте).
+    GET, начатый после отправки любой записи, к старому полёту не присоединяется.
+    """
+
     def __init__(self, api_url: Optional[str] = None, timeout: float = 10.0) -> None:
         base_url = (api_url or DB_API_URL).rstrip("/")
+        self.transport = ResilientTransport(
+            call_budget=getattr(config, "DB_API_CALL_BUDGET", 5.0),
+            retries=getattr(config, "HTTP_RETRIES", 3),
+            backoff_min=getattr(config, "HTTP_BACKOFF_MIN", 0.5),
+            backoff_max=getattr(config, "HTTP_BACKOFF_MAX", 5.0),
+            failures=getattr(config, "DB_API_BREAKER_FAILURES", 5),
+            reset=getattr(config, "DB_API_BREAKER_RESET", 15.0),
+        )
+        self.bulk_budget = float(getattr(config, "DB_API_BULK_BUDGET", 30.0))
         self.client = httpx.AsyncClient(
             base_url=base_url,
             timeout=timeout,
             headers={"X-API-KEY": API_KEY_VALUE},
-            event_hooks={"request": [_log_request], "response": [_log_response]},
+            event_hooks={"request": [_log_request, self._note_write], "response": [_log_response]},
+            transport=self.transport,
         )
+        self._inflight: Dict[Tuple[Any, ...], "asyncio.Task[Any]"] = {}
+        self._write_gen = 0
+        self.sf_calls = 0
+        self.sf_coalesced = 0
+
+    def _bulk_call(self):
+        """Бюджет пакетного эндпоинта (DB_API_BULK_BUDGET) для вызова внутри блока."""
+        return db_call_budget(self.bulk_budget)
+
+    async def _note_write(self, request: httpx.Request) -> None:
+        if request.method not in ("GET", "HEAD"):
+            self._write_gen += 1
+
+    async def _fetch_json(self, path: str, params: Optional[Dict[str, Any]]) -> Any:
+        r = await self.client.get(path, params=params)
+        r.raise_for_status()
+        return r.json()
+
+    async def _get_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """GET → JSON с объединением одинаковых одновременных запросов; ошибки получают все ожидающие."""
+        key = (path, tuple(sorted((params or {}).items())), self._write_gen)
+        task = self._inflight.get(key)
+        if task is None:
+            self.sf_calls += 1
+            # отдельная задача: отмена первого вызывающего не обрывает запрос для остальных
+            task = asyncio.ensure_future(self._fetch_json(path, params))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        else:
+            self.sf_coalesced += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: Tuple[Any, ...], task: "asyncio.Task[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # все ожидающие могли уйти — не даём asyncio ругаться на «необработанное» исключение
+
+    async def _put_bulk(self, path: str, items: List[Dict[str, Any]]) -> Optional[List[Any]]:
+        """
+        Пакетная запись: PUT {"items": [...]} → {"results": [{"status": код, "data": ...}, ...]} в том же порядке.
+        Элемент с кодом >= 400 возвращается как HTTPStatusError (как если бы его писали поштучно).
+        None — у бэка нет такого маршрута (_NO_ROUTE: 404/405, 422 — путь попал в чужой маршрут
+        с параметром и не прошёл валидацию, 501): пишем поштучно.
+        """
+        r = await self.client.put(path, json={"items": items})
+        if r.status_code in _NO_ROUTE:
+            return None
+        r.raise_for_status()
+        results = r.json().get("results")
+        if not isinstance(results, list) or len(results) != len(items):
+            raise ValueError(f"DB-API: некорректный ответ пакетной записи {path}")
+        out: List[Any] = []
+        for res in results:
+            status = int(res.get("status", 200))
+            if status >= 400:
+                item_response = httpx.Response(status, json=res.get("data"), request=r.request)
+                out.append(httpx.HTTPStatusError(f"HTTP {status} для элемента пакета {path}", request=r.request, response=item_response))
+            else:
+                out.append(res.get("data"))
+        return out
+
+    def breaker_stats(self) -> Dict[str, Dict[str, Any]]:
+        return self.transport.stats()
+
+    def singleflight_stats(self) -> Dict[str, Any]:
+        total = self.sf_calls + self.sf_coalesced
+        return {
+            "http_calls": self.sf_calls,
+            "coalesced": self.sf_coalesced,
+            "coalesced_rate": round(self.sf_coalesced / total, 3) if total else 0.0,
+            "in_flight": len(self._inflight),
+        }
 
     async def close(self) -> None:
         try:
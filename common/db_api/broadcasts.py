@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from .base import BaseApi
 
@@ -45,9 +45,7 @@ class BroadcastsMixin(BaseApi):
 
     async def get_broadcast(self, broadcast_id: int) -> Dict[str, Any]:
         try:
-            r = await self.client.get(f"/broadcasts/{broadcast_id}")
-            r.raise_for_status()
-            return r.json()
+            return await self._get_json(f"/broadcasts/{broadcast_id}")
         except Exception as e:
             log.error("Рассылки: ошибка получения — id=%s, ошибка=%s", broadcast_id, e)
             raise
@@ -66,9 +64,7 @@ class BroadcastsMixin(BaseApi):
         if enabled is not None:
             params["enabled"] = bool(enabled)
         try:
-            r = await self.client.get("/broadcasts", params=params)
-            r.raise_for_status()
-            return r.json()
+            return await self._get_json("/broadcasts", params=params)
         except Exception as e:
             log.error(
                 "Рассылки: ошибка списка — status=%s, enabled=%s, limit=%s, offset=%s, ошибка=%s",
@@ -76,6 +72,37 @@ class BroadcastsMixin(BaseApi):
             )
             raise
 
+    async def list_broadcasts_page(
+        self,
+        *,
+        after_id: int = 0,
+        limit: int = 500,
+        updated_since: Optional[str] = None,
+        etag: Optional[str] = None,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """
+        Страница для синхронизации планировщика: рассылки с id > after_id по возрастанию id (keyset),
+        updated_since — только изменённые не раньше этого момента (по updated_at).
+        etag — If-None-Match: ответ 304 → (None, etag), страница не менялась; иначе (строки, ETag ответа).
+        Бэк без поддержки after_id/updated_since их просто игнорирует — это проверяет вызывающий.
+        """
+        params: Dict[str, Any] = {"after_id": int(after_id), "limit": int(limit)}
+        if updated_since is not None:
+            params["updated_since"] = updated_since
+        headers = {"If-None-Match": etag} if etag else None
+        try:
+            r = await self.client.get("/broadcasts", params=params, headers=headers)
+            if r.status_code == 304:
+                return None, etag
+            r.raise_for_status()
+            return r.json(), r.headers.get("ETag")
+        except Exception as e:
+            log.error(
+                "Рассылки: ошибка страницы синхронизации — after_id=%s, updated_since=%s, ошибка=%s",
+                after_id, updated_since, e,
+            )
+            raise
+
     async def update_broadcast(
         self,
         broadcast_id: int,
@@ -120,9 +147,7 @@ class BroadcastsMixin(BaseApi):
     # -------- target --------
     async def get_broadcast_target(self, broadcast_id: int) -> Dict[str, Any]:
         try:
-            r = await self.client.get(f"/broadcasts/{broadcast_id}/target")
-            r.raise_for_status()
-            return r.json()
+            return await self._get_json(f"/broadcasts/{broadcast_id}/target")
         except Exception as e:
             log.error("Рассылки: ошибка получения таргета — id=%s, ошибка=%s", broadcast_id, e)
             raise
@@ -146,11 +171,19 @@ class BroadcastsMixin(BaseApi):
             log.error("Аудитория: ошибка предпросмотра — тип=%s, лимит=%s, ошибка=%s", target_payload.get("type"), limit, e)
             raise
 
-    async def audiences_resolve(self, target_payload: Dict[str, Any], limit: Optional[int] = None) -> Dict[str, Any]:
+    async def audiences_resolve(
+        self,
+        target_payload: Dict[str, Any],
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> Dict[str, Any]:
         payload: Dict[str, Any] = {"target": target_payload}
         if limit is not None:
             payload["limit"] = int(limit)
-        r = await self.client.post("/audiences/resolve", json=payload)
+        if offset:
+            payload["offset"] = int(offset)
+        with self._bulk_call():
+            r = await self.client.post("/audiences/resolve", json=payload)
         r.raise_for_status()
         return r.json()
 
@@ -170,16 +203,15 @@ class BroadcastsMixin(BaseApi):
         if status:
             params["status"] = status
         try:
-            r = await self.client.get(f"/broadcasts/{broadcast_id}/deliveries", params=params)
-            r.raise_for_status()
-            return r.json()
+            return await self._get_json(f"/broadcasts/{broadcast_id}/deliveries", params=params)
         except Exception as e:
             log.error("Доставки: ошибка списка — id=%s, status=%s, limit=%s, offset=%s, ошибка=%s", broadcast_id, status, limit, offset, e)
             raise
 
     async def deliveries_materialize(self, broadcast_id: int, payload: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            r = await self.client.post(f"/broadcasts/{broadcast_id}/deliveries/materialize", json=payload)
+            with self._bulk_call():
+                r = await self.client.post(f"/broadcasts/{broadcast_id}/deliveries/materialize", json=payload)
             r.raise_for_status()
             return r.json()
         except Exception as e:
@@ -188,7 +220,8 @@ class BroadcastsMixin(BaseApi):
 
     async def deliveries_report(self, broadcast_id: int, items: List[Dict[str, Any]]) -> Dict[str, Any]:
         try:
-            r = await self.client.post(f"/broadcasts/{broadcast_id}/deliveries/report", json={"items": items})
+            with self._bulk_call():
+                r = await self.client.post(f"/broadcasts/{broadcast_id}/deliveries/report", json={"items": items})
             r.raise_for_status()
             return r.json()
         except Exception as e:
@@ -11,9 +11,7 @@ log = logging.getLogger(__name__)
 class ChatsMixin(BaseApi):
     async def get_chats(self) -> List[Any]:
         try:
-            r = await self.client.get("/chats/")
-            r.raise_for_status()
-            return r.json()
+            return await self._get_json("/chats/")
         except Exception as e:
             log.error("Чаты: ошибка получения списка — ошибка=%s", e, extra={"user_id": "system"})
             raise
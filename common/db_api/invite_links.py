@@ -1,7 +1,9 @@
 # services/db_api/invite_links.py
 from __future__ import annotations
 import logging
-from typing import Dict
+from typing import Dict, List, Optional
+
+import httpx
 
 from .base import BaseApi
 
@@ -30,9 +32,7 @@ class InviteLinksMixin(BaseApi):
 
     async def get_all_invite_links(self, user_id: int) -> Dict:
         try:
-            r = await self.client.get(f"/invite_links/all/{user_id}")
-            r.raise_for_status()
-            return r.json()
+            return await self._get_json(f"/invite_links/all/{user_id}")
         except Exception as e:
             log.error(
                 "Инвайт-ссылки: ошибка получения всех ссылок — user_id=%s, ошибка=%s",
@@ -50,3 +50,33 @@ class InviteLinksMixin(BaseApi):
                 user_id, e, extra={"user_id": user_id}
             )
             raise
+
+    async def get_expired_invite_links(self, before: str, limit: int = 500, offset: int = 0) -> Optional[List[Dict]]:
+        """Ссылки с expires_at < before (старые первыми). None — у бэка нет такого маршрута (404/405)."""
+        params: Dict[str, Any] = {"before": before, "limit": limit}
+        if offset:
+            params["offset"] = int(offset)
+        try:
+            return await self._get_json("/invite_links/expired", params)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code in (404, 405):
+                return None
+            log.error("Инвайт-ссылки: ошибка выборки истёкших — ошибка=%s", e, extra={"user_id": "system"})
+            raise
+        except Exception as e:
+            log.error("Инвайт-ссылки: ошибка выборки истёкших — ошибка=%s", e, extra={"user_id": "system"})
+            raise
+
+    async def delete_invite_link(self, user_id: int, chat_id: int, invite_link: str) -> None:
+        """Удаляет строку (user_id, chat_id), только если в ней всё ещё invite_link; нет строки — не ошибка."""
+        try:
+            r = await self.client.delete(f"/invite_links/{user_id}/{chat_id}", params={"invite_link": invite_link})
+            if r.status_code == 404:
+                return
+            r.raise_for_status()
+        except Exception as e:
+            log.error(
+                "Инвайт-ссылки: ошибка удаления — user_id=%s, chat_id=%s, ошибка=%s",
+                user_id, chat_id, e, extra={"user_id": user_id}
+            )
+            raise
@@ -1,7 +1,9 @@
 # services/db_api/memberships.py
 from __future__ import annotations
 import logging
-from typing import Any, List
+from typing import Any, Dict, List, Optional
+
+import httpx
 
 from .base import BaseApi
 
@@ -26,6 +28,29 @@ class MembershipsMixin(BaseApi):
             )
             raise
 
+    async def bulk_add_memberships(self, items: List[Dict[str, Any]]) -> Optional[List[Any]]:
+        """
+        items: [{"user_id", "chat_id"}]; None — бэк без пакетного маршрута.
+        422 (FK) по элементу — как в add_membership: не ошибка, результат None.
+        """
+        try:
+            results = await self._put_bulk("/bulk/memberships", items)
+        except Exception as e:
+            log.error("Подписка: ошибка пакетного добавления — n=%s, ошибка=%s", len(items), e, extra={"user_id": "system"})
+            raise
+        if results is None:
+            return None
+        out: List[Any] = []
+        for item, res in zip(items, results):
+            if isinstance(res, httpx.HTTPStatusError) and res.response.status_code == 422:
+                log.info(
+                    "Подписка: 422 (FK) — user_id=%s, chat_id=%s — отложим без ошибок",
+                    item.get("user_id"), item.get("chat_id"), extra={"user_id": item.get("user_id")}
+                )
+                res = None
+            out.append(res)
+        return out
+
     async def remove_membership(self, user_id: int, chat_id: int) -> None:
         try:
             r = await self.client.delete("/memberships/", params={"user_id": user_id, "chat_id": chat_id})
@@ -39,9 +64,7 @@ class MembershipsMixin(BaseApi):
 
     async def get_memberships(self, user_id: int, chat_id: int) -> List[Any]:
         try:
-            r = await self.client.get("/memberships/", params={"user_id": user_id, "chat_id": chat_id})
-            r.raise_for_status()
-            return r.json()
+            return await self._get_json("/memberships/", params={"user_id": user_id, "chat_id": chat_id})
         except Exception as e:
             log.error(
                 "Подписка: ошибка получения — user_id=%s, chat_id=%s, ошибка=%s",
@@ -67,9 +90,7 @@ class MembershipsMixin(BaseApi):
                 if offset is not None:
                     params["offset"] = int(offset)
 
-                r = await self.client.get("/memberships/", params=params)
-                r.raise_for_status()
-                return r.json()
+                return await self._get_json("/memberships/", params=params)
             except Exception as e:
                 log.error(
                     "Подписка: ошибка списка по чату — chat_id=%s, limit=%s, offset=%s, ошибка=%s",
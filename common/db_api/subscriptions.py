@@ -1,6 +1,7 @@
 # services/db_api/subscriptions.py
 from __future__ import annotations
 import logging
+from typing import Any, Dict, List, Optional
 
 from .base import BaseApi
 
@@ -10,9 +11,7 @@ log = logging.getLogger(__name__)
 class SubscriptionsMixin(BaseApi):
     async def get_user_subscriptions(self, user_id: int) -> dict:
         try:
-            r = await self.client.get(f"/subscriptions/{user_id}")
-            r.raise_for_status()
-            return r.json()
+            return await self._get_json(f"/subscriptions/{user_id}")
         except Exception as e:
             log.error(
                 "Подписки: ошибка получения — user_id=%s, ошибка=%s",
@@ -44,6 +43,14 @@ class SubscriptionsMixin(BaseApi):
             )
             raise
 
+    async def bulk_put_user_subscriptions(self, items: List[Dict[str, Any]]) -> Optional[List[Any]]:
+        """items: [{"user_id", "news_enabled", "meetings_enabled", "important_enabled"}]; None — бэк без пакетного маршрута."""
+        try:
+            return await self._put_bulk("/bulk/subscriptions", items)
+        except Exception as e:
+            log.error("Подписки: ошибка пакетного сохранения — n=%s, ошибка=%s", len(items), e, extra={"user_id": "system"})
+            raise
+
     async def toggle_user_subscription(self, user_id: int, kind: str) -> dict:
         try:
             r = await self.client.post(f"/subscriptions/{user_id}/toggle", json={"kind": kind})
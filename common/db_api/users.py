@@ -1,7 +1,7 @@
 # services/db_api/users.py
 from __future__ import annotations
 import logging
-from typing import Dict
+from typing import Any, Dict, List, Optional
 
 from .base import BaseApi
 
@@ -24,11 +24,17 @@ class UsersMixin(BaseApi):
             )
             raise
 
+    async def bulk_upsert_users(self, items: List[Dict[str, Any]]) -> Optional[List[Any]]:
+        """items: [{"user_id", "username", "full_name"}]; None — бэк без пакетного маршрута."""
+        try:
+            return await self._put_bulk("/bulk/users/upsert", items)
+        except Exception as e:
+            log.error("Пользователи: ошибка пакетного сохранения — n=%s, ошибка=%s", len(items), e, extra={"user_id": "system"})
+            raise
+
     async def get_user(self, user_id: int) -> Dict:
         try:
-            r = await self.client.get(f"/users/{user_id}")
-            r.raise_for_status()
-            return r.json()
+            return await self._get_json(f"/users/{user_id}")
         except Exception as e:
             log.error(
                 "Пользователь: ошибка получения — user_id=%s, ошибка=%s",
@@ -48,6 +54,14 @@ class UsersMixin(BaseApi):
             )
             raise
 
+    async def bulk_update_users(self, items: List[Dict[str, Any]]) -> Optional[List[Any]]:
+        """items: [{"user_id", ...поля}]; None — бэк без пакетного маршрута."""
+        try:
+            return await self._put_bulk("/bulk/users/update", items)
+        except Exception as e:
+            log.error("Пользователи: ошибка пакетного обновления — n=%s, ошибка=%s", len(items), e, extra={"user_id": "system"})
+            raise
+
     async def delete_user(self, user_id: int) -> None:
         try:
             r = await self.client.delete(f"/users/{user_id}")
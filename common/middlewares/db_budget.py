@@ -0,0 +1,23 @@
+# common/middlewares/db_budget.py
+# Общий бюджет времени DB-API на один интерактивный апдейт: обработчик отвечает (или деградирует) за ограниченное время.
+
+from __future__ import annotations
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from common.db_api import db_deadline
+
+
+class DbBudgetMiddleware(BaseMiddleware):
+    """
+    Все вызовы DB-API внутри обработчика делят один бюджет (seconds).
+    Когда он исчерпан, вызовы сразу падают с DeadlineExceeded, и обработчик уходит в свою ветку except.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    async def __call__(self, handler, event: TelegramObject, data: dict):
+        with db_deadline(self.seconds):
+            return await handler(event, data)
@@ -6,6 +6,7 @@ from .common import (  # noqa: F401
     cleanup_join_requests,
     log_and_report,
     shutdown_utils,
+    warmup_bot_session,
     join_requests,  # добавлено
 )
 
@@ -21,6 +22,7 @@ __all__ = [
     "cleanup_join_requests",
     "log_and_report",
     "shutdown_utils",
+    "warmup_bot_session",
     "join_requests",
     "MSK",
     "now_msk_naive",
@@ -0,0 +1,183 @@
+# common/utils/blocked_cleanup.py
+# Единая фоновая очистка после «bot was blocked by the user»:
+# remove_membership(user_id, BOT_ID) + delete_user_subscriptions(user_id) — вне горячего пути.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import Counter, OrderedDict
+from typing import Dict, Optional
+
+import config
+from common.db_api import db_deadline
+from storage import remove_membership, delete_user_subscriptions
+
+log = logging.getLogger(__name__)
+
+
+class BlockedCleanupQueue:
+    """
+    Очередь user_id на очистку с дедупликацией и своим воркером.
+
+    - submit(user_id, tag) — не блокирует: id уже в очереди/в работе — повтор не ставится;
+    - воркер берёт до batch_size id и чистит их параллельно (не больше concurrency одновременно),
+      оба HTTP-вызова на пользователя идут одновременно;
+    - неудача — повтор в конце очереди, всего до max_attempts попыток;
+    - счётчики по tag (рассылка, интерактив): queued / deduped / done / failed.
+    """
+
+    def __init__(
+        self,
+        *,
+        batch_size: int = 50,
+        concurrency: int = 4,
+        max_attempts: int = 3,
+        max_queue: int = 100_000,
+    ) -> None:
+        self.batch_size = max(1, int(batch_size))
+        self.concurrency = max(1, int(concurrency))
+        self.max_attempts = max(1, int(max_attempts))
+        self.max_queue = max(1, int(max_queue))
+
+        # user_id → (tag, попытка)
+        self._queue: "OrderedDict[int, tuple[str, int]]" = OrderedDict()
+        self._inflight: Dict[int, str] = {}
+        self._stats: Dict[str, Counter] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- producer side ----------
+
+    def _ensure_worker(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._idle = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="blocked_cleanup")
+
+    def submit(self, user_id: int, tag: str = "interactive") -> bool:
+        """Ставит user_id в очередь. False — уже стоит/чистится (или очередь переполнена)."""
+        uid = int(user_id)
+        st = self._stats.setdefault(tag, Counter())
+        if uid in self._queue or uid in self._inflight:
+            st["deduped"] += 1
+            return False
+        if len(self._queue) >= self.max_queue:
+            st["dropped"] += 1
+            log.warning("Автоочистка: очередь переполнена, user_id=%s пропущен", uid, extra={"user_id": uid})
+            return False
+
+        self._ensure_worker()
+        self._queue[uid] = (tag, 1)
+        st["queued"] += 1
+        self._idle.clear()
+        self._wakeup.set()
+        return True
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue) + len(self._inflight)
+
+    def stats(self, tag: str) -> Dict[str, int]:
+        return dict(self._stats.get(tag) or {})
+
+    def pop_stats(self, tag: str) -> Dict[str, int]:
+        """Счётчики тега с удалением (теги рассылок не копятся в памяти)."""
+        return dict(self._stats.pop(tag, None) or {})
+
+    # ---------- worker ----------
+
+    async def _cleanup_one(self, uid: int) -> bool:
+        m_res, s_res = await asyncio.gather(
+            remove_membership(uid, config.BOT_ID),
+            delete_user_subscriptions(uid),
+            return_exceptions=True,
+        )
+        m_ok = not isinstance(m_res, BaseException)
+        s_ok = not isinstance(s_res, BaseException)
+        if not m_ok:
+            log.error("user_id=%s – Ошибка remove_membership(bot): %s", uid, m_res, extra={"user_id": uid})
+        if not s_ok:
+            log.error("user_id=%s – Ошибка delete_user_subscriptions: %s", uid, s_res, extra={"user_id": uid})
+        log.info(
+            "user_id=%s – Автоочистка после Forbidden: %s, %s",
+            uid,
+            "membership(bot)=OK" if m_ok else "membership(bot)=ERR",
+            "subscriptions=OK" if s_ok else "subscriptions=ERR",
+            extra={"user_id": uid},
+        )
+        return m_ok and s_ok
+
+    async def _process(self, uid: int, tag: str, attempt: int, sem: asyncio.Semaphore) -> None:
+        async with sem:
+            try:
+                ok = await self._cleanup_one(uid)
+            except Exception as e:
+                log.error("user_id=%s – Автоочистка: сбой %s", uid, e, extra={"user_id": uid})
+                ok = False
+        self._inflight.pop(uid, None)
+        st = self._stats.setdefault(tag, Counter())
+        if ok:
+            st["done"] += 1
+        elif attempt < self.max_attempts and uid not in self._queue:
+            self._queue[uid] = (tag, attempt + 1)
+            st["retried"] += 1
+        else:
+            st["failed"] += 1
+
+    async def _run(self) -> None:
+        # воркер может быть создан из обработчика — его бюджет DB-API на фоновую очередь не распространяется
+        with db_deadline(None):
+            await self._loop()
+
+    async def _loop(self) -> None:
+        sem = asyncio.Semaphore(self.concurrency)
+        while True:
+            if not self._queue:
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            batch = []
+            while self._queue and len(batch) < self.batch_size:
+                uid, (tag, attempt) = self._queue.popitem(last=False)
+                self._inflight[uid] = tag
+                batch.append((uid, tag, attempt))
+            await asyncio.gather(*(self._process(uid, tag, attempt, sem) for uid, tag, attempt in batch))
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Ждёт, пока очередь опустеет. False — не успели за timeout."""
+        if self._task is None or self._task.done() or self._idle is None:
+            return self.pending == 0
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def close(self, timeout: float = 10.0) -> None:
+        if not await self.drain(timeout):
+            log.warning("Автоочистка: при остановке не обработано %s user_id", self.pending, extra={"user_id": "system"})
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+_queue: Optional[BlockedCleanupQueue] = None
+
+
+def get_blocked_cleanup() -> BlockedCleanupQueue:
+    """Общая очередь очистки процесса (создаётся лениво)."""
+    global _queue
+    if _queue is None:
+        _queue = BlockedCleanupQueue(
+            batch_size=getattr(config, "BLOCKED_CLEANUP_BATCH", 50),
+            concurrency=getattr(config, "BLOCKED_CLEANUP_CONCURRENCY", 4),
+        )
+    return _queue
+
+
+__all__ = ["BlockedCleanupQueue", "get_blocked_cleanup"]
@@ -4,12 +4,19 @@ import time
 from typing import Dict
 from datetime import datetime
 from tenacity import retry, stop_after_delay, wait_fixed, retry_if_exception_type, RetryCallState
-from httpx import AsyncClient, RequestError
 from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.enums import ParseMode
 from aiogram.exceptions import TelegramNetworkError
 from aiogram import Bot
+import config
 from config import ERROR_LOG_CHANNEL_ID, BOT_TOKEN
 
+# Совместимость aiogram 3.7+
+try:
+    from aiogram.client.default import DefaultBotProperties  # aiogram 3.7+
+except Exception:
+    DefaultBotProperties = None
+
 # utils/common.py
 # Утилиты: глобальный Bot, репорты ошибок, и заявки на вступление (join_requests).
 logger = logging.getLogger(__name__)
@@ -24,15 +31,8 @@ def _log_before_sleep(retry_state: RetryCallState) -> None:
     )
 
 
-# ——— Ретраи для httpx и Aiogram ———
-AsyncClient.request = retry(
-    reraise=True,
-    stop=stop_after_delay(600),
-    wait=wait_fixed(10),
-    retry=retry_if_exception_type(RequestError),
-    before_sleep=_log_before_sleep
-)(AsyncClient.request)
-
+# ——— Ретраи для Aiogram ———
+# (DB-API: повторы, бюджет времени и автомат — в транспорте common/db_api/base.py)
 AiohttpSession.__call__ = retry(
     reraise=True,
     stop=stop_after_delay(600),
@@ -43,6 +43,7 @@ AiohttpSession.__call__ = retry(
 
 
 # ——— Глобальный Bot ———
+# Один Bot (и одна aiohttp-сессия с пулом соединений) на процесс: и Dispatcher, и рассылки, и get_bot().
 _bot: Bot | None = None
 
 async def cleanup_join_requests() -> None:
@@ -61,18 +62,51 @@ async def cleanup_join_requests() -> None:
 def dt_to_iso(dt: datetime | None) -> str | None:
     return None if dt is None else dt.replace(microsecond=0).isoformat()
 
+def _make_session() -> AiohttpSession:
+    session = AiohttpSession()
+    # параметры TCPConnector: aiogram 3.x передаёт _connector_init в коннектор при создании ClientSession
+    session._connector_init.update(
+        limit=getattr(config, "TG_POOL_SIZE", 100),
+        keepalive_timeout=getattr(config, "TG_KEEPALIVE", 30.0),
+        ttl_dns_cache=getattr(config, "TG_DNS_TTL", 300),
+    )
+    return session
+
 def get_bot() -> Bot:
+    """Общий Bot процесса (parse_mode=HTML по умолчанию, настроенный пул соединений)."""
     global _bot
     if _bot is None:
-        _bot = Bot(token=BOT_TOKEN)
+        if DefaultBotProperties is not None:
+            _bot = Bot(token=BOT_TOKEN, session=_make_session(), default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+        else:
+            _bot = Bot(token=BOT_TOKEN, session=_make_session(), parse_mode=ParseMode.HTML)
     return _bot
 
+async def warmup_bot_session(connections: int, timeout: float = 10.0, *, bot: Bot | None = None) -> int:
+    """
+    Открывает заранее до connections keep-alive соединений к Bot API (параллельные getMe) —
+    перед большой рассылкой, чтобы первые секунды не уходили на TCP/TLS-рукопожатия.
+    Возвращает, сколько запросов прошло; ошибки не пробрасываются.
+    """
+    bot = bot or get_bot()
+    n = max(1, min(int(connections), getattr(config, "TG_POOL_SIZE", 100)))
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(*(bot.get_me() for _ in range(n)), return_exceptions=True),
+            timeout=timeout,
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Прогрев соединений Bot API: не уложились в %s с", timeout, extra={"user_id": "system"})
+        return 0
+    return sum(not isinstance(r, BaseException) for r in results)
+
 async def log_and_report(error: Exception, context: str) -> None:
     logging.error("Ошибка в %s: %s", context, error, extra={"user_id": "system"})
     try:
         bot = get_bot()
         text = f"Ошибка в {context}: {error}"
-        await bot.send_message(ERROR_LOG_CHANNEL_ID, text)
+        # текст ошибки — не HTML (может содержать «<», «>»)
+        await bot.send_message(ERROR_LOG_CHANNEL_ID, text, parse_mode=None)
     except Exception as e:
         logging.error("Не удалось отправить сообщение об ошибке: %s", e, extra={"user_id": "system"})
 
@@ -0,0 +1,138 @@
+# common/utils/idset.py
+# Компактное множество целых ID (user_id/chat_id) на array('q') — вместо set[int] для больших аудиторий.
+
+from __future__ import annotations
+
+from array import array
+from typing import Iterable, Iterator
+
+_EMPTY = 0
+_TOMB = -(1 << 63)  # удалённый слот (discard); пробирование через него продолжается
+_MASK64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15  # фибоначчиево хеширование: хорошо разбрасывает подряд идущие id
+
+
+class IdSet:
+    """
+    Множество ненулевых int64 с открытой адресацией (линейное пробирование).
+
+    ~8 байт на слот при заполнении до 60% (≈13 байт на id) против ~60+ байт на элемент
+    у set[int] (объект int + слот хеш-таблицы). Служебные значения (0 и INT64_MIN) хранить нельзя.
+    discard() оставляет «надгробие»; они вычищаются при следующей перестройке таблицы.
+    """
+
+    __slots__ = ("_slots", "_mask", "_shift", "_len", "_used")
+
+    def __init__(self, items: Iterable[int] = (), capacity: int = 1024) -> None:
+        cap = 8
+        while cap < capacity:
+            cap <<= 1
+        self._alloc(cap)
+        for x in items:
+            self.add(x)
+
+    def _alloc(self, cap: int) -> None:
+        self._slots = array("q", bytes(8 * cap))
+        self._mask = cap - 1
+        self._shift = 64 - (cap.bit_length() - 1)
+        self._len = 0
+        self._used = 0  # занятые слоты вместе с надгробиями
+
+    def _index(self, x: int) -> int:
+        return ((x * _GOLDEN) & _MASK64) >> self._shift
+
+    def _rehash(self) -> None:
+        old = self._slots
+        # много надгробий — перестраиваем в том же размере, иначе растём вдвое
+        cap = len(old) * 2 if self._len * 5 > len(old) * 2 else len(old)
+        self._alloc(cap)
+        for x in old:
+            if x != _EMPTY and x != _TOMB:
+                self.add(x)
+
+    def add(self, x: int) -> bool:
+        """Добавляет x. True — элемента не было (удобно для дедупликации потока)."""
+        x = int(x)
+        if x == _EMPTY or x == _TOMB:
+            raise ValueError(f"IdSet не хранит служебное значение {x}")
+        slots, mask = self._slots, self._mask
+        i = self._index(x)
+        free = -1
+        while True:
+            v = slots[i]
+            if v == _EMPTY:
+                break
+            if v == x:
+                return False
+            if v == _TOMB and free < 0:
+                free = i
+            i = (i + 1) & mask
+        if free >= 0:
+            slots[free] = x
+        else:
+            slots[i] = x
+            self._used += 1
+        self._len += 1
+        if self._used * 5 > len(slots) * 3:
+            self._rehash()
+        return True
+
+    def discard(self, x: object) -> bool:
+        """Удаляет x. True — элемент был."""
+        if not isinstance(x, int) or x == _EMPTY or x == _TOMB:
+            return False
+        slots, mask = self._slots, self._mask
+        i = self._index(x)
+        while True:
+            v = slots[i]
+            if v == _EMPTY:
+                return False
+            if v == x:
+                slots[i] = _TOMB
+                self._len -= 1
+                return True
+            i = (i + 1) & mask
+
+    def __contains__(self, x: object) -> bool:
+        if not isinstance(x, int) or x == _EMPTY or x == _TOMB:
+            return False
+        slots, mask = self._slots, self._mask
+        i = self._index(x)
+        while True:
+            v = slots[i]
+            if v == _EMPTY:
+                return False
+            if v == x:
+                return True
+            i = (i + 1) & mask
+
+    def update(self, items: Iterable[int]) -> None:
+        for x in items:
+            self.add(x)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[int]:
+        return (x for x in self._slots if x != _EMPTY and x != _TOMB)
+
+    def __ior__(self, other: Iterable[int]) -> "IdSet":
+        self.update(other)
+        return self
+
+    @property
+    def nbytes(self) -> int:
+        return self._slots.itemsize * len(self._slots)
+
+    def to_array(self) -> array:
+        """Плотный массив элементов (для сохранения на диск)."""
+        return array("q", iter(self))
+
+    @classmethod
+    def from_array(cls, arr: array) -> "IdSet":
+        out = cls(capacity=int(len(arr) * 5 / 3) + 8)
+        out.update(arr)
+        return out
+
+
+__all__ = ["IdSet"]
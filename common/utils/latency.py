@@ -0,0 +1,41 @@
+# common/utils/latency.py
+# Скользящее окно задержек (последние N замеров) с перцентилями — для /stats и логов.
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+_windows: Dict[str, "LatencyWindow"] = {}
+
+
+class LatencyWindow:
+    def __init__(self, name: str, size: int = 1000) -> None:
+        self.name = name
+        self._values: Deque[float] = deque(maxlen=max(1, int(size)))
+        self.count = 0
+        _windows[name] = self
+
+    def add(self, ms: float) -> None:
+        self._values.append(float(ms))
+        self.count += 1
+
+    def stats(self) -> Dict[str, Any]:
+        values = sorted(self._values)
+        if not values:
+            return {"count": self.count}
+
+        def pct(p: float) -> float:
+            return round(values[min(len(values) - 1, int(p * len(values)))], 1)
+
+        return {"count": self.count, "p50_ms": pct(0.5), "p95_ms": pct(0.95), "p99_ms": pct(0.99), "max_ms": round(values[-1], 1)}
+
+
+def latency_stats(name: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Перцентили всех окон процесса (или одного по имени)."""
+    if name is not None:
+        return {name: _windows[name].stats()} if name in _windows else {}
+    return {n: w.stats() for n, w in _windows.items()}
+
+
+__all__ = ["LatencyWindow", "latency_stats"]
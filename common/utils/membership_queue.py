@@ -0,0 +1,285 @@
+# common/utils/membership_queue.py
+# Write-behind для chat_member в отслеживаемых чатах: всплески вступлений/выходов (рейды, массовые входы)
+# не бьют в DB-API поштучно — по ключу (user_id, chat_id) хранится только последний статус,
+# запись идёт пакетами, а ещё не записанное лежит в локальном спуле и переживает падение процесса.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from common.db_api import db_deadline
+from common.utils.spool import JsonlSpool
+from storage import queue_add_user, queue_add_membership, queue_remove_membership
+
+log = logging.getLogger(__name__)
+
+Key = Tuple[int, int]
+
+
+class MembershipWriteBehind:
+    """
+    Очередь изменений membership со своим воркером.
+
+    - submit(user_id, chat_id, joined, ...) — не блокирует: событие пишется в спул и заменяет
+      предыдущий ещё не записанный статус того же (user_id, chat_id);
+    - воркер ждёт interval секунд (или batch_size ключей), затем пишет пакет через пакетную запись storage:
+      апсёрт user — один на пользователя в пакете, затем add/remove membership; следующий пакет — после ответа
+      на предыдущий, так что поток событий не занимает DB-API больше, чем одним пакетом за раз;
+    - неудача — ключ снова в очереди (если за это время не пришёл статус новее), до max_attempts попыток;
+    - спул подтверждается водяной меткой (всё старше самого раннего незаписанного события),
+      после рестарта незаписанное проигрывается заново; полностью подтверждённый спул
+      пересоздаётся каждые rotate_every событий, чтобы файл не рос.
+    """
+
+    def __init__(
+        self,
+        spool_path: Optional[str],
+        *,
+        batch_size: int = 500,
+        interval: float = 1.0,
+        max_attempts: int = 5,
+        rotate_every: int = 10_000,
+    ) -> None:
+        self.spool_path = spool_path
+        self.batch_size = max(1, int(batch_size))
+        self.interval = max(0.0, float(interval))
+        self.max_attempts = max(1, int(max_attempts))
+        self.rotate_every = max(1, int(rotate_every))
+
+        # ключ → (seq в спуле, событие); порядок = порядок seq (обновление ключа переносит его в конец)
+        self._latest: "OrderedDict[Key, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        self._inflight = 0
+        self._stats: Counter = Counter()
+        self._spool: Optional[JsonlSpool] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._open_spool(replay=True)
+
+    # ---------- спул ----------
+
+    def _open_spool(self, *, replay: bool) -> None:
+        if not self.spool_path:
+            return
+        try:
+            self._spool = JsonlSpool(self.spool_path)
+        except Exception as e:
+            log.warning("Membership: спул недоступен (%s), очередь только в памяти", e, extra={"user_id": "system"})
+            self._spool = None
+            return
+        if replay:
+            pending = self._spool.pending()
+            for seq, item in pending:
+                self._put(seq, item)
+            if pending:
+                self._stats["replayed"] += len(pending)
+                log.info(
+                    "Membership: из спула восстановлено %s событий (%s ключей) — допишем в БД",
+                    len(pending), len(self._latest), extra={"user_id": "system"},
+                )
+
+    def _append(self, item: Dict[str, Any]) -> int:
+        if self._spool is not None:
+            try:
+                return self._spool.append(item)
+            except Exception as e:
+                log.warning("Membership: запись в спул не удалась: %s", e, extra={"user_id": "system"})
+        return 0  # событие только в памяти
+
+    def _ack(self) -> None:
+        if self._spool is None:
+            return
+        # очередь упорядочена по seq; 0 — событие не попало в спул и метку не держит
+        first_seq = next((seq for seq, _ in self._latest.values() if seq), 0)
+        mark = first_seq - 1 if first_seq else self._spool.last_seq
+        self._spool.ack(mark)
+        if not self._latest and not self._spool.has_unacked and self._spool.last_seq >= self.rotate_every:
+            self._spool.close()
+            self._open_spool(replay=False)
+
+    # ---------- producer side ----------
+
+    def _put(self, seq: int, item: Dict[str, Any]) -> None:
+        key = (int(item["user_id"]), int(item["chat_id"]))
+        if key in self._latest:
+            self._stats["coalesced"] += 1
+            del self._latest[key]
+        self._latest[key] = (seq, item)
+
+    def _ensure_worker(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._full = asyncio.Event()
+            self._idle = asyncio.Event()
+            # может стартовать из обработчика — его бюджет DB-API на фоновую запись не распространяется
+            with db_deadline(None):
+                self._task = asyncio.create_task(self._run(), name="membership_write_behind")
+            if self._latest:
+                self._wakeup.set()
+
+    def start(self) -> None:
+        """Запуск воркера (на старте бота — чтобы дописать события, оставшиеся в спуле после падения)."""
+        self._ensure_worker()
+
+    def submit(
+        self,
+        user_id: int,
+        chat_id: int,
+        joined: bool,
+        username: Optional[str] = None,
+        full_name: Optional[str] = None,
+    ) -> None:
+        item = {
+            "user_id": int(user_id),
+            "chat_id": int(chat_id),
+            "joined": bool(joined),
+            "username": username,
+            "full_name": full_name,
+            "attempt": 1,
+        }
+        self._ensure_worker()
+        self._put(self._append(item), item)
+        self._stats["submitted"] += 1
+        self._idle.clear()
+        self._wakeup.set()
+        if len(self._latest) >= self.batch_size:
+            self._full.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._latest) + self._inflight
+
+    def stats(self) -> Dict[str, int]:
+        st = dict(self._stats)
+        st["pending"] = self.pending
+        return st
+
+    # ---------- worker ----------
+
+    async def _run(self) -> None:
+        while True:
+            if not self._latest:
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            if len(self._latest) < self.batch_size and self.interval > 0:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch: List[Tuple[Key, int, Dict[str, Any]]] = []
+            while self._latest and len(batch) < self.batch_size:
+                key, (seq, item) = self._latest.popitem(last=False)
+                batch.append((key, seq, item))
+            self._inflight = len(batch)
+            if self._spool is not None:
+                self._spool.sync()
+            try:
+                await self._flush(batch)
+            except Exception as e:  # не должно случаться: ошибки записей разбираются поштучно
+                log.exception("Membership: сбой пакета — %s", e, extra={"user_id": "system"})
+                for key, _, item in batch:
+                    self._retry(key, item)
+            finally:
+                self._inflight = 0
+            self._ack()
+
+    async def _flush(self, batch: List[Tuple[Key, int, Dict[str, Any]]]) -> None:
+        self._stats["flushes"] += 1
+        # один апсёрт пользователя на пакет (имя — из самого свежего события), затем membership
+        users: Dict[int, Dict[str, Any]] = {}
+        for (uid, _), _, item in batch:
+            users[uid] = item
+        user_writes = [
+            queue_add_user(uid, item.get("username") or None, item.get("full_name") or None)
+            for uid, item in users.items()
+        ]
+        member_writes = [
+            queue_add_membership(uid, cid) if item["joined"] else queue_remove_membership(uid, cid)
+            for (uid, cid), _, item in batch
+        ]
+        user_results = await asyncio.gather(*user_writes, return_exceptions=True)
+        member_results = await asyncio.gather(*member_writes, return_exceptions=True)
+
+        for uid, res in zip(users, user_results):
+            if isinstance(res, BaseException):
+                log.error("user_id=%s – Ошибка add_user: %s", uid, res, extra={"user_id": uid})
+        for ((uid, cid), _, item), res in zip(batch, member_results):
+            if isinstance(res, BaseException):
+                log.error(
+                    "user_id=%s – Ошибка %s membership chat=%s: %s",
+                    uid, "add" if item["joined"] else "remove", cid, res, extra={"user_id": uid},
+                )
+                self._retry((uid, cid), item)
+            else:
+                self._stats["written"] += 1
+        log.info(
+            "Membership: записан пакет — событий=%s, пользователей=%s, в очереди=%s",
+            len(batch), len(users), len(self._latest), extra={"user_id": "system"},
+        )
+
+    def _retry(self, key: Key, item: Dict[str, Any]) -> None:
+        if key in self._latest:
+            return  # пришёл статус новее — он и будет записан
+        if item.get("attempt", 1) >= self.max_attempts:
+            self._stats["failed"] += 1
+            log.error(
+                "user_id=%s – membership chat=%s не записан за %s попыток, событие отброшено",
+                key[0], key[1], self.max_attempts, extra={"user_id": key[0]},
+            )
+            return
+        item = {**item, "attempt": item.get("attempt", 1) + 1}
+        self._stats["retried"] += 1
+        self._put(self._append(item), item)
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Ждёт, пока очередь опустеет. False — не успели за timeout."""
+        if self._task is None or self._task.done() or self._idle is None:
+            return self.pending == 0
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def close(self, timeout: float = 10.0) -> None:
+        if not await self.drain(timeout):
+            log.warning(
+                "Membership: при остановке не записано %s событий — останутся в спуле до следующего запуска",
+                self.pending, extra={"user_id": "system"},
+            )
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+
+
+_queue: Optional[MembershipWriteBehind] = None
+
+
+def get_membership_queue() -> MembershipWriteBehind:
+    """Общая очередь процесса (создаётся лениво, при создании проигрывает спул)."""
+    global _queue
+    if _queue is None:
+        _queue = MembershipWriteBehind(
+            os.path.join(config.STATE_DIR, "membership_events.jsonl"),
+            batch_size=getattr(config, "MEMBERSHIP_FLUSH_BATCH", 500),
+            interval=getattr(config, "MEMBERSHIP_FLUSH_INTERVAL", 1.0),
+        )
+    return _queue
+
+
+__all__ = ["MembershipWriteBehind", "get_membership_queue"]
@@ -0,0 +1,141 @@
+# common/utils/ratelimit.py
+# Общий ограничитель скорости (token bucket) для исходящих вызовов Telegram/HTTP.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket на «виртуальном расписании» (GCRA):
+    каждый acquire() бронирует ближайший свободный слот и спит до него.
+
+    - rate  — токенов в секунду (средняя скорость, выдерживается точно, без дрейфа
+              от латентности самих отправок);
+    - burst — сколько токенов можно выдать «разом» после простоя (1 — строго равномерно).
+
+    Порядок выдачи — FIFO по времени вызова acquire(); безопасно для множества
+    конкурентных корутин одного event loop (между чтением и записью состояния нет await).
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0) -> None:
+        if rate <= 0:
+            raise ValueError(f"rate должен быть > 0, получено: {rate}")
+        self._rate = float(rate)
+        self._burst = max(1.0, float(burst))
+        self._next_free = time.monotonic()
+        self._paused_until = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def set_rate(self, rate: float) -> None:
+        """Меняет скорость для всех следующих броней (уже выданные слоты не трогаем)."""
+        if rate > 0:
+            self._rate = float(rate)
+
+    def pause(self, seconds: float) -> None:
+        """Глобальная пауза: ни один acquire() не завершится раньше, чем через seconds."""
+        until = time.monotonic() + max(0.0, float(seconds))
+        self._paused_until = max(self._paused_until, until)
+        self._next_free = max(self._next_free, self._paused_until)
+
+    @property
+    def paused_for(self) -> float:
+        return max(0.0, self._paused_until - time.monotonic())
+
+    def _reserve(self, tokens: float) -> float:
+        """Бронирует слот под tokens и возвращает, сколько секунд до него ждать."""
+        now = time.monotonic()
+        # после простоя позволяем «накопить» не больше burst токенов
+        earliest = now - (self._burst - 1.0) / self._rate
+        start = max(self._next_free, earliest)
+        self._next_free = start + tokens / self._rate
+        return max(0.0, start - now)
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        while True:
+            delay = self._reserve(tokens)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # пока спали, могли объявить паузу — тогда бронируем слот заново (уже после паузы)
+            if time.monotonic() >= self._paused_until:
+                return
+
+
+class AimdRateController:
+    """
+    Адаптивная скорость (AIMD) поверх TokenBucket:
+    - on_success(): после increase_every успехов подряд скорость растёт на increase_step (до max_rate);
+    - on_throttled(retry_after): глобальная пауза на retry_after для всех отправителей
+      и мультипликативное снижение скорости (до min_rate).
+
+    Несколько 429 от одной «волны» запросов снижают скорость один раз: пока идёт пауза
+    после снижения, следующие 429 только продлевают паузу.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        *,
+        min_rate: float = 1.0,
+        max_rate: float | None = None,
+        increase_step: float = 1.0,
+        increase_every: int = 100,
+        decrease_factor: float = 0.5,
+        burst: float = 1.0,
+    ) -> None:
+        self.min_rate = max(0.1, float(min_rate))
+        self.max_rate = max(self.min_rate, float(max_rate if max_rate is not None else rate))
+        start = min(max(float(rate), self.min_rate), self.max_rate)
+        self.bucket = TokenBucket(start, burst=burst)
+        self.increase_step = float(increase_step)
+        self.increase_every = max(1, int(increase_every))
+        self.decrease_factor = min(0.99, max(0.05, float(decrease_factor)))
+        self.throttled = 0
+        self._streak = 0
+        self._cut_until = 0.0
+
+    @property
+    def effective_rate(self) -> float:
+        """Текущая разрешённая скорость, msg/с (0 — пока действует пауза RetryAfter)."""
+        return 0.0 if self.bucket.paused_for > 0 else self.bucket.rate
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        await self.bucket.acquire(tokens)
+
+    def on_success(self) -> None:
+        self._streak += 1
+        if self._streak < self.increase_every:
+            return
+        self._streak = 0
+        rate = self.bucket.rate
+        if rate < self.max_rate:
+            self.bucket.set_rate(min(self.max_rate, rate + self.increase_step))
+
+    def on_throttled(self, retry_after: float) -> None:
+        self.throttled += 1
+        self._streak = 0
+        wait_s = max(1.0, float(retry_after or 1))
+        self.bucket.pause(wait_s)
+
+        now = time.monotonic()
+        if now < self._cut_until:
+            return
+        old = self.bucket.rate
+        new = max(self.min_rate, old * self.decrease_factor)
+        self.bucket.set_rate(new)
+        self._cut_until = now + wait_s
+        log.warning(
+            "RetryAfter: пауза %.1f с для всех отправителей, скорость %.1f → %.1f msg/с",
+            wait_s, old, new, extra={"user_id": "system"},
+        )
+
+
+__all__ = ["TokenBucket", "AimdRateController"]
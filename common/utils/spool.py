@@ -0,0 +1,121 @@
+# common/utils/spool.py
+# Локальный журнал (JSONL) для «ещё не подтверждённой» работы: переживает падение процесса.
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, List, Tuple
+
+log = logging.getLogger(__name__)
+
+
+class JsonlSpool:
+    """
+    Append-only журнал с водяной меткой подтверждения.
+
+    Формат строк:
+      {"seq": N, "item": {...}}  — запись
+      {"ack": N}                 — все записи с seq <= N обработаны (например, ушли в БД)
+
+    - append(item) → seq: пишет строку и сбрасывает буфер процесса (переживает падение процесса);
+    - sync(): fsync — вызывать на границе батча (переживает падение машины);
+    - ack(seq): фиксирует водяную метку;
+    - pending(): неподтверждённые записи, найденные в файле при открытии (после падения);
+    - close(): закрывает файл и удаляет его, если всё подтверждено.
+
+    Запись синхронная, но короткая (одна строка) — приемлемо для event loop.
+    """
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._seq = 0
+        self._acked = 0
+        self._pending: List[Tuple[int, Any]] = []
+        needs_newline = self._load()
+        self._fh = open(self.path, "a", encoding="utf-8")
+        if needs_newline:
+            # хвост оборван падением посреди записи — не склеиваем новую строку с мусором
+            self._fh.write("\n")
+            self._fh.flush()
+
+    def _load(self) -> bool:
+        if not self.path.exists():
+            return False
+        items: List[Tuple[int, Any]] = []
+        raw = self.path.read_bytes()
+        for line in raw.decode("utf-8", errors="replace").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                log.warning("Спул %s: пропущена повреждённая строка", self.path.name, extra={"user_id": "system"})
+                continue
+            if "ack" in rec:
+                self._acked = max(self._acked, int(rec["ack"]))
+            elif "seq" in rec:
+                seq = int(rec["seq"])
+                items.append((seq, rec.get("item")))
+                self._seq = max(self._seq, seq)
+        self._seq = max(self._seq, self._acked)
+        self._pending = [(s, it) for s, it in items if s > self._acked]
+        return bool(raw) and not raw.endswith(b"\n")
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    @property
+    def acked(self) -> int:
+        return self._acked
+
+    @property
+    def has_unacked(self) -> bool:
+        return self._acked < self._seq
+
+    def pending(self) -> List[Tuple[int, Any]]:
+        return list(self._pending)
+
+    def append(self, item: Any) -> int:
+        self._seq += 1
+        self._fh.write(json.dumps({"seq": self._seq, "item": item}, ensure_ascii=False, default=str) + "\n")
+        self._fh.flush()
+        return self._seq
+
+    def sync(self) -> None:
+        try:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+        except OSError as e:
+            log.warning("Спул %s: fsync не удался: %s", self.path.name, e, extra={"user_id": "system"})
+
+    def ack(self, seq: int) -> None:
+        seq = min(int(seq), self._seq)
+        if seq <= self._acked:
+            return
+        self._acked = seq
+        self._fh.write(json.dumps({"ack": seq}) + "\n")
+        self.sync()
+        if self._pending:
+            self._pending = [(s, it) for s, it in self._pending if s > seq]
+
+    def close(self) -> None:
+        try:
+            self._fh.close()
+        except Exception:
+            pass
+        if not self.has_unacked:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning("Спул %s: не удалось удалить файл: %s", self.path.name, e, extra={"user_id": "system"})
+
+
+__all__ = ["JsonlSpool"]
@@ -0,0 +1,77 @@
+# common/utils/task_graph.py
+# Маленький граф шагов обработчика: независимые шаги идут параллельно, зависимые ждут свои входы.
+# Плюс время каждого шага и отметки (например, «первый байт пользователю») для логов.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+# графы, у которых ещё идут фоновые шаги после выхода из обработчика (asyncio держит задачи слабо)
+_running: Set["TaskGraph"] = set()
+
+
+class TaskGraph:
+    """
+    - add(name, fn, after=(...)) — шаг стартует сразу, как завершатся шаги из after
+      (их ошибки шаг не отменяют: after — только порядок; данные шаг берёт через get());
+    - get(name) — результат шага (или его исключение);
+    - mark(label) — отметка времени от создания графа, мс;
+    - шаги, не дождавшиеся обработчиком, доделываются в фоне, их ошибки логируются.
+    """
+
+    def __init__(self, name: str, *, user_id: Any = "system") -> None:
+        self.name = name
+        self.user_id = user_id
+        self.t0 = time.monotonic()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._spans: Dict[str, Tuple[float, float]] = {}
+        self.marks: Dict[str, float] = {}
+
+    def _ms(self) -> float:
+        return (time.monotonic() - self.t0) * 1000
+
+    def add(self, name: str, fn: Callable[[], Awaitable[Any]], *, after: Iterable[str] = ()) -> asyncio.Task:
+        if name in self._tasks:
+            raise ValueError(f"TaskGraph {self.name}: шаг {name!r} уже есть")
+        deps = [self._tasks[d] for d in after]
+        task = asyncio.create_task(self._run(name, fn, deps), name=f"{self.name}:{name}")
+        self._tasks[name] = task
+        _running.add(self)
+        task.add_done_callback(lambda t, n=name: self._finished(n, t))
+        return task
+
+    async def _run(self, name: str, fn: Callable[[], Awaitable[Any]], deps: list) -> Any:
+        if deps:
+            await asyncio.gather(*deps, return_exceptions=True)
+        started = self._ms()
+        try:
+            return await fn()
+        finally:
+            self._spans[name] = (started, self._ms())
+
+    def _finished(self, name: str, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            log.debug("%s: шаг %s завершился ошибкой: %s", self.name, name, task.exception(), extra={"user_id": self.user_id})
+        if all(t.done() for t in self._tasks.values()):
+            _running.discard(self)
+
+    async def get(self, name: str) -> Any:
+        return await asyncio.shield(self._tasks[name])
+
+    def mark(self, label: str) -> float:
+        ms = self._ms()
+        self.marks.setdefault(label, ms)
+        return self.marks[label]
+
+    def summary(self) -> str:
+        """«шаг=начало→конец мс» по завершённым шагам, в порядке старта."""
+        spans = sorted(self._spans.items(), key=lambda kv: kv[1][0])
+        return ", ".join(f"{n}={a:.0f}→{b:.0f}" for n, (a, b) in spans)
+
+
+__all__ = ["TaskGraph"]
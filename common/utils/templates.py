@@ -0,0 +1,124 @@
+# common/utils/templates.py
+# HTML-шаблоны (text/*.html) в памяти: читаются с диска один раз, перечитываются при смене mtime,
+# сохранение из админки — в потоке, атомарной заменой файла.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+_MISSING = -1  # mtime «файла нет»: отдаём default, пока файл не появится
+
+
+class TemplateRegistry:
+    """
+    - get(path, default) — текст из памяти; mtime файла проверяется не чаще раза в check_interval секунд
+      (правка файла руками подхватывается без рестарта), файла нет — default;
+    - preload() — прочитать все *.html каталога заранее (на старте), чтобы первый /start не ходил на диск;
+    - save(path, text) — запись через временный файл и os.replace в потоке executor'а,
+      новый текст сразу становится кешем;
+    - invalidate(path=None) — сбросить один шаблон или все.
+    """
+
+    def __init__(self, root: Path, *, check_interval: float = 2.0) -> None:
+        self.root = Path(root)
+        self.check_interval = max(0.0, float(check_interval))
+        # путь → (mtime_ns или _MISSING, текст или None, когда проверяли mtime)
+        self._entries: Dict[Path, Tuple[int, Optional[str], float]] = {}
+        self.loads = 0
+        self.hits = 0
+
+    def _path(self, path: Path | str) -> Path:
+        p = Path(path)
+        return p if p.is_absolute() else self.root / p
+
+    @staticmethod
+    def _mtime(path: Path) -> int:
+        try:
+            return path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return _MISSING
+
+    def _load(self, path: Path, mtime: int) -> Optional[str]:
+        text: Optional[str] = None
+        if mtime != _MISSING:
+            try:
+                text = path.read_text(encoding="utf-8")
+            except FileNotFoundError:
+                mtime = _MISSING
+        self.loads += 1
+        self._entries[path] = (mtime, text, time.monotonic())
+        return text
+
+    def get(self, path: Path | str, default: str = "") -> str:
+        p = self._path(path)
+        entry = self._entries.get(p)
+        now = time.monotonic()
+        if entry is None:
+            text = self._load(p, self._mtime(p))
+        else:
+            mtime, text, checked = entry
+            if now - checked >= self.check_interval:
+                current = self._mtime(p)
+                if current != mtime:
+                    text = self._load(p, current)
+                else:
+                    self._entries[p] = (mtime, text, now)
+                    self.hits += 1
+            else:
+                self.hits += 1
+        return default if text is None else text
+
+    def preload(self, pattern: str = "*.html") -> int:
+        count = 0
+        for p in sorted(self.root.glob(pattern)):
+            self._load(p, self._mtime(p))
+            count += 1
+        return count
+
+    def invalidate(self, path: Path | str | None = None) -> None:
+        if path is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(self._path(path), None)
+
+    @staticmethod
+    def _write_atomic(path: Path, text: str) -> int:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                # mkstemp создаёт 0600 — оставляем права прежнего файла (или обычные 0644)
+                try:
+                    os.chmod(tmp, path.stat().st_mode & 0o777)
+                except FileNotFoundError:
+                    os.chmod(tmp, 0o644)
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        return path.stat().st_mtime_ns
+
+    async def save(self, path: Path | str, text: str) -> None:
+        p = self._path(path)
+        mtime = await asyncio.to_thread(self._write_atomic, p, text)
+        self._entries[p] = (mtime, text, time.monotonic())
+
+    def stats(self) -> Dict[str, int]:
+        return {"templates": len(self._entries), "loads": self.loads, "hits": self.hits}
+
+
+__all__ = ["TemplateRegistry"]
@@ -9,34 +9,20 @@ from typing import Any, Optional
 from aiogram.types import Message, CallbackQuery
 from aiogram.exceptions import TelegramForbiddenError
 
-import config
-from storage import remove_membership, delete_user_subscriptions
+from common.utils.blocked_cleanup import get_blocked_cleanup
+from common.utils.unreachable import mark_unreachable
 
 log = logging.getLogger(__name__)
 
 
-async def _cleanup_blocked(user_id: int) -> None:
+async def _cleanup_blocked(user_id: int, tag: str = "interactive") -> None:
     """
     Очистка после блокировки: remove_membership(user_id, BOT_ID) + delete_user_subscriptions(user_id).
-    Лог — одно INFO-сообщение.
+    Не ждёт HTTP — ставит user_id в общую очередь автоочистки (дедуп, батчи, ограниченный параллелизм).
+    Заодно помечает пользователя недоступным — рассылки его пропустят до разблокировки.
     """
-    m_ok = True
-    s_ok = True
-    try:
-        await remove_membership(user_id, config.BOT_ID)
-    except Exception as exc:
-        m_ok = False
-        log.error("user_id=%s – Ошибка remove_membership(bot): %s", user_id, exc, extra={"user_id": user_id})
-    try:
-        await delete_user_subscriptions(user_id)
-    except Exception as exc:
-        s_ok = False
-        log.error("user_id=%s – Ошибка delete_user_subscriptions: %s", user_id, exc, extra={"user_id": user_id})
-
-    parts = []
-    parts.append("membership(bot)=OK" if m_ok else "membership(bot)=ERR")
-    parts.append("subscriptions=OK" if s_ok else "subscriptions=ERR")
-    log.info("user_id=%s – Автоочистка после Forbidden: %s", user_id, ", ".join(parts), extra={"user_id": user_id})
+    mark_unreachable(user_id)
+    get_blocked_cleanup().submit(user_id, tag)
 
 
 def _extract_user_id(target: Message | CallbackQuery | Any) -> Optional[int]:
@@ -0,0 +1,105 @@
+# common/utils/ttl_cache.py
+# Read-through кеш с TTL и LRU-вытеснением для редко меняющихся ответов DB-API (пользователь, подписки, инвайты).
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+_caches: Dict[str, "TTLCache"] = {}
+
+
+class TTLCache:
+    """
+    - get_or_load(key, loader) — отдаёт свежее значение из кеша, иначе вызывает loader и кладёт результат;
+      исключения loader не кешируются;
+    - put(key, value) — write-through после записи в БД (ответ записи сразу становится кешем);
+    - invalidate(key) — сброс записи; загрузка этого key, начатая до сброса, свой результат уже не положит
+      (загрузки других key запись не задевает);
+    - не больше maxsize записей: вытесняется давно не читанная.
+    """
+
+    def __init__(self, name: str, *, ttl: float = 300.0, maxsize: int = 10_000) -> None:
+        self.name = name
+        self.ttl = float(ttl)
+        self.maxsize = max(1, int(maxsize))
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        # key → метка последней начатой загрузки; put/invalidate/clear её снимают — результат не кладётся
+        self._loading: Dict[Hashable, object] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        _caches[name] = self
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires, value = entry
+        if expires <= time.monotonic():
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._loading.pop(key, None)
+        self._store(key, value)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._loading.pop(key, None)
+        if self._data.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._loading.clear()
+        self._data.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+        token = self._loading[key] = object()
+        try:
+            value = await loader()
+        except BaseException:
+            if self._loading.get(key) is token:
+                del self._loading[key]
+            raise
+        # пока грузили, этот key записали/сбросили (или начали загрузку заново) — не перетираем свежие данные
+        if self._loading.get(key) is token:
+            del self._loading[key]
+            self._store(key, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def cache_stats(name: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Счётчики всех кешей процесса (или одного по имени)."""
+    if name is not None:
+        return {name: _caches[name].stats()} if name in _caches else {}
+    return {n: c.stats() for n, c in _caches.items()}
+
+
+__all__ = ["TTLCache", "cache_stats"]
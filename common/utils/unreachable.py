@@ -0,0 +1,157 @@
+# common/utils/unreachable.py
+# Локальный индекс «недоступных» получателей (заблокировали бота): рассылка не тратит на них лимит.
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from array import array
+from typing import Optional
+
+import config
+from common.utils.idset import IdSet
+
+log = logging.getLogger(__name__)
+
+_FORMAT_VERSION = 1
+
+
+class UnreachableIndex:
+    """
+    Множество user_id, которые заблокировали бота (Forbidden / my_chat_member=kicked).
+
+    Записи стареют: два поколения IdSet, раз в ttl/2 текущее становится прошлым, прошлое выбрасывается.
+    Запись живёт от ttl/2 до ttl, если её не подтвердить повторным add() — так пропущенный
+    «разблокировал» (апдейты во время простоя бота сбрасываются) не исключает человека навсегда.
+
+    Хранение — снимок в файле: строка-заголовок JSON + два массива int64; запись атомарная (tmp + replace).
+    """
+
+    def __init__(self, path: str, ttl_seconds: float) -> None:
+        self.path = path
+        self.ttl = max(60.0, float(ttl_seconds))
+        self._cur = IdSet()
+        self._prev = IdSet(capacity=8)
+        self._rotated_at = time.time()
+        self._dirty = False
+        self._lock = asyncio.Lock()
+
+    # ---------- persistence ----------
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "rb") as f:
+                header = json.loads(f.readline() or b"{}")
+                if header.get("v") != _FORMAT_VERSION:
+                    raise ValueError(f"неизвестная версия формата: {header.get('v')}")
+                cur, prev = array("q"), array("q")
+                cur.frombytes(f.read(8 * int(header["cur"])))
+                prev.frombytes(f.read(8 * int(header["prev"])))
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            log.warning("Индекс недоступных: файл %s не прочитан (%s), начинаю с пустого", self.path, e,
+                        extra={"user_id": "system"})
+            return
+        self._cur = IdSet.from_array(cur)
+        self._prev = IdSet.from_array(prev)
+        self._rotated_at = float(header.get("rotated_at") or time.time())
+        self._maybe_rotate()
+        log.info("Индекс недоступных загружен: %s user_id", len(self), extra={"user_id": "system"})
+
+    def _write(self, cur: array, prev: array, rotated_at: float) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        header = {"v": _FORMAT_VERSION, "rotated_at": rotated_at, "cur": len(cur), "prev": len(prev)}
+        with open(tmp, "wb") as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            cur.tofile(f)
+            prev.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    async def save(self) -> None:
+        """Сохраняет снимок, если были изменения (запись файла — в отдельном потоке)."""
+        if not self._dirty:
+            return
+        async with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            cur, prev = self._cur.to_array(), self._prev.to_array()
+            try:
+                await asyncio.to_thread(self._write, cur, prev, self._rotated_at)
+            except Exception as e:
+                self._dirty = True
+                log.error("Индекс недоступных: не удалось сохранить %s: %s", self.path, e, extra={"user_id": "system"})
+
+    # ---------- set API ----------
+
+    def _maybe_rotate(self) -> None:
+        now = time.time()
+        if now - self._rotated_at < self.ttl / 2:
+            return
+        # простаивали дольше ttl — устарели оба поколения
+        self._prev = self._cur if now - self._rotated_at < self.ttl else IdSet(capacity=8)
+        self._cur = IdSet()
+        self._rotated_at = now
+        self._dirty = True
+
+    def add(self, user_id: int) -> bool:
+        self._maybe_rotate()
+        uid = int(user_id)
+        if uid in self._cur:
+            return False
+        self._cur.add(uid)
+        self._dirty = True
+        return uid not in self._prev
+
+    def discard(self, user_id: int) -> bool:
+        uid = int(user_id)
+        removed = self._cur.discard(uid) | self._prev.discard(uid)
+        if removed:
+            self._dirty = True
+        return removed
+
+    def __contains__(self, user_id: object) -> bool:
+        self._maybe_rotate()
+        return user_id in self._cur or user_id in self._prev
+
+    def __len__(self) -> int:
+        return len(self._cur) + sum(1 for x in self._prev if x not in self._cur)
+
+
+_index: Optional[UnreachableIndex] = None
+
+
+def get_unreachable() -> UnreachableIndex:
+    """Общий индекс процесса (загружается с диска при первом обращении)."""
+    global _index
+    if _index is None:
+        _index = UnreachableIndex(
+            os.path.join(config.STATE_DIR, "unreachable.bin"),
+            ttl_seconds=float(getattr(config, "UNREACHABLE_TTL_DAYS", 30)) * 86400,
+        )
+        _index.load()
+    return _index
+
+
+def mark_unreachable(user_id: int) -> None:
+    """Пользователь заблокировал бота — не тратить на него рассылки до разблокировки (или истечения TTL)."""
+    if get_unreachable().add(user_id):
+        log.info("user_id=%s – Добавлен в индекс недоступных", user_id, extra={"user_id": user_id})
+
+
+async def mark_reachable(user_id: int) -> None:
+    """Пользователь снова доступен (разблокировал бота) — убираем из индекса и сразу сохраняем."""
+    idx = get_unreachable()
+    if idx.discard(user_id):
+        log.info("user_id=%s – Удалён из индекса недоступных", user_id, extra={"user_id": user_id})
+        await idx.save()
+
+
+__all__ = ["UnreachableIndex", "get_unreachable", "mark_unreachable", "mark_reachable"]
@@ -0,0 +1,213 @@
+# common/utils/write_batcher.py
+# Микро-пакетная запись в DB-API: апсёрты интерактивного пути (/start) копятся коротким окном
+# и уходят пакетными запросами; если пакетного маршрута нет — поштучно, как раньше.
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import Counter, OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+from common.db_api import db_deadline
+
+log = logging.getLogger(__name__)
+
+SingleFn = Callable[[Dict[str, Any]], Awaitable[Any]]
+# пакетная функция: список payload → список (результат | исключение) в том же порядке; None — маршрута нет
+BulkFn = Callable[[List[Dict[str, Any]]], Awaitable[Optional[List[Any]]]]
+
+
+class _Op:
+    __slots__ = ("kind", "payload", "future")
+
+    def __init__(self, kind: str, payload: Dict[str, Any], future: "asyncio.Future[Any]") -> None:
+        self.kind = kind
+        self.payload = payload
+        self.future = future
+
+
+def _consume(fut: "asyncio.Future[Any]") -> None:
+    # результат могут не ждать — не даём asyncio ругаться на «необработанное» исключение
+    if not fut.cancelled():
+        fut.exception()
+
+
+class WriteBatcher:
+    """
+    Очередь записей с пакетной отправкой.
+
+    - register(kind, single=..., bulk=...) — вид записи: поштучная функция и (необязательно) пакетная;
+    - submit(kind, key, payload) — не блокирует, возвращает Future с результатом именно этой записи
+      (или её исключением — тем же, что дал бы поштучный вызов);
+    - записи копятся window секунд (или до max_batch) и уходят одним пакетом на вид;
+    - порядок в пределах key (user_id) сохраняется: пакет отправляется «волнами» — в каждой волне
+      не больше одной записи на key, следующая волна — после ответа на предыдущую;
+    - пакетный маршрут вернул None (у бэка его нет) — вид запоминается как «без пакетов» и пишется поштучно
+      (не больше concurrency запросов одновременно).
+    """
+
+    def __init__(self, *, window: float = 0.05, max_batch: int = 200, concurrency: int = 16) -> None:
+        self.window = max(0.0, float(window))
+        self.max_batch = max(1, int(max_batch))
+        self.concurrency = max(1, int(concurrency))
+
+        self._kinds: Dict[str, tuple[SingleFn, Optional[BulkFn]]] = {}
+        self._no_bulk: set[str] = set()
+        # key → очередь записей этого key в порядке submit
+        self._pending: "OrderedDict[Hashable, Deque[_Op]]" = OrderedDict()
+        self._count = 0
+        self._stats: Counter = Counter()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, kind: str, *, single: SingleFn, bulk: Optional[BulkFn] = None) -> None:
+        self._kinds[kind] = (single, bulk)
+
+    # ---------- producer side ----------
+
+    def _ensure_worker(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._full = asyncio.Event()
+            self._idle = asyncio.Event()
+            # воркер создаётся из обработчика — его бюджет DB-API на фоновые пакеты не распространяется
+            with db_deadline(None):
+                self._task = asyncio.create_task(self._run(), name="write_batcher")
+
+    def submit(self, kind: str, key: Hashable, payload: Dict[str, Any]) -> "asyncio.Future[Any]":
+        if kind not in self._kinds:
+            raise KeyError(f"WriteBatcher: неизвестный вид записи {kind!r}")
+        self._ensure_worker()
+        fut: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        fut.add_done_callback(_consume)
+        queue = self._pending.get(key)
+        if queue is None:
+            queue = self._pending[key] = deque()
+        queue.append(_Op(kind, payload, fut))
+        self._count += 1
+        self._stats["submitted"] += 1
+        self._idle.clear()
+        self._wakeup.set()
+        if self._count >= self.max_batch:
+            self._full.set()
+        return fut
+
+    @property
+    def pending(self) -> int:
+        return self._count
+
+    def stats(self) -> Dict[str, Any]:
+        st = dict(self._stats)
+        st["pending"] = self._count
+        st["no_bulk"] = sorted(self._no_bulk)
+        return st
+
+    # ---------- worker ----------
+
+    async def _run(self) -> None:
+        while True:
+            if not self._pending:
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            if self._count < self.max_batch and self.window > 0:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.window)
+                except asyncio.TimeoutError:
+                    pass
+
+            # очереди key забираются целиком — их хвост не может уйти раньше головы
+            batch: List[Deque[_Op]] = []
+            taken = 0
+            while self._pending and taken < self.max_batch:
+                _, queue = self._pending.popitem(last=False)
+                batch.append(queue)
+                taken += len(queue)
+            self._count -= taken
+            try:
+                await self._flush(batch)
+            except Exception as e:  # не должно случаться: ошибки уходят в Future
+                log.exception("Пакетная запись: сбой воркера — %s", e, extra={"user_id": "system"})
+                for queue in batch:
+                    for op in queue:
+                        if not op.future.done():
+                            op.future.set_exception(e)
+
+    async def _flush(self, batch: List[Deque[_Op]]) -> None:
+        self._stats["flushes"] += 1
+        sem = asyncio.Semaphore(self.concurrency)
+        while batch:
+            wave: Dict[str, List[_Op]] = {}
+            for queue in batch:
+                op = queue.popleft()
+                wave.setdefault(op.kind, []).append(op)
+            batch = [q for q in batch if q]
+            await asyncio.gather(*(self._send(kind, ops, sem) for kind, ops in wave.items()))
+
+    async def _send(self, kind: str, ops: List[_Op], sem: asyncio.Semaphore) -> None:
+        single, bulk = self._kinds[kind]
+        if bulk is not None and len(ops) > 1 and kind not in self._no_bulk:
+            try:
+                results = await bulk([op.payload for op in ops])
+            except Exception as e:
+                self._stats["failed"] += len(ops)
+                for op in ops:
+                    if not op.future.done():
+                        op.future.set_exception(e)
+                return
+            if results is not None:
+                self._stats["bulk_calls"] += 1
+                self._stats["bulk_items"] += len(ops)
+                for op, res in zip(ops, results):
+                    if op.future.done():
+                        continue
+                    if isinstance(res, BaseException):
+                        self._stats["failed"] += 1
+                        op.future.set_exception(res)
+                    else:
+                        op.future.set_result(res)
+                return
+            self._no_bulk.add(kind)
+            log.info("Пакетная запись: у DB-API нет пакетного маршрута для %s — пишем поштучно", kind, extra={"user_id": "system"})
+
+        await asyncio.gather(*(self._send_one(single, op, sem) for op in ops))
+
+    async def _send_one(self, single: SingleFn, op: _Op, sem: asyncio.Semaphore) -> None:
+        async with sem:
+            self._stats["single_calls"] += 1
+            try:
+                res = await single(op.payload)
+            except Exception as e:
+                self._stats["failed"] += 1
+                if not op.future.done():
+                    op.future.set_exception(e)
+                return
+        if not op.future.done():
+            op.future.set_result(res)
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Ждёт, пока всё отправлено. False — не успели за timeout."""
+        if self._task is None or self._task.done() or self._idle is None:
+            return self._count == 0
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def close(self, timeout: float = 10.0) -> None:
+        if not await self.drain(timeout):
+            log.warning("Пакетная запись: при остановке не отправлено %s записей", self._count, extra={"user_id": "system"})
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+__all__ = ["WriteBatcher"]
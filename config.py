@@ -58,6 +58,11 @@ try:
     BOT_TOKEN = os.getenv("BOT_TOKEN")
     if not BOT_TOKEN:
         raise KeyError("BOT_TOKEN is not set")
+    # Пул соединений к Bot API (один на процесс): максимум соединений, сколько секунд держать
+    # простаивающее keep-alive соединение и сколько секунд кешировать DNS api.telegram.org
+    TG_POOL_SIZE = max(1, int(os.getenv("TG_POOL_SIZE", "100")))
+    TG_KEEPALIVE = max(1.0, float(os.getenv("TG_KEEPALIVE", "30")))
+    TG_DNS_TTL = max(0, int(os.getenv("TG_DNS_TTL", "300")))
 
     # Канал для логирования всех ошибок
     ERROR_LOG_CHANNEL_ID = get_env_int("ERROR_LOG_CHANNEL_ID")
@@ -71,6 +76,16 @@ try:
 
     # Режимы приглашений
     INVITE_LINK_MODE = os.getenv("INVITE_LINK_MODE", "dynamic").strip()
+    # Пул заранее созданных инвайтов (member_limit=1) на каждое числовое назначение: сколько держать (0 — без пула),
+    # скорость долива, ссылок/с на все чаты, и сколько секунд ссылка может ждать в пуле
+    INVITE_POOL_SIZE = max(0, int(os.getenv("INVITE_POOL_SIZE", "20")))
+    INVITE_POOL_RATE = max(0.01, float(os.getenv("INVITE_POOL_RATE", "1")))
+    INVITE_POOL_MAX_AGE = max(60.0, float(os.getenv("INVITE_POOL_MAX_AGE", "1800")))
+    # Сборщик инвайтов: как часто искать в БД истёкшие ссылки (сек), сколько отзывать за пачку
+    # и скорость revoke_chat_invite_link, вызовов/с
+    INVITE_GC_INTERVAL = max(10.0, float(os.getenv("INVITE_GC_INTERVAL", "300")))
+    INVITE_GC_BATCH = max(1, int(os.getenv("INVITE_GC_BATCH", "100")))
+    INVITE_GC_RATE = max(0.01, float(os.getenv("INVITE_GC_RATE", "2")))
 
     # Приватные назначения
     raw_dest = os.getenv("PRIVATE_DESTINATIONS", "").strip()
@@ -111,6 +126,27 @@ try:
 
     # URL API сервиса базы
     DB_API_URL = os.getenv("DB_API_URL", "http://db-api:8000")
+    # Бюджет одного вызова DB-API вместе с повторами, сек (HTTP_RETRIES/HTTP_BACKOFF_* — повторы внутри бюджета)
+    DB_API_CALL_BUDGET = max(0.5, float(os.getenv("DB_API_CALL_BUDGET", "5")))
+    # Бюджет вызова пакетных эндпоинтов DB-API (страницы аудитории, materialize, report рассылок), сек
+    DB_API_BULK_BUDGET = max(1.0, float(os.getenv("DB_API_BULK_BUDGET", "30")))
+    # Общий бюджет DB-API на один интерактивный обработчик (/start, меню), сек
+    DB_API_HANDLER_BUDGET = max(1.0, float(os.getenv("DB_API_HANDLER_BUDGET", "10")))
+    # Автомат на эндпоинт: после N ошибок подряд — быстрый отказ на DB_API_BREAKER_RESET сек, потом пробный запрос
+    DB_API_BREAKER_FAILURES = max(1, int(os.getenv("DB_API_BREAKER_FAILURES", "5")))
+    DB_API_BREAKER_RESET = max(1.0, float(os.getenv("DB_API_BREAKER_RESET", "15")))
+    # Кеш чтений storage.py (пользователь/условия, подписки, инвайт-ссылки): время жизни, сек, и число записей
+    DB_CACHE_TTL = max(0.0, float(os.getenv("DB_CACHE_TTL", "300")))
+    DB_CACHE_MAXSIZE = max(1, int(os.getenv("DB_CACHE_MAXSIZE", "10000")))
+    # Пакетная запись апсёртов /start (user, membership, подписки, terms): окно накопления, мс; размер пакета;
+    # сколько поштучных запросов одновременно, если у DB-API нет пакетных маршрутов. Окно 0 — без ожидания
+    WRITE_BATCH_WINDOW_MS = max(0, int(os.getenv("WRITE_BATCH_WINDOW_MS", "30")))
+    WRITE_BATCH_MAX = max(1, int(os.getenv("WRITE_BATCH_MAX", "200")))
+    WRITE_BATCH_CONCURRENCY = max(1, int(os.getenv("WRITE_BATCH_CONCURRENCY", "16")))
+    # chat_member в отслеживаемых чатах пишутся отложенно (последний статус на user+chat, спул в STATE_DIR):
+    # раз в MEMBERSHIP_FLUSH_INTERVAL сек или по набору MEMBERSHIP_FLUSH_BATCH ключей
+    MEMBERSHIP_FLUSH_INTERVAL = max(0.0, float(os.getenv("MEMBERSHIP_FLUSH_INTERVAL", "1")))
+    MEMBERSHIP_FLUSH_BATCH = max(1, int(os.getenv("MEMBERSHIP_FLUSH_BATCH", "500")))
 
     # Ключ API
     API_KEY_VALUE = os.getenv("API_KEY_VALUE")
@@ -128,6 +164,39 @@ try:
 
     # ==== Настройки рассылок ====
     BROADCAST_RATE_PER_SEC = int(os.getenv("BROADCAST_RATE_PER_SEC", "29"))
+    # Сколько получателей обрабатывается одновременно (скорость всё равно ограничена BROADCAST_RATE_PER_SEC)
+    BROADCAST_CONCURRENCY = max(1, int(os.getenv("BROADCAST_CONCURRENCY", "8")))
+    # Адаптивная скорость (AIMD): на 429 — пауза retry_after и снижение в BROADCAST_RATE_DECREASE раз,
+    # после BROADCAST_RATE_INCREASE_EVERY успехов подряд — +BROADCAST_RATE_INCREASE_STEP msg/с (до BROADCAST_RATE_MAX)
+    BROADCAST_RATE_MIN = float(os.getenv("BROADCAST_RATE_MIN", "1"))
+    BROADCAST_RATE_MAX = float(os.getenv("BROADCAST_RATE_MAX", "30"))
+    BROADCAST_RATE_DECREASE = float(os.getenv("BROADCAST_RATE_DECREASE", "0.5"))
+    BROADCAST_RATE_INCREASE_STEP = float(os.getenv("BROADCAST_RATE_INCREASE_STEP", "1"))
+    BROADCAST_RATE_INCREASE_EVERY = int(os.getenv("BROADCAST_RATE_INCREASE_EVERY", "100"))
+    # Размер страницы резолва аудитории: страница → materialize → отправка (память не растёт с аудиторией)
+    BROADCAST_AUDIENCE_PAGE = max(100, int(os.getenv("BROADCAST_AUDIENCE_PAGE", "5000")))
+    # Фоновая выгрузка репортов доставки: ёмкость очереди (дальше — backpressure) и потолок батча
+    BROADCAST_REPORT_QUEUE = max(100, int(os.getenv("BROADCAST_REPORT_QUEUE", "5000")))
+    BROADCAST_REPORT_BATCH_MAX = max(50, int(os.getenv("BROADCAST_REPORT_BATCH_MAX", "1000")))
+    # Планировщик рассылок: сколько запусков по расписанию выполняется одновременно (остальные ждут в очереди)
+    BROADCAST_SCHEDULER_WORKERS = max(1, int(os.getenv("BROADCAST_SCHEDULER_WORKERS", "4")))
+    # Синхронизация планов с БД: размер страницы и как часто делать полный проход вместо дельты (сек)
+    BROADCAST_SYNC_PAGE = max(50, int(os.getenv("BROADCAST_SYNC_PAGE", "500")))
+    BROADCAST_SYNC_FULL_EVERY = max(60, int(os.getenv("BROADCAST_SYNC_FULL_EVERY", "3600")))
+    # Запуски по расписанию, пропущенные за время простоя бота: skip — не догонять, once — один догоняющий запуск,
+    # all — каждый пропущенный; догоняются только запуски не старше BROADCAST_MISFIRE_GRACE секунд
+    BROADCAST_MISFIRE_POLICY = (os.getenv("BROADCAST_MISFIRE_POLICY") or "once").strip().lower()
+    if BROADCAST_MISFIRE_POLICY not in ("skip", "once", "all"):
+        logging.warning(f"BROADCAST_MISFIRE_POLICY has invalid value '{BROADCAST_MISFIRE_POLICY}', falling back to once")
+        BROADCAST_MISFIRE_POLICY = "once"
+    BROADCAST_MISFIRE_GRACE = max(0, int(os.getenv("BROADCAST_MISFIRE_GRACE", "3600")))
+    # Фоновая автоочистка заблокировавших бота: сколько id за проход и сколько одновременно
+    BLOCKED_CLEANUP_BATCH = max(1, int(os.getenv("BLOCKED_CLEANUP_BATCH", "50")))
+    BLOCKED_CLEANUP_CONCURRENCY = max(1, int(os.getenv("BLOCKED_CLEANUP_CONCURRENCY", "4")))
+    # Сколько дней помним «заблокировал бота» без подтверждения (потом снова пробуем доставить)
+    UNREACHABLE_TTL_DAYS = float(os.getenv("UNREACHABLE_TTL_DAYS", "30"))
+    # Каталог локального состояния (спул репортов рассылок и т.п.) — должен переживать рестарт контейнера
+    STATE_DIR = os.getenv("STATE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "state")
     HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "20"))
     HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
     HTTP_BACKOFF_MIN = float(os.getenv("HTTP_BACKOFF_MIN", "0.5"))
@@ -10,8 +10,7 @@ import traceback
 from typing import Any
 
 from aiohttp import web
-from aiogram import Bot, Dispatcher
-from aiogram.enums import ParseMode
+from aiogram import Dispatcher
 from aiogram.exceptions import TelegramForbiddenError  # ← добавлено
 
 import logger
@@ -29,18 +28,22 @@ from common.utils import get_bot, shutdown_utils
 from common.utils.time_msk import now_msk_naive
 from common.db_api_client import db_api_client
 from common.utils.tg_safe import _cleanup_blocked  # ← добавлено
+from common.utils.blocked_cleanup import get_blocked_cleanup
+from common.utils.membership_queue import get_membership_queue
+from common.utils.latency import latency_stats
+from Hallway.services.invite_pool import get_invite_pool
+from Hallway.services.invite_gc import get_invite_gc
+from common.utils.unreachable import get_unreachable
+
+# HTML-шаблоны текстов
+import messages
 
 # Хранилище
-from storage import upsert_chat, get_chats as storage_get_chats
+from storage import upsert_chat, get_chats as storage_get_chats, storage_cache_stats, write_batcher
 
 # Фоновый воркер рассылок
-from Mailing.services.broadcasts import run_broadcast_worker
-
-# Совместимость aiogram 3.7+
-try:
-    from aiogram.client.default import DefaultBotProperties  # aiogram 3.7+
-except Exception:
-    DefaultBotProperties = None
+from Mailing.services.broadcasts import run_broadcast_worker, resume_interrupted_broadcasts
+from Mailing.services.local_scheduler import scheduler_stats
 
 log = logging.getLogger(__name__)
 already_logged: set[str] = set()
@@ -126,9 +129,9 @@ async def global_error_handler(*args: Any) -> bool:
         uid = _extract_user_id_from_update(update) if update is not None else None
         try:
             if uid is not None:
-                await _cleanup_blocked(uid)
+                await _cleanup_blocked(uid, "global")
                 logging.getLogger(__name__).info(
-                    "user_id=%s – TelegramForbiddenError перехвачен глобально: очистка выполнена",
+                    "user_id=%s – TelegramForbiddenError перехвачен глобально: очистка поставлена в очередь",
                     uid, extra={"user_id": uid}
                 )
             else:
@@ -204,13 +207,8 @@ async def main():
         log.info("Запускаем бота")
         already_logged.add("Запускаем бота")
 
-    # Инициализация бота
-    if DefaultBotProperties is not None:
-        bot = Bot(token=config.BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-        log.info("Инициализация Bot: aiogram>=3.7 (DefaultBotProperties)")
-    else:
-        bot = Bot(token=config.BOT_TOKEN, parse_mode=ParseMode.HTML)
-        log.info("Инициализация Bot: aiogram<=3.6 (parse_mode в конструкторе)")
+    # Инициализация бота: общий Bot процесса (тот же, что у get_bot() в роутерах и сервисах)
+    bot = get_bot()
 
     dp = Dispatcher()
     # Подключаем новые реестры
@@ -218,6 +216,9 @@ async def main():
     dp.include_router(mailing_router)
     dp.errors.register(global_error_handler)
 
+    # Шаблоны text/*.html — в память до первого /start
+    log.info(f"Шаблонов загружено: {messages.templates.preload()}")
+
     # Фоновые задачи
     asyncio.create_task(_warmup_tracked_chats(log))
 
@@ -230,7 +231,7 @@ async def main():
     asyncio.create_task(run_broadcast_worker(bot, interval_seconds=interval))
 
     # Регистрируем чат бота
-    me = await bot.get_me()
+    me = await bot.me()
     config.BOT_ID = me.id
     await upsert_chat({
         "id": me.id,
@@ -242,6 +243,9 @@ async def main():
         log.info(f"Зарегистрирован чат бота: {me.id}")
         already_logged.add(f"Registered bot chat: {me.id}")
 
+    # Продолжаем рассылки, прерванные рестартом (нужен BOT_ID для автоочистки)
+    asyncio.create_task(resume_interrupted_broadcasts(bot))
+
     # Health-check HTTP
     port = int(os.getenv("PORT", "8080"))
     log.info(f"HTTP health-check сервер запущен на порту {port}")
@@ -250,7 +254,23 @@ async def main():
     async def health(request):
         return web.Response(text="OK")
 
+    async def stats(request):
+        # счётчики кешей storage и состояние автоматов DB-API
+        return web.json_response({
+            "cache": storage_cache_stats(),
+            "db_api": db_api_client.breaker_stats(),
+            "db_api_singleflight": db_api_client.singleflight_stats(),
+            "write_batcher": write_batcher.stats(),
+            "membership_queue": get_membership_queue().stats(),
+            "latency": latency_stats(),
+            "invite_pool": get_invite_pool().stats(),
+            "invite_gc": get_invite_gc().stats(),
+            "templates": messages.templates.stats(),
+            "scheduler": scheduler_stats(),
+        })
+
     app.router.add_get("/", health)
+    app.router.add_get("/stats", stats)
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, "0.0.0.0", port)
@@ -260,17 +280,37 @@ async def main():
         await bot.delete_webhook(drop_pending_updates=True)
         await dp.start_polling(bot)
     finally:
-        # Аккуратный shutdown
+        # Аккуратный shutdown: сначала дочищаем очередь автоочистки и пакетные записи (им ещё нужен db_api_client)
         try:
-            await db_api_client.close()
+            await get_blocked_cleanup().close()
+        except Exception:
+            pass
+        try:
+            await get_invite_pool().close()
+        except Exception:
+            pass
+        try:
+            await get_invite_gc().close()
+        except Exception:
+            pass
+        try:
+            await get_membership_queue().close()
+        except Exception:
+            pass
+        try:
+            await write_batcher.close()
+        except Exception:
+            pass
+        try:
+            await get_unreachable().save()
         except Exception:
             pass
         try:
-            await shutdown_utils()
+            await db_api_client.close()
         except Exception:
             pass
         try:
-            await bot.session.close()
+            await shutdown_utils()  # закрывает и сессию общего Bot
         except Exception:
             pass
 
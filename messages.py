@@ -1,9 +1,14 @@
 # messages.py
 from pathlib import Path
 
+from common.utils.templates import TemplateRegistry
+
 # Папка с HTML-шаблонами
 TEXT_DIR = Path(__file__).parent / "text"
 
+# Шаблоны живут в памяти; правка файла (руками или через /set…) подхватывается по mtime
+templates = TemplateRegistry(TEXT_DIR)
+
 # Файлы-шаблоны
 AD_FILE         = TEXT_DIR / "advertisement.html"    # баннер «Наши ресурсы» (общий)
 AD_FILE_1       = TEXT_DIR / "advertisement_1.html"  # Лудочат
@@ -39,10 +44,11 @@ DEFAULT_ANON_TEXT = "Раздел «Анонимность» временно н
 DEFAULT_PROJ_TEXT = "Раздел «Все проекты» временно недоступен. Попробуйте позже."
 
 def _read_file(path: Path, default: str) -> str:
-    try:
-        return path.read_text(encoding="utf-8")
-    except FileNotFoundError:
-        return default
+    return templates.get(path, default)
+
+async def save_text(path: Path, text: str) -> None:
+    """Атомарная запись шаблона (в потоке); новый текст сразу отдаётся из памяти."""
+    await templates.save(path, text)
 
 def get_ad_text() -> str:
     return _read_file(AD_FILE, DEFAULT_AD_TEXT)
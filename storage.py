@@ -1,27 +1,82 @@
+import asyncio
 import logging
 from datetime import datetime
+
+import config
 from common.db_api_client import db_api_client
+from common.utils.ttl_cache import TTLCache, cache_stats
+from common.utils.write_batcher import WriteBatcher
 from httpx import HTTPStatusError
-from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type
 
 log = logging.getLogger(__name__)
 
-# Повторять любые исключения до 3 раз с интервалом 1 секунда
-RETRY = {
-    "retry": retry_if_exception_type(Exception),
-    "stop": stop_after_attempt(3),
-    "wait": wait_fixed(1),
+# Повторы, бюджет времени и автомат на эндпоинт — в транспорте db_api_client (common/db_api/base.py);
+# здесь вызовы не оборачиваются, чтобы повторы не умножались друг на друга.
+
+# Read-through кеши интерактивного пути (/start, меню подписок, ресурсы).
+# Записи через функции этого модуля обновляют/сбрасывают кеш сразу (write-through).
+_CACHE_OPTS = {
+    "ttl": getattr(config, "DB_CACHE_TTL", 300.0),
+    "maxsize": getattr(config, "DB_CACHE_MAXSIZE", 10_000),
 }
+users_cache = TTLCache("users", **_CACHE_OPTS)
+subscriptions_cache = TTLCache("subscriptions", **_CACHE_OPTS)
+invite_links_cache = TTLCache("invite_links", **_CACHE_OPTS)
+
+# Апсёрты интерактивного пути идут пакетами (common/utils/write_batcher.py); порядок по user_id сохраняется.
+# queue_* не ждут записи и возвращают Future — его ждут только те, кому нужен результат.
+write_batcher = WriteBatcher(
+    window=getattr(config, "WRITE_BATCH_WINDOW_MS", 30) / 1000,
+    max_batch=getattr(config, "WRITE_BATCH_MAX", 200),
+    concurrency=getattr(config, "WRITE_BATCH_CONCURRENCY", 16),
+)
+write_batcher.register(
+    "user_upsert",
+    single=lambda p: db_api_client.upsert_user(p["user_id"], p["username"], p["full_name"]),
+    bulk=db_api_client.bulk_upsert_users,
+)
+write_batcher.register(
+    "user_update",
+    single=lambda p: db_api_client.update_user(p["user_id"], {k: v for k, v in p.items() if k != "user_id"}),
+    bulk=db_api_client.bulk_update_users,
+)
+write_batcher.register(
+    "membership",
+    single=lambda p: db_api_client.add_membership(p["user_id"], p["chat_id"]),
+    bulk=db_api_client.bulk_add_memberships,
+)
+# удаления — без пакетного маршрута, но через ту же очередь: иначе обгонят ещё не отправленный апсёрт того же user_id
+write_batcher.register(
+    "membership_remove",
+    single=lambda p: db_api_client.remove_membership(p["user_id"], p["chat_id"]),
+)
+write_batcher.register(
+    "subscriptions_delete",
+    single=lambda p: db_api_client.delete_user_subscriptions(p["user_id"]),
+)
+write_batcher.register(
+    "subscriptions",
+    single=lambda p: db_api_client.put_user_subscriptions(**p),
+    bulk=db_api_client.bulk_put_user_subscriptions,
+)
 
 # ===== USERS =====
 
-@retry(**RETRY)
+def queue_add_user(user_id: int, username: str | None, full_name: str | None) -> asyncio.Future:
+    # апсёрт меняет username/full_name: закешированная строка устарела (и сейчас, и когда запись дойдёт до БД)
+    users_cache.invalidate(user_id)
+    fut = write_batcher.submit(
+        "user_upsert", user_id, {"user_id": user_id, "username": username, "full_name": full_name}
+    )
+    fut.add_done_callback(lambda _: users_cache.invalidate(user_id))
+    return fut
+
+
 async def add_user(user_id: int, username: str | None, full_name: str | None) -> dict:
-    return await db_api_client.upsert_user(user_id, username, full_name)
+    return await queue_add_user(user_id, username, full_name)
 
 
-@retry(**RETRY)
-async def get_user(user_id: int) -> dict:
+async def _load_user(user_id: int) -> dict:
     try:
         return await db_api_client.get_user(user_id)
     except HTTPStatusError as exc:
@@ -30,9 +85,16 @@ async def get_user(user_id: int) -> dict:
         raise
 
 
-@retry(**RETRY)
+async def get_user(user_id: int) -> dict:
+    return await users_cache.get_or_load(user_id, lambda: _load_user(user_id))
+
+
 async def update_user(user_id: int, user_data: dict) -> dict:
-    return await db_api_client.update_user(user_id, user_data)
+    users_cache.invalidate(user_id)
+    data = await write_batcher.submit("user_update", user_id, {**user_data, "user_id": user_id})
+    if isinstance(data, dict) and data:
+        users_cache.put(user_id, data)
+    return data
 
 
 async def has_terms_accepted(user_id: int) -> bool:
@@ -53,36 +115,38 @@ async def set_terms_accepted(user_id: int) -> None:
 
 # ===== CHATS =====
 
-@retry(**RETRY)
 async def upsert_chat(chat_data: dict) -> dict:
     return await db_api_client.upsert_chat(chat_data)
 
 
-@retry(**RETRY)
 async def get_chats() -> list[dict]:
     return await db_api_client.get_chats()
 
 
-@retry(**RETRY)
 async def delete_chat(chat_id: int) -> None:
     await db_api_client.delete_chat(chat_id)
 
 
 # ===== MEMBERSHIPS =====
 
-@retry(**RETRY)
+def queue_add_membership(user_id: int, chat_id: int) -> asyncio.Future:
+    return write_batcher.submit("membership", user_id, {"user_id": user_id, "chat_id": chat_id})
+
+
 async def add_membership(user_id: int, chat_id: int) -> None:
-    await db_api_client.add_membership(user_id, chat_id)
+    await queue_add_membership(user_id, chat_id)
+
+
+def queue_remove_membership(user_id: int, chat_id: int) -> asyncio.Future:
+    return write_batcher.submit("membership_remove", user_id, {"user_id": user_id, "chat_id": chat_id})
 
 
-@retry(**RETRY)
 async def remove_membership(user_id: int, chat_id: int) -> None:
-    await db_api_client.remove_membership(user_id, chat_id)
+    await queue_remove_membership(user_id, chat_id)
 
 
 # ===== INVITE LINKS =====
 
-@retry(**RETRY)
 async def save_invite_link(
     user_id: int,
     chat_id: int,
@@ -90,44 +154,47 @@ async def save_invite_link(
     created_at: str,
     expires_at: str,
 ) -> dict:
+    invite_links_cache.invalidate(user_id)
     return await db_api_client.save_invite_link(
         user_id, chat_id, invite_link, created_at, expires_at
     )
 
 
-@retry(**RETRY)
 async def get_all_invite_links(user_id: int) -> list[dict]:
-    return await db_api_client.get_all_invite_links(user_id)
+    return await invite_links_cache.get_or_load(user_id, lambda: db_api_client.get_all_invite_links(user_id))
+
+
+async def get_expired_invite_links(before: str, limit: int = 500, offset: int = 0) -> list[dict] | None:
+    return await db_api_client.get_expired_invite_links(before, limit, offset)
+
+
+async def delete_invite_link(user_id: int, chat_id: int, invite_link: str) -> None:
+    invite_links_cache.invalidate(user_id)
+    await db_api_client.delete_invite_link(user_id, chat_id, invite_link)
 
 
-@retry(**RETRY)
 async def track_link_visit(link_key: str) -> dict:
     return await db_api_client.track_link_visit(link_key)
 
 
 # ===== ALGORITHM PROGRESS =====
 
-@retry(**RETRY)
 async def get_progress(user_id: int) -> dict:
     return await db_api_client.get_progress(user_id)
 
 
-@retry(**RETRY)
 async def clear_progress(user_id: int) -> None:
     await db_api_client.clear_progress(user_id)
 
 
-@retry(**RETRY)
 async def set_progress(user_id: int, step: int) -> None:
     await db_api_client.set_progress(user_id, step)
 
 
-@retry(**RETRY)
 async def set_basic(user_id: int, completed: bool) -> None:
     await db_api_client.set_basic(user_id, completed)
 
 
-@retry(**RETRY)
 async def set_advanced(user_id: int, completed: bool) -> None:
     await db_api_client.set_advanced(user_id, completed)
 
@@ -146,8 +213,7 @@ def _is_http_404(exc: Exception) -> bool:
         and getattr(exc.response, "status_code", None) == 404
     )
 
-@retry(**RETRY)
-async def get_user_subscriptions(user_id: int) -> dict:
+async def _load_user_subscriptions(user_id: int) -> dict:
     func = "get_user_subscriptions"
     try:
         data = await db_api_client.get_user_subscriptions(user_id)
@@ -160,24 +226,33 @@ async def get_user_subscriptions(user_id: int) -> dict:
         raise
 
 
-@retry(**RETRY)
+async def get_user_subscriptions(user_id: int) -> dict:
+    return await subscriptions_cache.get_or_load(user_id, lambda: _load_user_subscriptions(user_id))
+
+
+def _cache_subscriptions(user_id: int, data: object) -> None:
+    """Ответ записи — актуальная запись подписок; непонятный ответ — просто сбрасываем кеш."""
+    if isinstance(data, dict) and data:
+        subscriptions_cache.put(user_id, data)
+    else:
+        subscriptions_cache.invalidate(user_id)
+
+
 async def ensure_user_subscriptions_defaults(user_id: int) -> dict:
     func = "ensure_user_subscriptions_defaults"
-    data = await db_api_client.put_user_subscriptions(
-        user_id=user_id,
-        news_enabled=DEFAULT_SUBS["news_enabled"],
-        meetings_enabled=DEFAULT_SUBS["meetings_enabled"],
-        important_enabled=DEFAULT_SUBS["important_enabled"],
-    )
+    subscriptions_cache.invalidate(user_id)
+    data = await write_batcher.submit("subscriptions", user_id, {"user_id": user_id, **DEFAULT_SUBS})
+    _cache_subscriptions(user_id, data)
     log.info(f"[{func}] – user_id={user_id} – OK", extra={"user_id": user_id})
     return data
 
 
-@retry(**RETRY)
 async def toggle_user_subscription(user_id: int, kind: str) -> dict:
     func = "toggle_user_subscription"
+    subscriptions_cache.invalidate(user_id)
     try:
         data = await db_api_client.toggle_user_subscription(user_id, kind)
+        _cache_subscriptions(user_id, data)
         log.info(f"[{func}] – user_id={user_id} – kind={kind} – OK", extra={"user_id": user_id})
         return data
     except HTTPStatusError as exc:
@@ -185,12 +260,18 @@ async def toggle_user_subscription(user_id: int, kind: str) -> dict:
             log.info(f"[{func}] – user_id={user_id} – 404 toggle ⇒ PUT defaults & retry", extra={"user_id": user_id})
             await ensure_user_subscriptions_defaults(user_id)
             data2 = await db_api_client.toggle_user_subscription(user_id, kind)
+            _cache_subscriptions(user_id, data2)
             log.info(f"[{func}] – user_id={user_id} – kind={kind} – OK(after create)", extra={"user_id": user_id})
             return data2
         raise
 
 
 # Новая: удаление подписок пользователя (используется при блокировке бота)
-@retry(**RETRY)
 async def delete_user_subscriptions(user_id: int) -> None:
-    await db_api_client.delete_user_subscriptions(user_id)
+    subscriptions_cache.invalidate(user_id)
+    await write_batcher.submit("subscriptions_delete", user_id, {"user_id": user_id})
+
+
+def storage_cache_stats() -> dict:
+    """Счётчики кешей storage (hits/misses/hit_rate/...) — для логов и диагностики."""
+    return cache_stats()
@@ -0,0 +1,84 @@
+# tests/conftest.py
+# Общие фикстуры: окружение для config.py, заглушки DB-API/Bot API на свободных портах.
+# Асинхронные сценарии гоняются через asyncio.run внутри обычных тестов (без pytest-asyncio).
+
+from __future__ import annotations
+
+import os
+import socket
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# config.py читает окружение при импорте — задаём до первого импорта модулей бота
+os.environ.setdefault("BOT_TOKEN", "123:abc")
+os.environ.setdefault("ERROR_LOG_CHANNEL_ID", "-1")
+os.environ.setdefault("LOG_CHANNEL_ID", "-2")
+os.environ.setdefault("API_KEY_VALUE", "test")
+os.environ.setdefault("ID_ADMIN_USER", "")
+os.environ.setdefault("STATE_DIR", tempfile.mkdtemp(prefix="bot_state_"))
+# повторы DB-API без долгих пауз
+os.environ.setdefault("HTTP_BACKOFF_MIN", "0.01")
+os.environ.setdefault("HTTP_BACKOFF_MAX", "0.02")
+
+import pytest  # noqa: E402
+
+import Mailing.services.broadcasts  # noqa: E402,F401  (до local_scheduler: порядок импорта пакета)
+from common.db_api import DBApiClient  # noqa: E402
+from tools.fake_bot_api import FakeBotApi  # noqa: E402
+from tools.fake_db_api import FakeDbApi  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@asynccontextmanager
+async def _fake_db(**kwargs) -> AsyncIterator[Tuple[FakeDbApi, DBApiClient]]:
+    fake = FakeDbApi(**kwargs)
+    port = free_port()
+    runner = await fake.start(port=port)
+    client = DBApiClient(api_url=f"http://127.0.0.1:{port}")
+    try:
+        yield fake, client
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+@asynccontextmanager
+async def _fake_bot(**kwargs) -> AsyncIterator[Tuple[FakeBotApi, str]]:
+    fake = FakeBotApi(**kwargs)
+    port = free_port()
+    runner = await fake.start(port=port)
+    try:
+        yield fake, f"http://127.0.0.1:{port}"
+    finally:
+        await runner.cleanup()
+
+
+@pytest.fixture
+def fake_db():
+    """async with fake_db(**FakeDbApi kwargs) as (fake, client) — заглушка DB-API и клиент к ней."""
+    return _fake_db
+
+
+@pytest.fixture
+def fake_bot():
+    """async with fake_bot(**FakeBotApi kwargs) as (fake, base_url) — заглушка Bot API."""
+    return _fake_bot
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    import config
+
+    monkeypatch.setattr(config, "STATE_DIR", str(tmp_path))
+    return tmp_path
@@ -0,0 +1,91 @@
+# tests/test_audience.py
+# Постраничный резолв аудитории: бэк без offset и ошибка посреди потока не должны молча обрезать аудиторию.
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from Mailing.services import audience
+from Mailing.services.audience import AudienceError, iter_audience
+from tools.fake_db_api import FakeDbApi
+
+
+async def _noop_report(*_args, **_kwargs) -> None:
+    return None
+
+
+@pytest.fixture(autouse=True)
+def _no_telegram_reports(monkeypatch):
+    monkeypatch.setattr(audience, "log_and_report", _noop_report)
+
+
+async def _collect(target, page_size):
+    out = []
+    async for chunk in iter_audience(target, page_size=page_size):
+        out.extend(chunk)
+    return out
+
+
+def test_pages_until_short_page(fake_db, monkeypatch):
+    async def main():
+        async with fake_db(bot_id=1) as (fake, client):
+            monkeypatch.setattr(audience, "db_api_client", client)
+            ids = await _collect({"type": "ids", "user_ids": list(range(1, 26))}, page_size=10)
+            assert ids == list(range(1, 26))
+            assert fake.stats["POST /audiences/resolve"] == 3
+
+    asyncio.run(main())
+
+
+def test_backend_ignoring_offset_falls_back_to_unpaged(fake_db, monkeypatch):
+    async def ignore_offset(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        ids = self._resolve(data.get("target") or {})
+        limit = data.get("limit")
+        return web.json_response({"ids": ids if limit is None else ids[:int(limit)]})
+
+    monkeypatch.setattr(FakeDbApi, "audience_resolve", ignore_offset)
+
+    async def main():
+        async with fake_db(bot_id=1) as (fake, client):
+            monkeypatch.setattr(audience, "db_api_client", client)
+            ids = await _collect({"type": "ids", "user_ids": list(range(1, 26))}, page_size=10)
+            assert sorted(ids) == list(range(1, 26))
+            assert len(ids) == len(set(ids))
+
+    asyncio.run(main())
+
+
+def test_failure_mid_stream_raises(fake_db, monkeypatch):
+    async def fail_second_page(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        if int(data.get("offset") or 0) > 0:
+            return web.json_response({"detail": "boom"}, status=503)
+        ids = self._resolve(data.get("target") or {})
+        return web.json_response({"ids": ids[:int(data["limit"])]})
+
+    monkeypatch.setattr(FakeDbApi, "audience_resolve", fail_second_page)
+
+    async def main():
+        async with fake_db(bot_id=1) as (_fake, client):
+            monkeypatch.setattr(audience, "db_api_client", client)
+            got = []
+            with pytest.raises(AudienceError):
+                async for chunk in iter_audience({"type": "ids", "user_ids": list(range(1, 26))}, page_size=10):
+                    got.extend(chunk)
+            assert got == list(range(1, 11))
+
+    asyncio.run(main())
+
+
+def test_failure_on_first_page_raises(fake_db, monkeypatch):
+    async def main():
+        async with fake_db(bot_id=1, error_rate=1.0, error_routes=("/audiences",)) as (_fake, client):
+            monkeypatch.setattr(audience, "db_api_client", client)
+            with pytest.raises(AudienceError):
+                await _collect({"type": "ids", "user_ids": [1, 2, 3]}, page_size=10)
+
+    asyncio.run(main())
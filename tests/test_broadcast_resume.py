@@ -0,0 +1,121 @@
+# tests/test_broadcast_resume.py
+# Resume рассылки: пропускаются только доставленные в текущем (прерванном) запуске, не в прошлых запусках cron.
+
+import asyncio
+import json
+import os
+from datetime import timedelta
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+import config
+import Mailing.services.broadcasts.service as service
+from Mailing.services import audience
+from common.utils.time_msk import now_msk_naive
+
+USERS = list(range(1, 7))
+
+
+def _ts(minutes_ago: float) -> str:
+    return (now_msk_naive() - timedelta(minutes=minutes_ago)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+@pytest.fixture(autouse=True)
+def _fast_send(monkeypatch, state_dir):
+    monkeypatch.setattr(config, "BROADCAST_RATE_PER_SEC", 1000)
+    monkeypatch.setattr(config, "BROADCAST_RATE_MAX", 1000.0)
+    monkeypatch.setattr(config, "ID_ADMIN_USER", set())
+
+
+async def _resume(fake_db, fake_bot, monkeypatch, *, schedule, deliveries, run_started=None):
+    """Прогоняет send_broadcast(resume=True); возвращает (число отправленных сообщений, заглушка DB-API)."""
+    if run_started is not None:
+        path = service._run_path(1)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"started_at": run_started}, f)
+
+    async with fake_db() as (fake, client), fake_bot(latency=0.0) as (bot_api, base_url):
+        monkeypatch.setattr(service, "db_api_client", client)
+        monkeypatch.setattr(audience, "db_api_client", client)
+        broadcast = {"id": 1, "title": "t", "status": "sending", "enabled": True,
+                     "schedule": schedule, "content": {"text": "hi"}}
+        fake.broadcasts[1] = dict(broadcast)
+        fake.targets[1] = {"type": "ids", "user_ids": USERS}
+        fake.deliveries[1] = {
+            uid: {"user_id": uid, "status": "sent", "attempts": 1, "sent_at": sent_at}
+            for uid, sent_at in deliveries.items()
+        }
+        bot = Bot(token="123:abc", session=AiohttpSession(api=TelegramAPIServer.from_base(base_url)))
+        try:
+            await service.send_broadcast(bot, broadcast, resume=True)
+        finally:
+            await bot.session.close()
+        return bot_api.stats["sendmessage"], fake
+
+
+def test_cron_resume_skips_only_current_run(fake_db, fake_bot, monkeypatch):
+    # прошлый запуск (вчера) доставил всем; текущий начался 10 минут назад и успел 1 и 2
+    deliveries = {uid: _ts(24 * 60) for uid in USERS}
+    deliveries.update({1: _ts(5), 2: _ts(5)})
+
+    async def scenario():
+        sent, fake = await _resume(
+            fake_db, fake_bot, monkeypatch, schedule="0 9 * * *", deliveries=deliveries, run_started=_ts(10),
+        )
+        assert sent == 4
+        assert all(row["status"] == "sent" for row in fake.deliveries[1].values())
+        assert service._load_run_start(1) is None  # запуск завершён — отметка снята
+
+    asyncio.run(scenario())
+
+
+def test_cron_resume_without_run_marker_skips_nothing_from_db(fake_db, fake_bot, monkeypatch):
+    async def scenario():
+        sent, _ = await _resume(
+            fake_db, fake_bot, monkeypatch, schedule="0 9 * * *", deliveries={uid: _ts(24 * 60) for uid in USERS},
+        )
+        assert sent == len(USERS)
+
+    asyncio.run(scenario())
+
+
+def test_oneoff_resume_without_run_marker_skips_all_sent(fake_db, fake_bot, monkeypatch):
+    async def scenario():
+        sent, _ = await _resume(
+            fake_db, fake_bot, monkeypatch, schedule="01.01.2020 10:00", deliveries={1: _ts(5), 2: _ts(5)},
+        )
+        assert sent == len(USERS) - 2
+
+    asyncio.run(scenario())
+
+
+def test_fresh_run_leaves_no_marker_behind(fake_db, fake_bot, monkeypatch):
+    async def scenario():
+        async with fake_db() as (fake, client), fake_bot(latency=0.0) as (bot_api, base_url):
+            monkeypatch.setattr(service, "db_api_client", client)
+            monkeypatch.setattr(audience, "db_api_client", client)
+            broadcast = {"id": 1, "title": "t", "schedule": "0 9 * * *", "content": {"text": "hi"}}
+            fake.broadcasts[1] = dict(broadcast)
+            fake.targets[1] = {"type": "ids", "user_ids": USERS}
+            started = {}
+            start_run = service._start_run
+
+            def spy(bid):
+                start_run(bid)
+                started["at"] = service._load_run_start(bid)
+
+            monkeypatch.setattr(service, "_start_run", spy)
+            bot = Bot(token="123:abc", session=AiohttpSession(api=TelegramAPIServer.from_base(base_url)))
+            try:
+                await service.send_broadcast(bot, broadcast)
+            finally:
+                await bot.session.close()
+            assert started["at"] is not None
+            assert service._load_run_start(1) is None
+            assert bot_api.stats["sendmessage"] == len(USERS)
+
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+# tests/test_db_api_transport.py
+# Транспорт DB-API: бюджет на вызов (обычный и пакетный), внешний дедлайн, автомат на эндпоинт.
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import config
+from common.db_api import CircuitOpenError, DeadlineExceeded, db_call_budget, db_deadline
+
+TARGET = {"type": "ids", "user_ids": [1, 2, 3]}
+
+
+@pytest.fixture
+def tight_budget(monkeypatch):
+    monkeypatch.setattr(config, "DB_API_CALL_BUDGET", 0.2)
+    monkeypatch.setattr(config, "DB_API_BULK_BUDGET", 3.0)
+
+
+def test_bulk_endpoints_get_their_own_budget(fake_db, tight_budget):
+    async def scenario():
+        async with fake_db(latency=0.4) as (fake, client):
+            with pytest.raises(DeadlineExceeded):
+                await client.get_chats()
+            res = await client.audiences_resolve(TARGET)
+            assert res is not None
+            report = await client.deliveries_report(1, items=[{"user_id": 1, "status": "sent"}])
+            assert report["updated"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_call_budget_override_and_outer_deadline(fake_db, tight_budget):
+    async def scenario():
+        async with fake_db(latency=0.4) as (fake, client):
+            with db_call_budget(2.0):
+                assert await client.get_chats() is not None
+            # общий дедлайн обработчика сильнее пакетного бюджета
+            t0 = time.monotonic()
+            with db_deadline(0.2), pytest.raises(DeadlineExceeded):
+                await client.audiences_resolve(TARGET)
+            assert time.monotonic() - t0 < 0.35
+
+    asyncio.run(scenario())
+
+
+def test_breaker_opens_per_endpoint_and_recovers(fake_db, monkeypatch):
+    monkeypatch.setattr(config, "DB_API_BREAKER_FAILURES", 2)
+    monkeypatch.setattr(config, "DB_API_BREAKER_RESET", 0.1)
+
+    async def scenario():
+        async with fake_db(error_rate=1.0, error_routes=("/users",)) as (fake, client):
+            for uid in (1, 2):  # 500 не повторяется: две ошибки подряд — два вызова
+                with pytest.raises(httpx.HTTPStatusError):
+                    await client.get_user(uid)
+            assert client.breaker_stats()["GET /users/{id}"]["state"] == "open"
+
+            calls = fake.stats["GET /users/{user_id}"]
+            with pytest.raises(CircuitOpenError):
+                await client.get_user(4)
+            assert fake.stats["GET /users/{user_id}"] == calls  # быстрый отказ без запроса
+            assert await client.get_chats() is not None  # другой эндпоинт не затронут
+
+            fake.error_rate = 0.0
+            await client.upsert_user(3, "u3", None)
+            await asyncio.sleep(0.15)
+            assert (await client.get_user(3))["user_id"] == 3  # пробный запрос прошёл — автомат замкнут
+            assert client.breaker_stats()["GET /users/{id}"]["state"] == "closed"
+
+    asyncio.run(scenario())
@@ -0,0 +1,121 @@
+# tests/test_invite_gc.py
+# Сборщик инвайтов: мёртвое назначение не держит остальных и не превращает скан в опрос раз в секунду.
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from aiogram.exceptions import TelegramBadRequest
+
+import storage
+from Hallway.services.invite_gc import InviteLinkGC
+from tools.fake_db_api import FakeDbApi
+
+DEAD_CHAT, LIVE_CHAT = -100, -200
+SCAN = "GET /invite_links/expired"
+
+
+class _Bot:
+    def __init__(self) -> None:
+        self.calls = []
+
+    async def revoke_chat_invite_link(self, chat_id: int, invite_link: str) -> None:
+        self.calls.append((chat_id, invite_link))
+        if chat_id == DEAD_CHAT:
+            raise TelegramBadRequest(method=None, message="Bad Request: not enough rights")
+
+
+def _expired(minutes_ago: float) -> str:
+    return (datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)).isoformat()
+
+
+def _seed(fake, chat_id: int, users, minutes_ago: float) -> None:
+    for i, uid in enumerate(users):
+        fake.invite_links.setdefault(uid, {})[chat_id] = {
+            "user_id": uid, "chat_id": chat_id, "invite_link": f"https://t.me/+{chat_id}_{uid}",
+            "created_at": None, "expires_at": _expired(minutes_ago - i * 0.01),
+        }
+
+
+async def _wait_for(predicate, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "не дождались"
+        await asyncio.sleep(0.02)
+
+
+def _live_left(fake) -> int:
+    return sum(1 for rows in fake.invite_links.values() if LIVE_CHAT in rows)
+
+
+def test_dead_chat_does_not_block_newer_links(fake_db, monkeypatch):
+    async def scenario():
+        async with fake_db() as (fake, client):
+            monkeypatch.setattr(storage, "db_api_client", client)
+            # самые старые истёкшие — целиком у чата, где бот потерял права: они заполняют первую страницу
+            _seed(fake, DEAD_CHAT, range(1, 31), minutes_ago=120)
+            _seed(fake, LIVE_CHAT, range(101, 106), minutes_ago=60)
+
+            gc = InviteLinkGC(interval=100, batch_size=2, rate=1000, grace=0, cooldown=100, max_attempts=2)
+            bot = _Bot()
+            gc.start(bot)
+            try:
+                await _wait_for(lambda: _live_left(fake) == 0)
+                scans = fake.stats[SCAN]
+                await asyncio.sleep(1.5)
+                # пока чат отдыхает — ни повторных сканов раз в секунду, ни новых попыток отзыва
+                assert fake.stats[SCAN] == scans
+                dead_calls = [c for c in bot.calls if c[0] == DEAD_CHAT]
+                assert len(dead_calls) <= 2
+                assert gc.stats()["chats"][str(DEAD_CHAT)].get("cooling")
+            finally:
+                await gc.close()
+
+    asyncio.run(scenario())
+
+
+def test_full_page_rescanned_only_after_queue_drains(fake_db, monkeypatch):
+    async def scenario():
+        async with fake_db() as (fake, client):
+            monkeypatch.setattr(storage, "db_api_client", client)
+            _seed(fake, LIVE_CHAT, range(1, 46), minutes_ago=60)  # 45 ссылок, страница — 20
+
+            gc = InviteLinkGC(interval=100, batch_size=2, rate=1000, grace=0)
+            bot = _Bot()
+            gc.start(bot)
+            try:
+                await _wait_for(lambda: _live_left(fake) == 0)
+                await asyncio.sleep(0.2)
+                # три страницы (20 + 20 + 5), а не скан после каждой пачки из двух ссылок
+                assert fake.stats[SCAN] == 3
+                assert len(bot.calls) == 45
+            finally:
+                await gc.close()
+
+    asyncio.run(scenario())
+
+
+def test_backend_ignoring_offset_does_not_spin(fake_db, monkeypatch):
+    expired = FakeDbApi.expired_invite_links
+
+    async def first_page_only(self, request):
+        query = {k: v for k, v in request.query.items() if k != "offset"}
+        return await expired(self, request.clone(rel_url=request.rel_url.with_query(query)))
+
+    monkeypatch.setattr(FakeDbApi, "expired_invite_links", first_page_only)
+
+    async def scenario():
+        async with fake_db() as (fake, client):
+            monkeypatch.setattr(storage, "db_api_client", client)
+            _seed(fake, DEAD_CHAT, range(1, 31), minutes_ago=120)
+
+            gc = InviteLinkGC(interval=100, batch_size=2, rate=1000, grace=0, cooldown=100)
+            gc.start(_Bot())
+            try:
+                await asyncio.sleep(1.5)
+                assert fake.stats[SCAN] <= 3
+                assert not gc._scan_more
+            finally:
+                await gc.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,203 @@
+# tests/test_local_scheduler.py
+# Планировщик рассылок: куча запусков (перепланирование/отмена/cron), догоняющие запуски после простоя.
+
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+import config
+import Mailing.services.local_scheduler as ls
+import Mailing.services.schedule_index as schedule_index
+from common.utils.time_msk import MSK
+from tools.fake_db_api import _now
+
+BOT = object()
+
+
+@pytest.fixture(autouse=True)
+def fresh_scheduler(monkeypatch, state_dir):
+    """Состояние планировщика — модульные глобалы: каждому тесту свои."""
+    for name, value in {
+        "_plans": {},
+        "_heap": [],
+        "_version": 0,
+        "_due": None,
+        "_wakeup": None,
+        "_loop_tasks": [],
+        "_running": set(),
+        "_stats": Counter(),
+        "_sync": ls._SyncState(),
+        "_synced": {},
+        "_dirty": set(),
+        "_fired_state": ls._FiredState(),
+        "_fired_lock": None,
+        "_catchup_armed": True,
+        "_catchup_queued": {},
+    }.items():
+        monkeypatch.setattr(ls, name, value)
+    monkeypatch.setattr(schedule_index, "_index", None)
+    monkeypatch.setattr(ls, "log_and_report", lambda *a, **kw: asyncio.sleep(0))
+    return state_dir
+
+
+def _row(bid: int, schedule: str) -> dict:
+    return {
+        "id": bid, "title": f"b{bid}", "kind": "text", "schedule": schedule, "enabled": True,
+        "status": "scheduled", "created_at": _now(), "updated_at": _now(),
+    }
+
+
+async def _wait_for(predicate, timeout: float = 3.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "не дождались"
+        await asyncio.sleep(0.01)
+
+
+def test_rescheduled_and_cancelled_plans_fire_once(fake_db, monkeypatch):
+    fired = []
+
+    async def try_send_now(bot, bid):
+        fired.append(bid)
+
+    monkeypatch.setattr(ls, "try_send_now", try_send_now)
+
+    async def scenario():
+        async with fake_db() as (fake, client):
+            monkeypatch.setattr(ls, "db_api_client", client)
+            fake.broadcasts.update({7: _row(7, ""), 8: _row(8, "")})
+            now = datetime.now(MSK)
+            ls.schedule_broadcast_send(BOT, 7, now + timedelta(seconds=0.4))
+            ls.schedule_broadcast_send(BOT, 7, now + timedelta(seconds=0.05))  # перепланирование раньше
+            ls.schedule_broadcast_send(BOT, 8, now + timedelta(seconds=0.05))
+            ls.cancel_broadcast_send(8)
+            await _wait_for(lambda: fired)
+            await asyncio.sleep(0.5)  # устаревшая запись кучи (0.4 с) не должна сработать
+            assert fired == [7]
+            assert not ls._plans
+
+    asyncio.run(scenario())
+
+
+def test_cron_plan_rearms_after_fire(fake_db, monkeypatch):
+    sent = []
+
+    async def send(bot, bid):
+        sent.append(bid)
+
+    monkeypatch.setattr(ls, "_send", send)
+
+    async def scenario():
+        async with fake_db() as (fake, client):
+            monkeypatch.setattr(ls, "db_api_client", client)
+            fake.broadcasts[9] = _row(9, "* * * * *")
+            start = datetime.now(MSK)
+            ls._plan(BOT, 9, start + timedelta(seconds=0.05), "* * * * *")
+            first = ls._plans[9]
+            await _wait_for(lambda: sent and ls._plans.get(9) not in (None, first))
+            plan = ls._plans[9]
+            assert sent == [9]
+            assert plan.next_dt > start and plan.next_dt.second == 0 and not plan.queued
+            assert ls._fired_state.fired[9] == pytest.approx(first.next_dt.timestamp())
+
+    asyncio.run(scenario())
+
+
+def test_failed_first_scan_does_not_queue_catchup_twice(fake_db, monkeypatch, fresh_scheduler):
+    monkeypatch.setattr(config, "BROADCAST_MISFIRE_POLICY", "all")
+    monkeypatch.setattr(config, "BROADCAST_MISFIRE_GRACE", 4 * 3600)
+    monkeypatch.setattr(config, "BROADCAST_SYNC_PAGE", 1)
+    # прошлый процесс работал до 3 часов назад: почасовые запуски с тех пор пропущены
+    with open(os.path.join(fresh_scheduler, "scheduler_state.json"), "w", encoding="utf-8") as f:
+        json.dump({"v": 1, "alive_at": time.time() - 3 * 3600 - 60, "fired": {}}, f)
+
+    sent = []
+
+    async def send(bot, bid):
+        sent.append(bid)
+
+    monkeypatch.setattr(ls, "_send", send)
+
+    async def scenario():
+        release = asyncio.Event()
+        load = ls._load_broadcast
+
+        async def held_load(bid):
+            await release.wait()  # догоняющие запуски ждут, пока пройдут обе синхронизации
+            return await load(bid)
+
+        monkeypatch.setattr(ls, "_load_broadcast", held_load)
+
+        async with fake_db() as (fake, client):
+            monkeypatch.setattr(ls, "db_api_client", client)
+            fake.broadcasts.update({1: _row(1, "0 * * * *"), 2: _row(2, "30 * * * *")})
+            expected = {bid: len(ls._missed_slots(fake.broadcasts[bid])) for bid in (1, 2)}
+            assert all(expected.values())
+
+            page = client.list_broadcasts_page
+            fail = {"on": True}
+
+            async def flaky_page(**kw):
+                if fail["on"] and kw.get("after_id"):
+                    raise RuntimeError("DB-API недоступен")
+                return await page(**kw)
+
+            monkeypatch.setattr(client, "list_broadcasts_page", flaky_page)
+
+            await ls.refresh_all(BOT)  # первая страница применена, вторая упала
+            assert ls._catchup_armed and set(ls._catchup_queued) == {1}
+
+            fail["on"] = False
+            await ls.refresh_all(BOT)
+            assert not ls._catchup_armed and set(ls._catchup_queued) == {1, 2}
+
+            release.set()
+            await _wait_for(lambda: not ls._catchup_queued)
+            await ls.refresh_all(BOT)
+            await asyncio.sleep(0.05)
+            assert Counter(sent) == expected
+            assert set(ls._plans) == {1, 2}
+
+    asyncio.run(scenario())
+
+
+def test_heap_compacts_stale_entries():
+    async def scenario():
+        later = datetime.now(MSK) + timedelta(hours=1)
+        for i in range(500):
+            ls._plan(BOT, 1, later + timedelta(seconds=i), "0 * * * *")
+        assert list(ls._plans) == [1]
+        assert len(ls._heap) <= 2 * len(ls._plans) + 64 + 1  # устаревшие перепланирования вычищены
+        assert any(version == ls._plans[1].version for _, version, _ in ls._heap)
+
+    asyncio.run(scenario())
+
+
+def test_loop_restart_requeues_live_plans(fake_db, monkeypatch):
+    fired = []
+
+    async def try_send_now(bot, bid):
+        fired.append(bid)
+
+    monkeypatch.setattr(ls, "try_send_now", try_send_now)
+
+    async def scenario():
+        async with fake_db() as (fake, client):
+            monkeypatch.setattr(ls, "db_api_client", client)
+            fake.broadcasts[7] = _row(7, "")
+            ls.schedule_broadcast_send(BOT, 7, datetime.now(MSK) + timedelta(seconds=0.2))
+            # петля упала: задачи сняты, очередь и куча потеряли смысл — план должен встать заново
+            for t in ls._loop_tasks:
+                t.cancel()
+            await asyncio.gather(*ls._loop_tasks, return_exceptions=True)
+            ls._ensure_loop()
+            await _wait_for(lambda: fired)
+            await asyncio.sleep(0.1)
+            assert fired == [7]
+
+    asyncio.run(scenario())
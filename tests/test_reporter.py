@@ -0,0 +1,106 @@
+# tests/test_reporter.py
+# Выгрузка репортов доставки: повтор временных ошибок, «ядовитый» батч, водяная метка спула.
+
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+
+import Mailing.services.broadcasts.service as service
+from common.utils.spool import JsonlSpool
+from Mailing.services.broadcasts.reporter import ReportUploader
+from tools.fake_db_api import FakeDbApi
+
+POISON_UID = 666
+
+
+def _item(uid: int) -> dict:
+    return {"user_id": uid, "status": "sent", "message_id": uid}
+
+
+@pytest.fixture
+def reject_poison(monkeypatch):
+    """Бэкенд отвечает 400 на любой батч с POISON_UID."""
+    report = FakeDbApi.deliveries_report
+
+    async def deliveries_report(self, request):
+        items = (await request.json()).get("items") or []
+        if any(it.get("user_id") == POISON_UID for it in items):
+            return web.json_response({"detail": "bad item"}, status=400)
+        return await report(self, request)
+
+    monkeypatch.setattr(FakeDbApi, "deliveries_report", deliveries_report)
+
+
+@pytest.mark.parametrize("status, retried", [(400, False), (409, False), (408, True), (429, True), (503, True)])
+def test_report_retries_only_transient_errors(fake_db, monkeypatch, state_dir, status, retried):
+    async def deliveries_report(self, request):
+        return web.json_response({"detail": "nope"}, status=status)
+
+    monkeypatch.setattr(FakeDbApi, "deliveries_report", deliveries_report)
+
+    async def scenario():
+        async with fake_db() as (fake, client):
+            monkeypatch.setattr(service, "db_api_client", client)
+            ok = await service._try_report(1, [_item(10)])
+            assert ok is not retried
+            rejected = state_dir / "broadcasts" / "deliveries_1.rejected.jsonl"
+            assert rejected.exists() is not retried
+
+    asyncio.run(scenario())
+
+
+def test_poison_batch_is_dead_lettered_and_spool_acked(fake_db, monkeypatch, state_dir, reject_poison):
+    async def scenario():
+        async with fake_db() as (fake, client):
+            monkeypatch.setattr(service, "db_api_client", client)
+            spool = JsonlSpool(state_dir / "spool.jsonl")
+            uploader = ReportUploader(
+                lambda items: service._try_report(1, items),
+                spool=spool, min_batch=2, max_batch=2, linger=0.01,
+            ).start()
+            for uid in (1, POISON_UID, 3, 4):
+                await uploader.submit(_item(uid))
+            await asyncio.wait_for(uploader.close(), timeout=5)
+
+            assert uploader.failures == 0
+            assert not spool.has_unacked  # водяная метка прошла мимо отвергнутого батча
+            assert set(fake.deliveries[1]) == {3, 4}
+            lines = (state_dir / "broadcasts" / "deliveries_1.rejected.jsonl").read_text("utf-8").splitlines()
+            assert sorted(json.loads(line)["item"]["user_id"] for line in lines) == [1, POISON_UID]
+            spool.close()
+
+    asyncio.run(scenario())
+
+
+def test_watermark_holds_behind_failed_batch(fake_db, monkeypatch, state_dir):
+    calls = {"n": 0}
+    report = FakeDbApi.deliveries_report
+
+    async def flaky(self, request):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            return web.json_response({"detail": "unavailable"}, status=503)
+        return await report(self, request)
+
+    monkeypatch.setattr(FakeDbApi, "deliveries_report", flaky)
+
+    async def scenario():
+        async with fake_db() as (fake, client):
+            monkeypatch.setattr(service, "db_api_client", client)
+            spool = JsonlSpool(state_dir / "spool.jsonl")
+            uploader = ReportUploader(
+                lambda items: service._try_report(1, items),
+                spool=spool, min_batch=2, max_batch=2, linger=0.01,
+            ).start()
+            for uid in (1, 2):
+                await uploader.submit(_item(uid))
+            await asyncio.sleep(0.2)
+            assert uploader.failures == 1 and spool.acked == 0
+            await asyncio.wait_for(uploader.close(), timeout=5)
+            assert spool.acked == spool.last_seq == 2
+            assert set(fake.deliveries[1]) == {1, 2}
+            spool.close()
+
+    asyncio.run(scenario())
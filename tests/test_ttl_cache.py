@@ -0,0 +1,88 @@
+# tests/test_ttl_cache.py
+# TTL-кеш: сброс/запись во время загрузки (по ключу), write-through апсёрта пользователя в storage.
+
+import asyncio
+
+import storage
+from common.utils.ttl_cache import TTLCache
+
+
+def _gated_loader(gate: asyncio.Event, value, calls: list):
+    async def load():
+        calls.append(value)
+        await gate.wait()
+        return value
+    return load
+
+
+def test_invalidate_other_key_keeps_inflight_load():
+    async def scenario():
+        cache = TTLCache("t_other_key")
+        gate, calls = asyncio.Event(), []
+        task = asyncio.create_task(cache.get_or_load("a", _gated_loader(gate, 1, calls)))
+        await asyncio.sleep(0)
+        cache.invalidate("b")
+        cache.put("c", 3)
+        gate.set()
+        assert await task == 1
+        assert cache.get("a") == (True, 1)
+        assert calls == [1]
+
+    asyncio.run(scenario())
+
+
+def test_invalidate_or_put_same_key_drops_inflight_result():
+    async def scenario():
+        cache = TTLCache("t_same_key")
+        gate, calls = asyncio.Event(), []
+        task = asyncio.create_task(cache.get_or_load("a", _gated_loader(gate, "stale", calls)))
+        await asyncio.sleep(0)
+        cache.invalidate("a")
+        gate.set()
+        assert await task == "stale"
+        assert cache.get("a") == (False, None)
+
+        gate = asyncio.Event()
+        task = asyncio.create_task(cache.get_or_load("a", _gated_loader(gate, "stale", calls)))
+        await asyncio.sleep(0)
+        cache.put("a", "fresh")
+        gate.set()
+        await task
+        assert cache.get("a") == (True, "fresh")
+
+    asyncio.run(scenario())
+
+
+def test_failed_load_is_not_cached():
+    async def scenario():
+        cache = TTLCache("t_failed")
+
+        async def boom():
+            raise RuntimeError("db down")
+
+        try:
+            await cache.get_or_load("a", boom)
+        except RuntimeError:
+            pass
+        assert await cache.get_or_load("a", lambda: asyncio.sleep(0, result=2)) == 2
+        assert cache.get("a") == (True, 2)
+
+    asyncio.run(scenario())
+
+
+def test_add_user_invalidates_cached_user(fake_db, monkeypatch):
+    async def scenario():
+        async with fake_db() as (fake, client):
+            monkeypatch.setattr(storage, "db_api_client", client)
+            await storage.add_user(5, "old", None)
+            assert (await storage.get_user(5))["username"] == "old"
+
+            fut = storage.queue_add_user(5, "new", None)
+            assert storage.users_cache.get(5) == (False, None)
+            await fut
+            assert (await storage.get_user(5))["username"] == "new"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        storage.users_cache.clear()
@@ -0,0 +1,96 @@
+# tests/test_write_batcher.py
+# Пакетная запись через заглушку DB-API: пакетные маршруты, бэк без них, порядок волн по key.
+
+import asyncio
+
+from aiohttp import web
+
+from common.utils.write_batcher import WriteBatcher
+from tools.fake_db_api import FakeDbApi
+
+
+def _batcher(client) -> WriteBatcher:
+    b = WriteBatcher(window=0.02, max_batch=50)
+    b.register(
+        "user_upsert",
+        single=lambda p: client.upsert_user(p["user_id"], p["username"], p["full_name"]),
+        bulk=client.bulk_upsert_users,
+    )
+    b.register(
+        "user_update",
+        single=lambda p: client.update_user(p["user_id"], {k: v for k, v in p.items() if k != "user_id"}),
+        bulk=client.bulk_update_users,
+    )
+    return b
+
+
+async def _upsert_many(b: WriteBatcher, n: int):
+    futs = [
+        b.submit("user_upsert", uid, {"user_id": uid, "username": f"u{uid}", "full_name": None})
+        for uid in range(1, n + 1)
+    ]
+    return await asyncio.gather(*futs)
+
+
+def test_bulk_route_used(fake_db):
+    async def scenario():
+        async with fake_db() as (fake, client):
+            b = _batcher(client)
+            rows = await _upsert_many(b, 5)
+            assert [r["user_id"] for r in rows] == [1, 2, 3, 4, 5]
+            assert fake.stats["PUT /bulk/users/upsert"] == 1
+            assert fake.stats["PUT /users/{user_id}/upsert"] == 0
+            assert b.stats()["no_bulk"] == []
+
+    asyncio.run(scenario())
+
+
+def test_missing_bulk_route_falls_back_to_single(fake_db):
+    async def scenario():
+        async with fake_db(bulk=False) as (fake, client):
+            b = _batcher(client)
+            rows = await _upsert_many(b, 5)
+            assert [r["username"] for r in rows] == [f"u{i}" for i in range(1, 6)]
+            assert set(fake.users) == {1, 2, 3, 4, 5}
+            assert fake.stats["PUT /users/{user_id}/upsert"] == 5
+            assert b.stats()["no_bulk"] == ["user_upsert"]
+
+            # вид запомнен как «без пакетов» — второй раз пакетный маршрут не пробуем
+            await _upsert_many(b, 3)
+            assert fake.stats["PUT /bulk/users/upsert"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_bulk_path_swallowed_by_param_route_422_falls_back(fake_db, monkeypatch):
+    # бэк, у которого пакетный путь попадает в маршрут с {user_id} и не проходит валидацию
+    async def validation_error(self, request, apply):
+        return web.json_response({"detail": [{"loc": ["path", "user_id"], "type": "int_parsing"}]}, status=422)
+
+    monkeypatch.setattr(FakeDbApi, "_bulk", validation_error)
+
+    async def scenario():
+        async with fake_db() as (fake, client):
+            b = _batcher(client)
+            rows = await _upsert_many(b, 4)
+            assert all(r is not None for r in rows)
+            assert set(fake.users) == {1, 2, 3, 4}
+            assert b.stats()["no_bulk"] == ["user_upsert"]
+
+    asyncio.run(scenario())
+
+
+def test_waves_keep_per_key_order_with_bulk_fallback(fake_db):
+    async def scenario():
+        async with fake_db(bulk=False) as (fake, client):
+            b = _batcher(client)
+            futs = []
+            for uid in (1, 2):
+                futs.append(b.submit("user_upsert", uid, {"user_id": uid, "username": "old", "full_name": None}))
+                futs.append(b.submit("user_update", uid, {"user_id": uid, "username": "new"}))
+            results = await asyncio.gather(*futs, return_exceptions=True)
+            # update без предшествующего upsert дал бы 404 — волны держат порядок внутри user_id
+            assert not [r for r in results if isinstance(r, BaseException)]
+            assert fake.users[1]["username"] == fake.users[2]["username"] == "new"
+
+    asyncio.run(scenario())
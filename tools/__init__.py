@@ -0,0 +1,2 @@
+# tools/__init__.py
+# Утилиты разработчика (бенчмарки, заглушки API) — в боевом запуске не используются.
@@ -0,0 +1,334 @@
+# tools/bench_broadcast.py
+# Нагрузочный замер рассылки без настоящего Telegram и без DB-API:
+# бот ходит в локальную заглушку Bot API (tools.fake_bot_api), db_api_client подменён данными в памяти
+# (или, с --db fake, ходит по HTTP в tools.fake_db_api).
+# Меряем: получателей/с, p50/p99 задержки одного запроса к Bot API, пик памяти процесса (ru_maxrss).
+#
+# Запуск из корня репозитория (нужны переменные окружения config.py, подойдут любые значения):
+#   python -m tools.bench_broadcast --n 10000 [--entry try_send_now] [--rate 1000] [--concurrency 64]
+#   python -m tools.bench_broadcast --suite            # 1k / 10k / 100k, каждый прогон — отдельный процесс
+#   python -m tools.bench_broadcast --suite --forbidden-rate 0.05 --retry-after-rate 0.001
+#   python -m tools.bench_broadcast --n 10000 --db fake --db-latency 0.01 --db-error-rate 0.01
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+SUITE_SIZES = (1_000, 10_000, 100_000)
+_FAKE_BOT_ID = 100500  # id из getMe в tools.fake_bot_api
+
+
+# ---------- заглушка Bot API в отдельном процессе ----------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _spawn_server(module: str, extra: List[str]) -> "tuple[subprocess.Popen, str]":
+    """Запускает заглушку (python -m module --port P ...) и ждёт, пока она начнёт принимать соединения."""
+    port = _free_port()
+    cmd = [sys.executable, "-m", module, "--port", str(port), *extra]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{module} не запустился")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc, base
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{module} не ответил за 60 с")
+
+
+def _start_fake_api(args: argparse.Namespace) -> "tuple[subprocess.Popen, str]":
+    return _spawn_server("tools.fake_bot_api", [
+        "--latency", str(args.latency),
+        "--jitter", str(args.jitter),
+        "--retry-after-rate", str(args.retry_after_rate),
+        "--retry-after", str(args.retry_after),
+        "--forbidden-rate", str(args.forbidden_rate),
+    ])
+
+
+def _start_fake_db(args: argparse.Namespace) -> "tuple[subprocess.Popen, str]":
+    # аудитория — участники «чата бота» (id бота из getMe заглушки Bot API)
+    return _spawn_server("tools.fake_db_api", [
+        "--latency", str(args.db_latency),
+        "--error-rate", str(args.db_error_rate),
+        "--bot-id", str(_FAKE_BOT_ID),
+        "--seed-users", str(args.n),
+    ])
+
+
+# ---------- DB-API в памяти ----------
+
+class _MemoryDb:
+    """Минимум db_api_client, который трогает рассылка: аудитория 1..n, репорты считаются, не хранятся."""
+
+    def __init__(self, broadcast: Dict[str, Any], n: int, latency: float) -> None:
+        self.broadcast = broadcast
+        self.n = n
+        self.latency = latency
+        self.statuses: Counter = Counter()
+        self.calls: Counter = Counter()
+
+    async def _io(self, name: str) -> None:
+        self.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get_broadcast(self, broadcast_id: int) -> Dict[str, Any]:
+        await self._io("get_broadcast")
+        return dict(self.broadcast)
+
+    async def update_broadcast(self, broadcast_id: int, **fields: Any) -> Dict[str, Any]:
+        await self._io("update_broadcast")
+        self.broadcast.update({k: v for k, v in fields.items() if v is not None})
+        return dict(self.broadcast)
+
+    async def get_broadcast_target(self, broadcast_id: int) -> Dict[str, Any]:
+        await self._io("get_broadcast_target")
+        return {"type": "sql", "sql": "SELECT user_id FROM bench"}
+
+    async def audiences_resolve(self, target_payload: Dict[str, Any], limit: Optional[int] = None,
+                                offset: Optional[int] = None) -> Dict[str, Any]:
+        await self._io("audiences_resolve")
+        start = int(offset or 0)
+        stop = self.n if limit is None else min(self.n, start + int(limit))
+        return {"ids": list(range(start + 1, stop + 1))}
+
+    async def deliveries_materialize(self, broadcast_id: int, payload: Dict[str, Any]) -> Dict[str, Any]:
+        await self._io("deliveries_materialize")
+        ids = payload.get("ids") or []
+        return {"total": len(ids), "created": len(ids), "existed": 0}
+
+    async def deliveries_report(self, broadcast_id: int, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        await self._io("deliveries_report")
+        self.statuses.update(it.get("status") for it in items)
+        return {"updated": len(items)}
+
+    async def list_deliveries(self, broadcast_id: int, status: Optional[str] = None,
+                              limit: int = 200, offset: int = 0) -> List[Dict[str, Any]]:
+        await self._io("list_deliveries")
+        return []
+
+    async def remove_membership(self, user_id: int, chat_id: int) -> None:
+        await self._io("remove_membership")
+
+    async def delete_user_subscriptions(self, user_id: int) -> None:
+        await self._io("delete_user_subscriptions")
+
+    def install(self, client: Any) -> None:
+        for name in (
+            "get_broadcast", "update_broadcast", "get_broadcast_target", "audiences_resolve",
+            "deliveries_materialize", "deliveries_report", "list_deliveries",
+            "remove_membership", "delete_user_subscriptions",
+        ):
+            setattr(client, name, getattr(self, name))
+
+
+def _content(kind: str) -> List[Dict[str, Any]]:
+    text = (
+        "<b>Встреча клуба</b> в четверг в 19:00.\n"
+        "Регистрация по <a href=\"https://example.org/r\">ссылке</a>, количество мест ограничено."
+    )
+    if kind == "photo":
+        return [{"type": "media", "payload": {"kind": "photo", "file_id": "AgACAgIAAxkBAAIBENCH" * 3, "caption": text}}]
+    if kind == "album":
+        items = [{"type": "photo", "payload": {"file_id": f"AgACAgIAAxkBAAI{i:04d}" * 3}} for i in range(4)]
+        return [{"type": "album", "payload": {"items": items}}, {"type": "text", "payload": {"text": text}}]
+    return [{"type": "text", "payload": {"text": text}}]
+
+
+def _percentile(sorted_values: array, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[i]
+
+
+# ---------- один прогон ----------
+
+async def _run_once(args: argparse.Namespace, api_base: str) -> Dict[str, Any]:
+    import config
+
+    # всё состояние (спулы, индекс недоступных) — во временном каталоге
+    state_dir = tempfile.mkdtemp(prefix="bench_broadcast_")
+    config.STATE_DIR = state_dir
+    config.BROADCAST_RATE_PER_SEC = args.rate
+    config.BROADCAST_RATE_MAX = float(args.rate)
+    config.BROADCAST_CONCURRENCY = args.concurrency
+    config.ID_ADMIN_USER = set()
+
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    import common.utils.common as common_utils
+    from common.db_api_client import db_api_client
+    from Mailing.services.broadcasts.service import send_broadcast, try_send_now
+
+    latencies = array("d")
+
+    class TimedSession(AiohttpSession):
+        async def make_request(self, bot, method, timeout=None):  # type: ignore[override]
+            t0 = time.perf_counter()
+            try:
+                return await super().make_request(bot, method, timeout)
+            finally:
+                latencies.append(time.perf_counter() - t0)
+
+    session = TimedSession(api=TelegramAPIServer.from_base(api_base))
+    session._connector_init["limit"] = max(100, args.concurrency)  # в aiogram 3.1 отдельного параметра нет
+    bot = Bot(token="123456:bench", session=session, parse_mode="HTML")
+    common_utils._bot = bot  # log_and_report тоже уходит в заглушку, а не в Telegram
+
+    content = {"media_items": _content(args.content)}
+    db_proc: Optional[subprocess.Popen] = None
+    db: Optional[_MemoryDb] = None
+    reported: Dict[str, Any] = {}
+    try:
+        if args.db == "fake":
+            # настоящий HTTP-клиент db_api_client против tools.fake_db_api
+            db_proc, db_base = _start_fake_db(args)
+            db_api_client.client.base_url = db_base
+            config.BOT_ID = _FAKE_BOT_ID
+            broadcast = await db_api_client.create_broadcast(kind="news", title="bench", content=content)
+            await db_api_client.put_broadcast_target(broadcast["id"], {"type": "kind", "kind": "news"})
+        else:
+            broadcast = {"id": 1, "title": "bench", "status": "draft", "content": content}
+            db = _MemoryDb(broadcast, args.n, args.db_latency)
+            db.install(db_api_client)
+
+        t0 = time.perf_counter()
+        if args.entry == "try_send_now":
+            res = await try_send_now(bot, broadcast["id"])
+            sent, failed = res if res else (0, 0)
+        else:
+            sent, failed = await send_broadcast(bot, broadcast)
+        wall = time.perf_counter() - t0
+
+        if db is not None:
+            reported = dict(db.statuses)
+        else:
+            r = await db_api_client.client.get("/_fake/stats")
+            reported = r.json()["deliveries"].get(str(broadcast["id"]), {})
+    finally:
+        await bot.session.close()
+        shutil.rmtree(state_dir, ignore_errors=True)
+        if db_proc is not None:
+            db_proc.terminate()
+            db_proc.wait(timeout=5)
+
+    lat = array("d", sorted(latencies))
+    return {
+        "entry": args.entry,
+        "n": args.n,
+        "content": args.content,
+        "sent": sent,
+        "failed": failed,
+        "reported": reported,
+        "wall_s": round(wall, 3),
+        "recipients_per_s": round(args.n / wall, 1) if wall else 0.0,
+        "requests": len(lat),
+        "p50_ms": round(_percentile(lat, 0.50) * 1000, 2),
+        "p99_ms": round(_percentile(lat, 0.99) * 1000, 2),
+        # ru_maxrss в Linux — КиБ
+        "maxrss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def _print_result(r: Dict[str, Any]) -> None:
+    print(
+        f"{r['entry']:<14} n={r['n']:<7} {r['content']:<6} "
+        f"{r['recipients_per_s']:>9.1f} получ./с  p50={r['p50_ms']:>7.2f} мс  p99={r['p99_ms']:>7.2f} мс  "
+        f"RSS пик={r['maxrss_mb']:>7.1f} МБ  sent={r['sent']} failed={r['failed']} за {r['wall_s']} с"
+    )
+
+
+def _child_args(args: argparse.Namespace, n: int, api_base: str) -> List[str]:
+    return [
+        sys.executable, "-m", "tools.bench_broadcast", "--json",
+        "--n", str(n), "--entry", args.entry, "--content", args.content,
+        "--rate", str(args.rate), "--concurrency", str(args.concurrency),
+        "--db", args.db, "--db-latency", str(args.db_latency), "--db-error-rate", str(args.db_error_rate),
+        "--api", api_base,
+    ]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Пропускная способность рассылки на заглушке Bot API")
+    ap.add_argument("--n", type=int, default=1000, help="число получателей")
+    ap.add_argument("--suite", action="store_true", help="прогоны на 1k/10k/100k (каждый в своём процессе)")
+    ap.add_argument("--entry", choices=("send_broadcast", "try_send_now"), default="send_broadcast")
+    ap.add_argument("--content", choices=("text", "photo", "album"), default="text")
+    ap.add_argument("--rate", type=int, default=1000, help="лимит msg/с (BROADCAST_RATE_PER_SEC/MAX)")
+    ap.add_argument("--concurrency", type=int, default=64, help="BROADCAST_CONCURRENCY")
+    ap.add_argument("--db", choices=("memory", "fake"), default="memory",
+                    help="memory — db_api_client подменён в процессе; fake — HTTP к tools.fake_db_api")
+    ap.add_argument("--db-latency", type=float, default=0.0, help="задержка каждого вызова DB-API, сек")
+    ap.add_argument("--db-error-rate", type=float, default=0.0, help="доля ответов 500 от DB-API (только --db fake)")
+    ap.add_argument("--api", default=None, help="адрес уже запущенной заглушки Bot API")
+    ap.add_argument("--json", action="store_true", help="вывести результат одной строкой JSON")
+    # параметры заглушки (если --api не задан)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--jitter", type=float, default=0.01)
+    ap.add_argument("--retry-after-rate", type=float, default=0.0)
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--forbidden-rate", type=float, default=0.0)
+    args = ap.parse_args()
+    args.n = max(1, args.n)
+
+    import logging
+    logging.basicConfig(level=logging.ERROR)
+
+    proc: Optional[subprocess.Popen] = None
+    api_base = args.api
+    try:
+        if api_base is None:
+            proc, api_base = _start_fake_api(args)
+
+        if not args.suite:
+            result = asyncio.run(_run_once(args, api_base))
+            if args.json:
+                print(json.dumps(result, ensure_ascii=False))
+            else:
+                _print_result(result)
+            return
+
+        for n in SUITE_SIZES:
+            out = subprocess.run(_child_args(args, n, api_base), capture_output=True, text=True, env=os.environ.copy())
+            lines = [ln for ln in out.stdout.splitlines() if ln.startswith("{")]
+            if out.returncode != 0 or not lines:
+                print(f"n={n}: прогон упал (код {out.returncode})\n{out.stderr[-2000:]}")
+                continue
+            _print_result(json.loads(lines[-1]))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+if __name__ == "__main__":
+    main()
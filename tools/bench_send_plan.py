@@ -0,0 +1,91 @@
+# tools/bench_send_plan.py
+# Микробенчмарк: CPU на одного получателя — разбор контента на каждого (send_actual)
+# против скомпилированного плана (compile_plan один раз + send_plan). Сеть не используется:
+# бот подменён заглушкой, которая сразу возвращает готовый ответ.
+#
+# Запуск из корня репозитория (нужны переменные окружения config.py, подойдут любые значения):
+#   python -m tools.bench_send_plan [--n 5000] [--album 10]
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List
+
+from aiogram import Bot
+from aiogram.methods import SendMediaGroup, TelegramMethod
+from aiogram.types import Message
+
+from Mailing.services.broadcasts.sender import compile_plan, send_actual, send_plan
+
+
+class _NullBot(Bot):
+    """Бот без сети: на любой метод отвечает заранее собранным Message (или списком для альбома)."""
+
+    def __init__(self, album_size: int) -> None:
+        super().__init__(token="123456:bench", parse_mode="HTML")
+        raw = {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}}
+        self._one = Message.model_validate(raw)
+        self._group = [Message.model_validate({**raw, "message_id": i + 1}) for i in range(album_size)]
+        self.calls = 0
+
+    async def __call__(self, method: TelegramMethod, request_timeout=None):  # type: ignore[override]
+        self.calls += 1
+        return self._group if isinstance(method, SendMediaGroup) else self._one
+
+
+def _content(album: int) -> List[Dict[str, Any]]:
+    items = [
+        {"type": "photo", "payload": {"file_id": f"AgACAgIAAxkBAAI{i:04d}" * 3}}
+        for i in range(album)
+    ]
+    items[0]["payload"]["caption"] = "<b>Анонс</b> встречи — подробности ниже"
+    text = (
+        "<b>Встреча клуба</b> в четверг в 19:00.\n"
+        "Регистрация по <a href=\"https://example.org/r\">ссылке</a>, количество мест ограничено."
+    )
+    return [
+        {"type": "album", "payload": {"items": items}},
+        {"type": "text", "payload": {"text": text}},
+    ]
+
+
+async def _bench(n: int, album: int) -> None:
+    bot = _NullBot(album)
+    media = _content(album)
+
+    # прогрев (импорты, кеши pydantic)
+    for uid in range(1, 51):
+        await send_actual(bot, uid, media)
+
+    t0 = time.process_time()
+    for uid in range(1, n + 1):
+        ok, *_ = await send_actual(bot, uid, media)
+        assert ok
+    before = (time.process_time() - t0) / n
+
+    t0 = time.process_time()
+    plan = compile_plan(media)
+    for uid in range(1, n + 1):
+        ok, *_ = await send_plan(bot, plan, uid)
+        assert ok
+    after = (time.process_time() - t0) / n
+
+    print(f"альбом: {album} элементов + текст, получателей: {n}")
+    print(f"до   (разбор на каждого): {before * 1e6:8.1f} мкс CPU / получатель")
+    print(f"после (план на рассылку): {after * 1e6:8.1f} мкс CPU / получатель")
+    print(f"ускорение: x{before / after:.1f}")
+    await bot.session.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="CPU на получателя: send_actual против send_plan")
+    ap.add_argument("--n", type=int, default=5000, help="число получателей")
+    ap.add_argument("--album", type=int, default=10, help="элементов в альбоме (1..10)")
+    args = ap.parse_args()
+    asyncio.run(_bench(max(1, args.n), min(10, max(1, args.album))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+# tools/fake_bot_api.py
+# Локальная заглушка Telegram Bot API (aiohttp) для замеров без настоящего Telegram.
+# Методы: getMe, sendMessage, sendPhoto, sendVideo, sendDocument, sendMediaGroup, createChatInviteLink, revokeChatInviteLink.
+#
+# Запуск:
+#   python -m tools.fake_bot_api --port 8081 --latency 0.05 --retry-after-rate 0.001 --forbidden-rate 0.02
+# Бот направляется на заглушку через AiohttpSession(api=TelegramAPIServer.from_base("http://127.0.0.1:8081")).
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import Counter, deque
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+log = logging.getLogger(__name__)
+
+_GOLDEN = 0x9E3779B97F4A7C15
+_SEND_METHODS = {"sendmessage", "sendphoto", "sendvideo", "senddocument", "sendmediagroup"}
+
+
+class FakeBotApi:
+    """
+    Поведение настраивается параметрами:
+    - latency/jitter      — задержка ответа (равномерно в latency ± jitter), сек;
+    - retry_after_rate    — доля отправок, получающих 429 с retry_after секунд;
+    - limit_per_sec       — «как у Telegram»: больше N отправок за секунду → 429 (0 — без лимита);
+    - forbidden_rate      — доля chat_id, «заблокировавших бота» (детерминированно по chat_id:
+                            один и тот же пользователь всегда недоступен, как в жизни);
+    - invite_limit        — сколько неотозванных инвайтов держит чат, дальше createChatInviteLink → 400 (0 — без лимита).
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        retry_after_rate: float = 0.0,
+        retry_after: int = 1,
+        limit_per_sec: int = 0,
+        forbidden_rate: float = 0.0,
+        seed: Optional[int] = None,
+        invite_limit: int = 0,
+    ) -> None:
+        self.latency = max(0.0, float(latency))
+        self.jitter = max(0.0, float(jitter))
+        self.retry_after_rate = float(retry_after_rate)
+        self.retry_after = max(1, int(retry_after))
+        self.limit_per_sec = max(0, int(limit_per_sec))
+        self.forbidden_rate = float(forbidden_rate)
+        self._rnd = random.Random(seed)
+        self._window: deque = deque()
+        self._message_id = 0
+        self.invite_limit = max(0, int(invite_limit))
+        self.invite_links: Dict[int, set] = {}  # chat_id → действующие (не отозванные) ссылки
+        self.stats: Counter = Counter()
+
+    # ---------- helpers ----------
+
+    def _is_forbidden(self, chat_id: int) -> bool:
+        if self.forbidden_rate <= 0:
+            return False
+        bucket = ((chat_id * _GOLDEN) & 0xFFFFFFFFFFFFFFFF) % 10_000
+        return bucket < self.forbidden_rate * 10_000
+
+    def _over_limit(self) -> bool:
+        if not self.limit_per_sec:
+            return False
+        now = time.monotonic()
+        while self._window and now - self._window[0] > 1.0:
+            self._window.popleft()
+        if len(self._window) >= self.limit_per_sec:
+            return True
+        self._window.append(now)
+        return False
+
+    def _message(self, chat_id: int, extra: Dict[str, Any]) -> Dict[str, Any]:
+        self._message_id += 1
+        return {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            **extra,
+        }
+
+    @staticmethod
+    def _error(code: int, description: str, **parameters: Any) -> web.Response:
+        body: Dict[str, Any] = {"ok": False, "error_code": code, "description": description}
+        if parameters:
+            body["parameters"] = parameters
+        return web.json_response(body, status=code)
+
+    @staticmethod
+    def _ok(result: Any) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+    # ---------- handler ----------
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        data: Dict[str, Any] = dict(await request.post()) if request.can_read_body else {}
+        data.update(request.query)
+        self.stats[method] += 1
+
+        delay = self.latency + (self._rnd.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if method == "getme":
+            return self._ok({"id": 100500, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"})
+
+        try:
+            chat_id = int(data.get("chat_id"))
+        except (TypeError, ValueError):
+            return self._error(400, "Bad Request: chat_id is empty")
+
+        if method in _SEND_METHODS:
+            if self._over_limit() or (self.retry_after_rate and self._rnd.random() < self.retry_after_rate):
+                self.stats["429"] += 1
+                return self._error(
+                    429, f"Too Many Requests: retry after {self.retry_after}", retry_after=self.retry_after,
+                )
+            if self._is_forbidden(chat_id):
+                self.stats["403"] += 1
+                return self._error(403, "Forbidden: bot was blocked by the user")
+
+        if method == "sendmessage":
+            return self._ok(self._message(chat_id, {"text": data.get("text") or ""}))
+        if method in {"sendphoto", "sendvideo", "senddocument"}:
+            return self._ok(self._message(chat_id, {"caption": data.get("caption")}))
+        if method == "sendmediagroup":
+            try:
+                media = json.loads(data.get("media") or "[]")
+            except ValueError:
+                return self._error(400, "Bad Request: can't parse media JSON object")
+            gid = str(self._message_id + 1)
+            return self._ok([self._message(chat_id, {"media_group_id": gid}) for _ in media])
+        if method == "createchatinvitelink":
+            live = self.invite_links.setdefault(chat_id, set())
+            if self.invite_limit and len(live) >= self.invite_limit:
+                return self._error(400, "Bad Request: invite links limit exceeded")
+            self._message_id += 1
+            link = f"https://t.me/+fake{chat_id & 0xFFFF:x}{self._message_id:x}"
+            live.add(link)
+            return self._ok({
+                "invite_link": link,
+                "creator": {"id": 100500, "is_bot": True, "first_name": "FakeBot"},
+                "creates_join_request": False,
+                "is_primary": False,
+                "is_revoked": False,
+                "name": data.get("name"),
+                "expire_date": int(data["expire_date"]) if data.get("expire_date") else None,
+                "member_limit": int(data["member_limit"]) if data.get("member_limit") else None,
+            })
+        if method == "revokechatinvitelink":
+            link = data.get("invite_link") or ""
+            live = self.invite_links.get(chat_id, set())
+            if link not in live:
+                return self._error(400, "Bad Request: INVITE_HASH_EXPIRED")
+            live.discard(link)
+            return self._ok({
+                "invite_link": link,
+                "creator": {"id": 100500, "is_bot": True, "first_name": "FakeBot"},
+                "creates_join_request": False,
+                "is_primary": False,
+                "is_revoked": True,
+            })
+        return self._error(404, f"Not Found: method {request.match_info['method']} is not emulated")
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081) -> web.AppRunner:
+        runner = web.AppRunner(self.app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Локальная заглушка Telegram Bot API")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--latency", type=float, default=0.05, help="задержка ответа, сек")
+    ap.add_argument("--jitter", type=float, default=0.0, help="разброс задержки ±, сек")
+    ap.add_argument("--retry-after-rate", type=float, default=0.0, help="доля отправок с 429")
+    ap.add_argument("--retry-after", type=int, default=1, help="retry_after в 429, сек")
+    ap.add_argument("--limit-per-sec", type=int, default=0, help="429 при превышении N отправок/с (0 — выкл)")
+    ap.add_argument("--forbidden-rate", type=float, default=0.0, help="доля chat_id, заблокировавших бота")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--invite-limit", type=int, default=0, help="лимит неотозванных инвайтов на чат (0 — выкл)")
+    args = ap.parse_args()
+
+    fake = FakeBotApi(
+        latency=args.latency,
+        jitter=args.jitter,
+        retry_after_rate=args.retry_after_rate,
+        retry_after=args.retry_after,
+        limit_per_sec=args.limit_per_sec,
+        forbidden_rate=args.forbidden_rate,
+        seed=args.seed,
+        invite_limit=args.invite_limit,
+    )
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(fake.app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,651 @@
+# tools/fake_db_api.py
+# In-memory заглушка DB-API (db-api:8000) для нагрузочных прогонов на ноутбуке/в CI.
+# Реализует маршруты, которые вызывают миксины common/db_api: /users, /chats/, /memberships/,
+# /invite_links/, /subscriptions, /links/visit, /algo, /broadcasts (+target, send_now, deliveries), /audiences/*.
+# Данные живут только в памяти процесса.
+#
+# Запуск:
+#   python -m tools.fake_db_api --port 8000 --latency 0.01 --error-rate 0.01 --seed-users 100000 --bot-id 100500
+# Бот направляется на заглушку через DB_API_URL=http://127.0.0.1:8000.
+# Счётчики по маршрутам: GET /_fake/stats.
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from aiohttp import web
+
+log = logging.getLogger(__name__)
+
+_SUB_FLAGS = ("news_enabled", "meetings_enabled", "important_enabled")
+_KIND_FLAG = {"news": "news_enabled", "meetings": "meetings_enabled", "important": "important_enabled"}
+
+
+def _now() -> str:
+    return datetime.now().replace(microsecond=0).isoformat(sep=" ")
+
+
+def _int(v: Any, default: Optional[int] = None) -> Optional[int]:
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return default
+
+
+def _parse_dt(v: Any) -> Optional[datetime]:
+    """ISO-время → aware UTC (naive считаем UTC); мусор — None."""
+    try:
+        dt = datetime.fromisoformat(str(v).replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _bool(v: Any) -> bool:
+    return str(v).lower() in ("1", "true", "yes", "on")
+
+
+def _page(rows: List[Any], request: web.Request, default_limit: Optional[int] = None) -> List[Any]:
+    offset = max(0, _int(request.query.get("offset"), 0))
+    limit = _int(request.query.get("limit"), default_limit)
+    return rows[offset:] if limit is None else rows[offset:offset + max(0, limit)]
+
+
+def _parse_ts(value: Any) -> datetime:
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _not_found(what: str) -> web.Response:
+    return web.json_response({"detail": f"{what} not found"}, status=404)
+
+
+class FakeDbApi:
+    """
+    Хранилище и поведение настраиваются параметрами:
+    - latency/jitter — задержка каждого ответа (равномерно в latency ± jitter), сек;
+    - error_rate     — доля запросов, получающих 500;
+    - timeout_rate   — доля запросов, «зависающих» на hang секунд (клиент упрётся в свой таймаут);
+    - error_routes   — префиксы путей, к которым применяются ошибки (пусто — ко всем);
+    - api_key        — если задан, запросы без верного X-API-KEY получают 403;
+    - bot_id         — «чат бота»: membership(user, bot_id) = пользователь в аудитории рассылок;
+    - bulk           — отдавать пакетные маршруты PUT /bulk/users/*, /bulk/memberships, /bulk/subscriptions
+                       (False — как бэк без них: маршруты не регистрируются, 404, клиент пишет поштучно).
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        hang: float = 30.0,
+        error_routes: Tuple[str, ...] = (),
+        api_key: Optional[str] = None,
+        bot_id: Optional[int] = None,
+        seed: Optional[int] = None,
+        bulk: bool = True,
+    ) -> None:
+        self.latency = max(0.0, float(latency))
+        self.jitter = max(0.0, float(jitter))
+        self.error_rate = float(error_rate)
+        self.timeout_rate = float(timeout_rate)
+        self.hang = float(hang)
+        self.error_routes = tuple(error_routes)
+        self.api_key = api_key
+        self.bot_id = bot_id
+        self.bulk = bool(bulk)
+        self._rnd = random.Random(seed)
+
+        self.users: Dict[int, Dict[str, Any]] = {}
+        self.chats: Dict[int, Dict[str, Any]] = {}
+        self.memberships: Dict[int, Set[int]] = {}  # chat_id → {user_id}
+        self.invite_links: Dict[int, Dict[int, Dict[str, Any]]] = {}  # user_id → chat_id → row
+        self.subscriptions: Dict[int, Dict[str, Any]] = {}
+        self.algo: Dict[int, Dict[str, Any]] = {}
+        self.link_visits: Counter = Counter()
+        self.broadcasts: Dict[int, Dict[str, Any]] = {}
+        self.targets: Dict[int, Dict[str, Any]] = {}
+        self.deliveries: Dict[int, Dict[int, Dict[str, Any]]] = {}  # broadcast_id → user_id → row
+        self._next_broadcast_id = 1
+
+        self.stats: Counter = Counter()
+
+    # ---------- seed ----------
+
+    def seed_users(self, n: int, *, first_id: int = 1) -> None:
+        """n пользователей с подписками по умолчанию; при заданном bot_id — участники «чата бота»."""
+        now = _now()
+        members = self.memberships.setdefault(self.bot_id, set()) if self.bot_id is not None else None
+        if self.bot_id is not None:
+            self.chats.setdefault(self.bot_id, {"id": self.bot_id, "title": "bot", "type": "private", "added_at": now})
+        for uid in range(first_id, first_id + n):
+            self.users[uid] = {"user_id": uid, "username": f"user{uid}", "full_name": f"User {uid}",
+                               "terms_accepted": True, "created_at": now}
+            self.subscriptions[uid] = {"user_id": uid, **{f: True for f in _SUB_FLAGS}}
+            if members is not None:
+                members.add(uid)
+
+    # ---------- middleware: задержка, ошибки, ключ ----------
+
+    def _faulty(self, path: str) -> bool:
+        return not self.error_routes or any(path.startswith(p) for p in self.error_routes)
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        key = f"{request.method} {route}"
+        self.stats[key] += 1
+        if request.path.startswith("/_fake/"):
+            return await handler(request)
+
+        if self.api_key is not None and request.headers.get("X-API-KEY") != self.api_key:
+            self.stats["403"] += 1
+            return web.json_response({"detail": "invalid api key"}, status=403)
+
+        delay = self.latency + (self._rnd.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self._faulty(request.path):
+            if self.timeout_rate and self._rnd.random() < self.timeout_rate:
+                self.stats["hang"] += 1
+                await asyncio.sleep(self.hang)
+            if self.error_rate and self._rnd.random() < self.error_rate:
+                self.stats["500"] += 1
+                return web.json_response({"detail": "injected error"}, status=500)
+        return await handler(request)
+
+    # ---------- users ----------
+
+    def _upsert_user(self, uid: int, data: Dict[str, Any]) -> Tuple[int, Any]:
+        row = self.users.setdefault(uid, {"user_id": uid, "terms_accepted": False, "created_at": _now()})
+        row.update({"username": data.get("username"), "full_name": data.get("full_name")})
+        return 200, row
+
+    def _update_user(self, uid: int, data: Dict[str, Any]) -> Tuple[int, Any]:
+        row = self.users.get(uid)
+        if row is None:
+            return 404, {"detail": "user not found"}
+        row.update({k: v for k, v in data.items() if k != "user_id"})
+        return 200, row
+
+    async def upsert_user(self, request: web.Request) -> web.Response:
+        status, body = self._upsert_user(int(request.match_info["user_id"]), await request.json())
+        return web.json_response(body, status=status)
+
+    async def get_user(self, request: web.Request) -> web.Response:
+        row = self.users.get(int(request.match_info["user_id"]))
+        return web.json_response(row) if row is not None else _not_found("user")
+
+    async def update_user(self, request: web.Request) -> web.Response:
+        status, body = self._update_user(int(request.match_info["user_id"]), await request.json())
+        return web.json_response(body, status=status)
+
+    async def delete_user(self, request: web.Request) -> web.Response:
+        uid = int(request.match_info["user_id"])
+        if self.users.pop(uid, None) is None:
+            return _not_found("user")
+        for members in self.memberships.values():
+            members.discard(uid)
+        self.subscriptions.pop(uid, None)
+        self.invite_links.pop(uid, None)
+        return web.json_response({"ok": True})
+
+    # ---------- chats ----------
+
+    async def get_chats(self, request: web.Request) -> web.Response:
+        return web.json_response(sorted(self.chats))
+
+    async def upsert_chat(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        cid = _int(data.get("id"))
+        if cid is None:
+            return web.json_response({"detail": "id is required"}, status=422)
+        row = self.chats.setdefault(cid, {"id": cid})
+        row.update(data)
+        return web.json_response(row)
+
+    async def delete_chat(self, request: web.Request) -> web.Response:
+        cid = int(request.match_info["chat_id"])
+        if self.chats.pop(cid, None) is None:
+            return _not_found("chat")
+        self.memberships.pop(cid, None)
+        return web.json_response({"ok": True})
+
+    # ---------- memberships ----------
+
+    def _add_membership(self, uid: Optional[int], cid: Optional[int]) -> Tuple[int, Any]:
+        if uid is None or cid is None:
+            return 422, {"detail": "user_id and chat_id are required"}
+        # как внешний ключ в БД: и пользователь, и чат должны существовать
+        if uid not in self.users or cid not in self.chats:
+            return 422, {"detail": "foreign key violation"}
+        self.memberships.setdefault(cid, set()).add(uid)
+        return 200, {"user_id": uid, "chat_id": cid}
+
+    async def add_membership(self, request: web.Request) -> web.Response:
+        uid, cid = _int(request.query.get("user_id")), _int(request.query.get("chat_id"))
+        status, body = self._add_membership(uid, cid)
+        return web.json_response(body, status=status)
+
+    async def remove_membership(self, request: web.Request) -> web.Response:
+        uid, cid = _int(request.query.get("user_id")), _int(request.query.get("chat_id"))
+        self.memberships.get(cid, set()).discard(uid)
+        return web.json_response({"ok": True})
+
+    async def get_memberships(self, request: web.Request) -> web.Response:
+        uid, cid = _int(request.query.get("user_id")), _int(request.query.get("chat_id"))
+        members = self.memberships.get(cid, set())
+        if uid is not None:
+            rows = [{"user_id": uid, "chat_id": cid}] if uid in members else []
+            return web.json_response(rows)
+        rows = [{"user_id": u, "chat_id": cid} for u in sorted(members)]
+        return web.json_response(_page(rows, request))
+
+    # ---------- invite links ----------
+
+    async def save_invite_link(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        uid, cid = _int(data.get("user_id")), _int(data.get("chat_id"))
+        if uid is None or cid is None:
+            return web.json_response({"detail": "user_id and chat_id are required"}, status=422)
+        row = {k: data.get(k) for k in ("user_id", "chat_id", "invite_link", "created_at", "expires_at")}
+        self.invite_links.setdefault(uid, {})[cid] = row
+        return web.json_response(row)
+
+    async def get_all_invite_links(self, request: web.Request) -> web.Response:
+        rows = self.invite_links.get(int(request.match_info["user_id"]), {})
+        return web.json_response(list(rows.values()))
+
+    async def delete_invite_links(self, request: web.Request) -> web.Response:
+        self.invite_links.pop(int(request.match_info["user_id"]), None)
+        return web.json_response({"ok": True})
+
+    async def expired_invite_links(self, request: web.Request) -> web.Response:
+        before = _parse_dt(request.query.get("before"))
+        if before is None:
+            return web.json_response({"detail": "before is required"}, status=422)
+        rows = []
+        for per_user in self.invite_links.values():
+            for row in per_user.values():
+                exp = _parse_dt(row.get("expires_at"))
+                if exp is None or exp < before:
+                    rows.append(row)
+        rows.sort(key=lambda r: _parse_dt(r.get("expires_at")) or before)
+        return web.json_response(_page(rows, request, 500))
+
+    async def delete_invite_link(self, request: web.Request) -> web.Response:
+        uid, cid = int(request.match_info["user_id"]), int(request.match_info["chat_id"])
+        row = self.invite_links.get(uid, {}).get(cid)
+        expected = request.query.get("invite_link")
+        if row is None or (expected and row.get("invite_link") != expected):
+            return _not_found("invite link")
+        del self.invite_links[uid][cid]
+        return web.json_response({"ok": True})
+
+    # ---------- subscriptions ----------
+
+    async def get_subscriptions(self, request: web.Request) -> web.Response:
+        row = self.subscriptions.get(int(request.match_info["user_id"]))
+        return web.json_response(row) if row is not None else _not_found("subscriptions")
+
+    def _put_subscriptions(self, uid: int, data: Dict[str, Any]) -> Tuple[int, Any]:
+        if uid not in self.users:
+            return 422, {"detail": "foreign key violation"}
+        row = self.subscriptions.setdefault(uid, {"user_id": uid})
+        row.update({f: bool(data.get(f)) for f in _SUB_FLAGS})
+        return 200, row
+
+    async def put_subscriptions(self, request: web.Request) -> web.Response:
+        status, body = self._put_subscriptions(int(request.match_info["user_id"]), await request.json())
+        return web.json_response(body, status=status)
+
+    async def toggle_subscription(self, request: web.Request) -> web.Response:
+        row = self.subscriptions.get(int(request.match_info["user_id"]))
+        if row is None:
+            return _not_found("subscriptions")
+        flag = _KIND_FLAG.get((await request.json()).get("kind"))
+        if flag is None:
+            return web.json_response({"detail": "unknown kind"}, status=422)
+        row[flag] = not row.get(flag)
+        return web.json_response(row)
+
+    async def delete_subscriptions(self, request: web.Request) -> web.Response:
+        self.subscriptions.pop(int(request.match_info["user_id"]), None)
+        return web.json_response({"ok": True})
+
+    # ---------- пакетные записи ----------
+
+    async def _bulk(self, request: web.Request, apply) -> web.Response:
+        items = (await request.json()).get("items") or []
+        results = []
+        for item in items:
+            status, body = apply(item)
+            results.append({"status": status, "data": body})
+        self.stats["bulk_items"] += len(items)
+        return web.json_response({"results": results})
+
+    async def bulk_upsert_users(self, request: web.Request) -> web.Response:
+        return await self._bulk(request, lambda it: self._upsert_user(int(it["user_id"]), it))
+
+    async def bulk_update_users(self, request: web.Request) -> web.Response:
+        return await self._bulk(request, lambda it: self._update_user(int(it["user_id"]), it))
+
+    async def bulk_add_memberships(self, request: web.Request) -> web.Response:
+        return await self._bulk(request, lambda it: self._add_membership(_int(it.get("user_id")), _int(it.get("chat_id"))))
+
+    async def bulk_put_subscriptions(self, request: web.Request) -> web.Response:
+        return await self._bulk(request, lambda it: self._put_subscriptions(int(it["user_id"]), it))
+
+    # ---------- links / algo ----------
+
+    async def link_visit(self, request: web.Request) -> web.Response:
+        key = (await request.json()).get("link_key") or ""
+        self.link_visits[key] += 1
+        return web.json_response({"link_key": key, "visits": self.link_visits[key]})
+
+    def _progress(self, uid: int) -> Dict[str, Any]:
+        return self.algo.setdefault(
+            uid, {"user_id": uid, "step": 0, "basic_completed": False, "advanced_completed": False},
+        )
+
+    async def get_progress(self, request: web.Request) -> web.Response:
+        return web.json_response(self._progress(int(request.match_info["user_id"])))
+
+    async def clear_progress(self, request: web.Request) -> web.Response:
+        self.algo.pop(int(request.match_info["user_id"]), None)
+        return web.json_response({"ok": True})
+
+    async def set_progress(self, request: web.Request) -> web.Response:
+        row = self._progress(int(request.match_info["user_id"]))
+        field = request.match_info["field"]
+        if field == "step":
+            row["step"] = _int(request.query.get("step"), 0)
+        else:
+            row[f"{field}_completed"] = _bool(request.query.get("completed"))
+        return web.json_response(row)
+
+    # ---------- broadcasts ----------
+
+    def _broadcast(self, request: web.Request) -> Optional[Dict[str, Any]]:
+        return self.broadcasts.get(int(request.match_info["broadcast_id"]))
+
+    async def create_broadcast(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        bid = self._next_broadcast_id
+        self._next_broadcast_id += 1
+        row = {"id": bid, "status": "draft", "schedule": None, "enabled": True, "created_at": _now(), **data}
+        row["id"] = bid
+        row["updated_at"] = row["created_at"]
+        self.broadcasts[bid] = row
+        return web.json_response(row)
+
+    async def list_broadcasts(self, request: web.Request) -> web.Response:
+        rows = list(self.broadcasts.values())
+        if "status" in request.query:
+            rows = [r for r in rows if r.get("status") == request.query["status"]]
+        if "enabled" in request.query:
+            rows = [r for r in rows if bool(r.get("enabled")) == _bool(request.query["enabled"])]
+        if "updated_since" in request.query:
+            since = _parse_ts(request.query["updated_since"])
+            rows = [r for r in rows if _parse_ts(r.get("updated_at")) >= since]
+        if "after_id" not in request.query:
+            return web.json_response(_page(rows, request, 100))
+        # keyset: id > after_id по возрастанию id, с ETag страницы
+        after_id = _int(request.query.get("after_id"), 0)
+        limit = max(0, _int(request.query.get("limit"), 100))
+        page = sorted((r for r in rows if r["id"] > after_id), key=lambda r: r["id"])[:limit]
+        etag = '"%s"' % hashlib.sha1(json.dumps(page, sort_keys=True, default=str).encode()).hexdigest()
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.json_response(page, headers={"ETag": etag})
+
+    async def get_broadcast(self, request: web.Request) -> web.Response:
+        row = self._broadcast(request)
+        return web.json_response(row) if row is not None else _not_found("broadcast")
+
+    async def update_broadcast(self, request: web.Request) -> web.Response:
+        row = self._broadcast(request)
+        if row is None:
+            return _not_found("broadcast")
+        row.update({k: v for k, v in (await request.json()).items() if k != "id"})
+        row["updated_at"] = _now()
+        return web.json_response(row)
+
+    async def delete_broadcast(self, request: web.Request) -> web.Response:
+        bid = int(request.match_info["broadcast_id"])
+        if self.broadcasts.pop(bid, None) is None:
+            return _not_found("broadcast")
+        self.targets.pop(bid, None)
+        self.deliveries.pop(bid, None)
+        return web.json_response({"ok": True})
+
+    async def get_target(self, request: web.Request) -> web.Response:
+        bid = int(request.match_info["broadcast_id"])
+        if bid not in self.targets:
+            return _not_found("target")
+        return web.json_response(self.targets[bid])
+
+    async def put_target(self, request: web.Request) -> web.Response:
+        if self._broadcast(request) is None:
+            return _not_found("broadcast")
+        bid = int(request.match_info["broadcast_id"])
+        self.targets[bid] = await request.json()
+        return web.json_response(self.targets[bid])
+
+    async def send_now(self, request: web.Request) -> web.Response:
+        row = self._broadcast(request)
+        if row is None:
+            return _not_found("broadcast")
+        row["status"] = "queued"
+        return web.json_response(row)
+
+    # ---------- audiences ----------
+
+    def _resolve(self, target: Dict[str, Any]) -> List[int]:
+        """ids — как есть (без дублей); kind — участники «чата бота» с включённым флагом; sql/all — все участники."""
+        ttype = (target or {}).get("type")
+        if ttype == "ids":
+            out: List[int] = []
+            seen: Set[int] = set()
+            for x in target.get("user_ids") or target.get("ids") or []:
+                v = _int(x)
+                if v is not None and v > 0 and v not in seen:
+                    seen.add(v)
+                    out.append(v)
+            return out
+        members = sorted(self.memberships.get(self.bot_id, set())) if self.bot_id is not None else sorted(self.users)
+        if ttype == "kind":
+            flag = _KIND_FLAG.get(target.get("kind"))
+            return [u for u in members if flag and (self.subscriptions.get(u) or {}).get(flag)]
+        # SQL заглушка не исполняет — отдаёт всю аудиторию бота
+        return members
+
+    async def audience_preview(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        ids = self._resolve(data.get("target") or {})
+        limit = max(0, _int(data.get("limit"), 10000))
+        return web.json_response({"total": len(ids), "sample": ids[:min(limit, 30)]})
+
+    async def audience_resolve(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        ids = self._resolve(data.get("target") or {})
+        offset = max(0, _int(data.get("offset"), 0))
+        limit = _int(data.get("limit"))
+        page = ids[offset:] if limit is None else ids[offset:offset + max(0, limit)]
+        return web.json_response({"ids": page, "total": len(ids)})
+
+    # ---------- deliveries ----------
+
+    async def list_deliveries(self, request: web.Request) -> web.Response:
+        rows = self.deliveries.get(int(request.match_info["broadcast_id"]), {})
+        status = request.query.get("status")
+        out = [rows[u] for u in sorted(rows) if status is None or rows[u]["status"] == status]
+        return web.json_response(_page(out, request, 200))
+
+    async def deliveries_materialize(self, request: web.Request) -> web.Response:
+        bid = int(request.match_info["broadcast_id"])
+        data = await request.json()
+        ids = [v for v in (_int(x) for x in data.get("ids") or []) if v]
+        limit = _int(data.get("limit"))
+        if limit is not None:
+            ids = ids[:limit]
+        rows = self.deliveries.setdefault(bid, {})
+        created = 0
+        for uid in ids:
+            if uid not in rows:
+                rows[uid] = {"user_id": uid, "status": "pending", "attempts": 0}
+                created += 1
+        return web.json_response({"total": len(ids), "created": created, "existed": len(ids) - created})
+
+    async def deliveries_report(self, request: web.Request) -> web.Response:
+        bid = int(request.match_info["broadcast_id"])
+        items = (await request.json()).get("items") or []
+        rows = self.deliveries.setdefault(bid, {})
+        updated = 0
+        for it in items:
+            uid = _int(it.get("user_id"))
+            if uid is None or it.get("status") not in ("sent", "failed", "skipped", "pending"):
+                continue
+            row = rows.setdefault(uid, {"user_id": uid, "status": "pending", "attempts": 0})
+            row["status"] = it["status"]
+            row["attempts"] = row.get("attempts", 0) + int(it.get("attempt_inc") or 0)
+            for k in ("message_id", "error_code", "error_message", "sent_at"):
+                if k in it:
+                    row[k] = it[k]
+            updated += 1
+        return web.json_response({"updated": updated})
+
+    # ---------- service ----------
+
+    async def fake_stats(self, request: web.Request) -> web.Response:
+        deliveries = {
+            str(bid): dict(Counter(r["status"] for r in rows.values()))
+            for bid, rows in self.deliveries.items()
+        }
+        return web.json_response({
+            "requests": dict(self.stats),
+            "users": len(self.users),
+            "chats": len(self.chats),
+            "memberships": sum(len(m) for m in self.memberships.values()),
+            "broadcasts": len(self.broadcasts),
+            "deliveries": deliveries,
+        })
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        r = app.router
+        # пакетные маршруты — под отдельным префиксом /bulk, чтобы не пересекаться с /users/{user_id}/...
+        if self.bulk:
+            r.add_put("/bulk/users/upsert", self.bulk_upsert_users)
+            r.add_put("/bulk/users/update", self.bulk_update_users)
+            r.add_put("/bulk/memberships", self.bulk_add_memberships)
+            r.add_put("/bulk/subscriptions", self.bulk_put_subscriptions)
+
+        r.add_put("/users/{user_id}/upsert", self.upsert_user)
+        r.add_get("/users/{user_id}", self.get_user)
+        r.add_put("/users/{user_id}", self.update_user)
+        r.add_delete("/users/{user_id}", self.delete_user)
+
+        r.add_get("/chats/", self.get_chats)
+        r.add_post("/chats/", self.upsert_chat)
+        r.add_delete("/chats/{chat_id}", self.delete_chat)
+
+        r.add_post("/memberships/", self.add_membership)
+        r.add_delete("/memberships/", self.remove_membership)
+        r.add_get("/memberships/", self.get_memberships)
+
+        r.add_post("/invite_links/", self.save_invite_link)
+        r.add_get("/invite_links/all/{user_id}", self.get_all_invite_links)
+        r.add_get("/invite_links/expired", self.expired_invite_links)
+        r.add_delete("/invite_links/{user_id}", self.delete_invite_links)
+        r.add_delete("/invite_links/{user_id}/{chat_id}", self.delete_invite_link)
+
+        r.add_get("/subscriptions/{user_id}", self.get_subscriptions)
+        r.add_put("/subscriptions/{user_id}", self.put_subscriptions)
+        r.add_post("/subscriptions/{user_id}/toggle", self.toggle_subscription)
+        r.add_delete("/subscriptions/{user_id}", self.delete_subscriptions)
+
+        r.add_post("/links/visit", self.link_visit)
+        r.add_get("/algo/{user_id}", self.get_progress)
+        r.add_delete("/algo/{user_id}", self.clear_progress)
+        r.add_put("/algo/{user_id}/{field:step|basic|advanced}", self.set_progress)
+
+        r.add_post("/broadcasts", self.create_broadcast)
+        r.add_get("/broadcasts", self.list_broadcasts)
+        r.add_get("/broadcasts/{broadcast_id}", self.get_broadcast)
+        r.add_patch("/broadcasts/{broadcast_id}", self.update_broadcast)
+        r.add_delete("/broadcasts/{broadcast_id}", self.delete_broadcast)
+        r.add_get("/broadcasts/{broadcast_id}/target", self.get_target)
+        r.add_put("/broadcasts/{broadcast_id}/target", self.put_target)
+        r.add_post("/broadcasts/{broadcast_id}/send_now", self.send_now)
+        r.add_get("/broadcasts/{broadcast_id}/deliveries", self.list_deliveries)
+        r.add_post("/broadcasts/{broadcast_id}/deliveries/materialize", self.deliveries_materialize)
+        r.add_post("/broadcasts/{broadcast_id}/deliveries/report", self.deliveries_report)
+
+        r.add_post("/audiences/preview", self.audience_preview)
+        r.add_post("/audiences/resolve", self.audience_resolve)
+
+        r.add_get("/_fake/stats", self.fake_stats)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8000) -> web.AppRunner:
+        runner = web.AppRunner(self.app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="In-memory заглушка DB-API")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--latency", type=float, default=0.0, help="задержка ответа, сек")
+    ap.add_argument("--jitter", type=float, default=0.0, help="разброс задержки ±, сек")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 500")
+    ap.add_argument("--timeout-rate", type=float, default=0.0, help="доля «зависших» запросов")
+    ap.add_argument("--hang", type=float, default=30.0, help="сколько висит «зависший» запрос, сек")
+    ap.add_argument("--error-routes", default="", help="префиксы путей для ошибок через запятую (пусто — все)")
+    ap.add_argument("--api-key", default=None, help="проверять X-API-KEY (по умолчанию не проверяется)")
+    ap.add_argument("--bot-id", type=int, default=None, help="chat_id «чата бота» (аудитория рассылок)")
+    ap.add_argument("--seed-users", type=int, default=0, help="создать N пользователей с подписками")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--no-bulk", action="store_true", help="без пакетных маршрутов (404), как старый бэк")
+    args = ap.parse_args()
+
+    fake = FakeDbApi(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        hang=args.hang,
+        error_routes=tuple(p.strip() for p in args.error_routes.split(",") if p.strip()),
+        api_key=args.api_key,
+        bot_id=args.bot_id,
+        seed=args.seed,
+        bulk=not args.no_bulk,
+    )
+    logging.basicConfig(level=logging.INFO)
+    if args.seed_users:
+        t0 = time.monotonic()
+        fake.seed_users(args.seed_users)
+        log.info("Создано пользователей: %s за %.1f с", args.seed_users, time.monotonic() - t0)
+    web.run_app(fake.app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
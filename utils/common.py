@@ -8,7 +8,6 @@ from typing import Dict
 from datetime import datetime
 
 from tenacity import retry, stop_after_delay, wait_fixed, retry_if_exception_type, RetryCallState
-from httpx import AsyncClient, RequestError
 from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.exceptions import TelegramNetworkError
 from aiogram import Bot
@@ -28,15 +27,8 @@ def _log_before_sleep(retry_state: RetryCallState) -> None:
     )
 
 
-# ——— Ретраи для httpx и Aiogram ———
-AsyncClient.request = retry(
-    reraise=True,
-    stop=stop_after_delay(600),
-    wait=wait_fixed(10),
-    retry=retry_if_exception_type(RequestError),
-    before_sleep=_log_before_sleep
-)(AsyncClient.request)
-
+# ——— Ретраи для Aiogram ———
+# (DB-API: повторы, бюджет времени и автомат — в транспорте common/db_api/base.py)
 AiohttpSession.__call__ = retry(
     reraise=True,
     stop=stop_after_delay(600),